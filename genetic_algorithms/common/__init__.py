@@ -1,8 +1,19 @@
+from .batch_runner import *
+from .checkpoint import *
+from .evaluator import *
 from .fitness import *
+from .fitness_cache import *
+from .gene_journal import *
 from .genetic_algorithm_generator import *
+from .inplace_genetic_algorithm_generator import *
+from .island_model import *
 from .genetic_algorithm_protocol import *
 from .mutation import *
+from .paint_on_top_mixin import *
+from .profiler import *
 from .reproduction import *
+from .result_writer import *
 from .run import *
 from .selection import *
 from .simple_genetic_algorithm_base import *
+from .termination import *
@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import os
+from pathlib import Path
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from primitives.brush import load_brush_textures
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchJob:
+    """
+    A single independent run in a batch.
+    f_run has to be a module level function, so that it can be sent to a worker process.
+    It is called as f_run( **arguments, random_seed = ... ), and is expected to write its own results.
+    """
+    name        : str
+    f_run       : Callable[ ..., Any ]
+    arguments   : Dict
+
+
+@dataclass
+class BatchJobResult:
+    name            : str
+    random_seed     : int
+    is_success      : bool
+    duration        : float
+    error           : Optional[ str ] = None
+
+
+def _initialize_worker( brush_directories : Sequence[ Path ] ) -> None:
+    # worker processes do not inherit logging configuration when they are spawned
+    logging.basicConfig( level = logging.INFO )
+    # read brush textures once per worker, instead of once per job
+    for brush_directory in brush_directories:
+        load_brush_textures( brush_directory )
+
+
+def _run_job( job : BatchJob, random_seed : int ) -> BatchJobResult:
+    # Any exception is caught and reported, so that a single failing job does not stop the batch
+    start_time = time.perf_counter()
+    try:
+        job.f_run( **job.arguments, random_seed = random_seed )
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return BatchJobResult(
+        name = job.name,
+        random_seed = random_seed,
+        is_success = error is None,
+        duration = time.perf_counter() - start_time,
+        error = error,
+    )
+
+
+def log_batch_summary( results : List[ BatchJobResult ], total_duration : float ) -> None:
+    n_succeeded = sum( result.is_success for result in results )
+    n_failed = len( results ) - n_succeeded
+    jobs_per_hour = n_succeeded / ( total_duration / 3600 ) if total_duration > 0 else 0.0
+    logger.info(
+        f'Batch finished {n_succeeded} of {len( results )} jobs in {total_duration:.1f} seconds, '
+        f'{jobs_per_hour:.1f} jobs per hour'
+    )
+    for result in results:
+        if not result.is_success:
+            logger.error( f'Job "{result.name}" failed after {result.duration:.1f} seconds:\n{result.error}' )
+    if n_failed > 0:
+        logger.error( f'{n_failed} jobs failed' )
+
+
+def run_batch(
+        jobs                : List[ BatchJob ],
+        n_workers           : Optional[ int ] = None,
+        brush_directories   : Sequence[ Path ] = ( ),
+        random_seed         : int = 1337,
+) -> List[ BatchJobResult ]:
+    """
+    Runs independent jobs in a pool of worker processes.
+    Every job gets its own seed, random_seed + its index in the batch,
+    so results do not depend on which worker happens to run a job, or on the number of workers.
+    Brush textures in brush_directories are preloaded once per worker.
+    Results are returned in the same order as the jobs.
+    """
+    n_workers = n_workers or os.cpu_count()
+    logger.info( f'Running {len( jobs )} jobs with {n_workers} workers' )
+
+    start_time = datetime.now()
+    results : List[ Optional[ BatchJobResult ] ] = [ None ] * len( jobs )
+    with ProcessPoolExecutor(
+            max_workers = n_workers,
+            initializer = _initialize_worker,
+            initargs = ( list( brush_directories ), ),
+    ) as executor:
+        future_to_index = {
+            executor.submit( _run_job, job, random_seed + job_index ) : job_index
+            for job_index, job in enumerate( jobs )
+        }
+        for future in as_completed( future_to_index ):
+            job_index = future_to_index[ future ]
+            try:
+                result = future.result()
+            except Exception:
+                # this only happens when the worker itself died, for example when it ran out of memory
+                result = BatchJobResult(
+                    name = jobs[ job_index ].name,
+                    random_seed = random_seed + job_index,
+                    is_success = False,
+                    duration = 0.0,
+                    error = traceback.format_exc(),
+                )
+            results[ job_index ] = result
+            status = 'finished' if result.is_success else 'failed'
+            logger.info( f'Job "{result.name}" {status} in {result.duration:.1f} seconds' )
+
+    total_duration = ( datetime.now() - start_time ).total_seconds()
+    log_batch_summary( results, total_duration )
+    return results
@@ -0,0 +1,125 @@
+from dataclasses import dataclass, field
+import logging
+import os
+from pathlib import Path
+import pickle
+import random
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from genetic_algorithms.common.genetic_algorithm_protocol import FitnessScore, Population
+
+
+logger = logging.getLogger(__name__)
+
+
+# Checkpoints store everything needed to continue a run exactly where it was, as if it never stopped:
+# the population, the state of the random number generators, and the state of the code running the generator,
+# like patience counters.
+# Specimens are stored as their __dict__, just like pickled results,
+# because algorithms loaded with run_path have specimen classes that can not be pickled.
+# They are turned back into specimens of the same class as those of a new initial population.
+
+
+CHECKPOINT_FILE_NAME = 'checkpoint.pickle'
+
+
+@dataclass
+class GeneratorState:
+    """
+    The state of a generator after its last generation.
+    Generators update it every generation when they are given one,
+    and continue from it instead of starting over when it has a population.
+    """
+    generation_index    : int = 0
+
+    # The parents of the next generation, or the single specimen that is mutated in place
+    population          : Optional[ Population ] = None
+
+    # Only used when mutating in place
+    best_score          : Optional[ FitnessScore ] = None
+
+    # The states of random and np.random, only set when continuing from a checkpoint
+    random_state        : Any = None
+    np_random_state     : Any = None
+
+    def is_resuming( self ) -> bool:
+        return self.population is not None
+
+
+@dataclass
+class Checkpoint:
+    generator_state     : GeneratorState
+
+    # Anything else the code running the generator needs to continue, like patience counters
+    run_state           : Dict[ str, Any ] = field( default_factory = dict )
+
+
+def get_restored_population( initial_population : Population, population : Population ) -> Population:
+    """
+    Turns specimens that were stored as their __dict__ back into specimens,
+    of the same class as the specimens of the initial population
+    """
+    specimen_type = type( initial_population[ 0 ] )
+    restored_population = [ ]
+    for specimen in population:
+        if isinstance( specimen, dict ):
+            specimen_dict = specimen
+            specimen = specimen_type.__new__( specimen_type )
+            specimen.__dict__.update( specimen_dict )
+        restored_population.append( specimen )
+    return restored_population
+
+
+def restore_random_states( generator_state : GeneratorState ) -> None:
+    random.setstate( generator_state.random_state )
+    np.random.set_state( generator_state.np_random_state )
+
+
+def save_checkpoint( path : Path, generator_state : GeneratorState, run_state : Dict[ str, Any ] ) -> None:
+    """
+    Stores the generator state together with the current states of random and np.random.
+    This should happen between generations, when nothing else has used the random number generators since.
+    The previous checkpoint is only replaced when the new one was written completely.
+    """
+    stored_generator_state = GeneratorState(
+        generation_index = generator_state.generation_index,
+        population = [ specimen.__dict__ for specimen in generator_state.population ],
+        best_score = generator_state.best_score,
+        random_state = random.getstate(),
+        np_random_state = np.random.get_state(),
+    )
+    temporary_path = Path( f'{path}.tmp' )
+    with open( temporary_path, 'wb' ) as checkpoint_file:
+        pickle.dump( Checkpoint( stored_generator_state, run_state ), checkpoint_file )
+        checkpoint_file.flush()
+        os.fsync( checkpoint_file.fileno() )
+    os.replace( temporary_path, path )
+    logger.info( f'Wrote checkpoint of generation {generator_state.generation_index} to {path}' )
+
+
+def load_checkpoint( path : Path ) -> Optional[ Checkpoint ]:
+    """
+    Returns None when there is no checkpoint
+    """
+    if not Path( path ).exists():
+        return None
+    with open( path, 'rb' ) as checkpoint_file:
+        checkpoint = pickle.load( checkpoint_file )
+    logger.info( f'Loaded checkpoint of generation {checkpoint.generator_state.generation_index} from {path}' )
+    return checkpoint
+
+
+def remove_results_after_generation( output_directory_path : Path, generation_index : int ) -> List[ Path ]:
+    """
+    Removes results that were written after a checkpoint, since they will be written again when continuing from it.
+    Their names contain timings, so they would not simply be overwritten.
+    """
+    removed_paths = [ ]
+    for path in Path( output_directory_path ).glob( 'gen_*' ):
+        result_generation_index = int( path.name.split( '_' )[ 1 ] )
+        if result_generation_index > generation_index:
+            path.unlink()
+            removed_paths.append( path )
+    return removed_paths
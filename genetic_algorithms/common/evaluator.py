@@ -0,0 +1,140 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from genetic_algorithms.common.fitness import get_fitness_from_absolute_difference_image
+from genetic_algorithms.common.genetic_algorithm_protocol import FitnessScore
+from utils.absolute_difference_image import get_absolute_difference_image
+from utils.shared_arrays import SharedArrayHandle, SharedArrays
+
+
+logger = logging.getLogger(__name__)
+
+
+# Evaluators render and score many specimens at the same time.
+# Everything that is the same for all specimens, like the target image, is stored once as the evaluation context,
+# so that only the genes have to be sent to the workers of a process pool.
+# Evaluation functions have to be module level functions, so they can be sent to worker processes too.
+# Results are always returned in the same order as the items, so they do not depend on the evaluator used.
+
+
+EVALUATOR_SERIAL = 'serial'
+EVALUATOR_THREADS = 'threads'
+EVALUATOR_PROCESSES = 'processes'
+
+
+EVALUATION_CONTEXT : Dict[ str, Any ] = { }
+
+
+def set_evaluation_context( context : Dict[ str, Any ] ) -> None:
+    global EVALUATION_CONTEXT
+    EVALUATION_CONTEXT = context
+
+
+def get_evaluation_context() -> Dict[ str, Any ]:
+    return EVALUATION_CONTEXT
+
+
+def _attach_evaluation_context( shared_context : Dict[ str, Any ] ) -> None:
+    set_evaluation_context( {
+        key : value.attach() if isinstance( value, SharedArrayHandle ) else value
+        for key, value in shared_context.items()
+    } )
+
+
+def render_and_score_genes( genes : Sequence ) -> Tuple[ np.ndarray, np.ndarray, FitnessScore ]:
+    """
+    Draws all genes on a copy of the blank image of the evaluation context, in order,
+    and compares the result to its target image.
+    Expects 'blank_image', 'target_image' and 'f_draw_gene' in the evaluation context.
+    """
+    context = get_evaluation_context()
+    image = context[ 'blank_image' ].copy()
+    f_draw_gene = context[ 'f_draw_gene' ]
+    for gene in genes:
+        f_draw_gene( gene, image )
+    absolute_difference_image = get_absolute_difference_image( image, context[ 'target_image' ] )
+    fitness = get_fitness_from_absolute_difference_image( absolute_difference_image )
+    return image, absolute_difference_image, fitness
+
+
+class SerialEvaluator:
+
+    def set_context( self, context : Dict[ str, Any ] ) -> None:
+        set_evaluation_context( context )
+
+    def map( self, f_evaluate : Callable, items : Sequence ) -> List:
+        return [ f_evaluate( item ) for item in items ]
+
+    def close( self ) -> None:
+        pass
+
+
+class ThreadPoolEvaluator:
+
+    """
+    Worth it when evaluation mostly happens in code that releases the GIL, like OpenCV drawing functions.
+    All threads share the evaluation context.
+    """
+
+    def __init__( self, n_workers : Optional[ int ] = None ):
+        self._executor = ThreadPoolExecutor( max_workers = n_workers )
+
+    def set_context( self, context : Dict[ str, Any ] ) -> None:
+        set_evaluation_context( context )
+
+    def map( self, f_evaluate : Callable, items : Sequence ) -> List:
+        return list( self._executor.map( f_evaluate, items ) )
+
+    def close( self ) -> None:
+        self._executor.shutdown()
+
+
+class ProcessPoolEvaluator:
+
+    """
+    Every worker process receives the evaluation context once, when the pool is started,
+    which is why the pool is restarted whenever the context changes.
+    Arrays in the context are placed in shared memory, so workers do not each get their own copy.
+    Note that results are sent back to this process, so this only pays off when evaluation is expensive.
+    """
+
+    def __init__( self, n_workers : Optional[ int ] = None ):
+        self._n_workers = n_workers
+        self._executor : Optional[ Executor ] = None
+        self._shared_arrays = SharedArrays()
+
+    def set_context( self, context : Dict[ str, Any ] ) -> None:
+        self.close()
+        set_evaluation_context( context )
+        shared_context = {
+            key : self._shared_arrays.share( value ) if isinstance( value, np.ndarray ) else value
+            for key, value in context.items()
+        }
+        self._executor = ProcessPoolExecutor(
+            max_workers = self._n_workers,
+            initializer = _attach_evaluation_context,
+            initargs = ( shared_context, ),
+        )
+
+    def map( self, f_evaluate : Callable, items : Sequence ) -> List:
+        assert self._executor is not None, 'Set the evaluation context before evaluating'
+        return list( self._executor.map( f_evaluate, items ) )
+
+    def close( self ) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._shared_arrays.close()
+
+
+def get_evaluator( name : str = EVALUATOR_SERIAL, n_workers : Optional[ int ] = None ):
+    if name == EVALUATOR_SERIAL:
+        return SerialEvaluator()
+    if name == EVALUATOR_THREADS:
+        return ThreadPoolEvaluator( n_workers )
+    if name == EVALUATOR_PROCESSES:
+        return ProcessPoolEvaluator( n_workers )
+    raise ValueError( f'Unknown evaluator "{name}"' )
@@ -13,6 +13,12 @@ def get_fitness_as_absolute_image_difference( specimen_image, target_image ) ->
 def get_fitness_from_absolute_difference_image( absolute_difference_image ) -> FitnessScore:
     image_score = float( np.sum( absolute_difference_image ) )
     n_elements = np.prod( absolute_difference_image.shape )
+    return get_fitness_from_absolute_difference_sum( image_score, n_elements )
+
+
+def get_fitness_from_absolute_difference_sum( image_score : float, n_elements : int ) -> FitnessScore:
+    # Useful if the sum of the absolute difference image is kept up to date incrementally,
+    # instead of summing the entire image again
     max_potential_diff_score = n_elements * 255
     normalized_diff_score = image_score / max_potential_diff_score
     return normalized_diff_score
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from genetic_algorithms.common.genetic_algorithm_protocol import FitnessScore
+
+
+def get_genome_fingerprint( gene_parameters : np.ndarray ) -> bytes:
+    """
+    A cheap fingerprint of a genome, given as an array with a row of parameters per gene.
+    Genomes with the same genes in the same order have the same fingerprint.
+    """
+    genome_hash = hashlib.blake2b( digest_size = 16 )
+    genome_hash.update( str( ( gene_parameters.shape, gene_parameters.dtype.str ) ).encode() )
+    genome_hash.update( np.ascontiguousarray( gene_parameters ).data )
+    return genome_hash.digest()
+
+
+@dataclass
+class FitnessCacheEntry:
+    fitness         : FitnessScore
+
+    # Attributes to set on a specimen with the same genome, like its cached image,
+    # so that it does not have to be rendered again.
+    # Note that these are shared between specimens, so they should not be modified in place after scoring.
+    specimen_state  : Dict[ str, Any ]
+
+    @property
+    def n_bytes( self ) -> int:
+        return sum( value.nbytes for value in self.specimen_state.values() if isinstance( value, np.ndarray ) )
+
+
+class FitnessCache:
+
+    """
+    A least recently used cache of fitness scores, by genome fingerprint.
+
+    Offspring are often identical to their parent, for example when a mutation was clamped,
+    and parents are added back to the population every generation.
+    Specimens with a genome that was scored before can skip both rendering and scoring.
+    Entries are evicted when the total size of their arrays exceeds max_n_bytes.
+    """
+
+    def __init__( self, max_n_bytes : int = 256 * 1024 ** 2 ):
+        self.max_n_bytes = max_n_bytes
+        self._entries : OrderedDict[ bytes, FitnessCacheEntry ] = OrderedDict()
+        self.n_bytes = 0
+        self.n_hits = 0
+        self.n_misses = 0
+
+    @property
+    def hit_rate( self ) -> float:
+        n_lookups = self.n_hits + self.n_misses
+        return self.n_hits / n_lookups if n_lookups > 0 else 0.0
+
+    def __len__( self ) -> int:
+        return len( self._entries )
+
+    def clear( self ) -> None:
+        self._entries.clear()
+        self.n_bytes = 0
+
+    def get( self, fingerprint : bytes ) -> Optional[ FitnessCacheEntry ]:
+        entry = self._entries.get( fingerprint )
+        if entry is None:
+            self.n_misses += 1
+            return None
+        self.n_hits += 1
+        self._entries.move_to_end( fingerprint )
+        return entry
+
+    def put( self, fingerprint : bytes, entry : FitnessCacheEntry ) -> None:
+        entry_n_bytes = entry.n_bytes
+        # entries that on their own are larger than the cache are not worth evicting everything else for
+        if entry_n_bytes > self.max_n_bytes:
+            return
+        previous_entry = self._entries.pop( fingerprint, None )
+        if previous_entry is not None:
+            self.n_bytes -= previous_entry.n_bytes
+        self._entries[ fingerprint ] = entry
+        self.n_bytes += entry_n_bytes
+        while self.n_bytes > self.max_n_bytes:
+            _, evicted_entry = self._entries.popitem( last = False )
+            self.n_bytes -= evicted_entry.n_bytes
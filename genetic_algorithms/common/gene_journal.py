@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from primitives.gene_array import GENE_SCHEMAS, GeneArray
+
+
+logger = logging.getLogger(__name__)
+
+
+# A gene journal stores how the genes of the best specimen evolve during a run, much more compactly than pickles.
+# Painting and Pointillism only ever append genes, so every record only stores the genes that were added since
+# the previous record, and the size of the journal grows linearly with the number of genes.
+# Every keyframe_interval records, a record also stores the image of the specimen as a PNG,
+# so that an intermediate state can be rebuilt by drawing only the genes added after the keyframe before it,
+# see redraw/redraw_gene_journal.py
+#
+# Layout, all numbers are little endian:
+#   magic, header size as uint32, header as JSON, with the gene type and the layout of its columns
+#   records, each consisting of:
+#       kind as a single byte, K for keyframes and D for deltas
+#       generation as uint64, score as float64
+#       start index as uint64, the number of genes that are kept from the previous record, the new genes follow them
+#       number of new genes as uint64
+#       the values of the new genes, column after column
+#       for keyframes only: PNG size as uint64, and the PNG of the image after adding the new genes
+#
+# When a genome got shorter, the start index is 0 and the record contains all genes.
+# Such records are always keyframes, so the genes after a keyframe are always appended to those before it.
+# Genes that are changed in place, like those of Abstract, are not noticed, so those genomes are not supported,
+# and neither are populations of more than one specimen, where the best specimen can switch to another lineage.
+# run_genetic_algorithm_strategy only accepts a journal for algorithms that mix in PaintOnTopMixin, with a single specimen.
+
+
+GENE_JOURNAL_MAGIC = b'GENEJRNL'
+GENE_JOURNAL_VERSION = 1
+
+RECORD_KIND_DELTA = b'D'
+RECORD_KIND_KEYFRAME = b'K'
+
+_RECORD_HEADER = struct.Struct( '<cQdQQ' )
+_SIZE = struct.Struct( '<Q' )
+_HEADER_SIZE = struct.Struct( '<I' )
+
+
+@dataclass
+class GeneJournalRecord:
+    kind            : bytes
+    generation      : int
+    score           : float
+    start_index     : int
+    new_genes       : GeneArray
+
+    # The encoded image, only set for keyframes
+    png             : Optional[ bytes ] = None
+
+    @property
+    def is_keyframe( self ) -> bool:
+        return self.kind == RECORD_KIND_KEYFRAME
+
+    @property
+    def n_genes( self ) -> int:
+        # the number of genes of the specimen after this record
+        return self.start_index + len( self.new_genes )
+
+    def get_image( self ) -> np.ndarray:
+        assert self.is_keyframe, 'Only keyframes have an image'
+        return cv2.imdecode( np.frombuffer( self.png, dtype = np.uint8 ), cv2.IMREAD_UNCHANGED )
+
+
+class GeneJournalWriter:
+
+    """
+    Appends records to a gene journal, see the comments at the top of this file
+    """
+
+    def __init__( self, path : Path, keyframe_interval : int = 1000 ):
+        assert keyframe_interval > 0
+        self._path = Path( path )
+        self._keyframe_interval = keyframe_interval
+        self._file : Optional[ BinaryIO ] = None
+        self._n_written_genes = 0
+        self._n_records_since_keyframe = 0
+        self.n_records = 0
+
+    def __enter__( self ) -> 'GeneJournalWriter':
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ) -> None:
+        self.close()
+
+    def _write_header( self, gene_type : type ) -> None:
+        header = json.dumps( {
+            'version' : GENE_JOURNAL_VERSION,
+            'gene_type' : gene_type.__name__,
+            'columns' : [
+                [ name, np.dtype( dtype ).str, width ]
+                for name, ( dtype, width ) in GENE_SCHEMAS[ gene_type ].columns.items()
+            ],
+        } ).encode()
+        self._file.write( GENE_JOURNAL_MAGIC )
+        self._file.write( _HEADER_SIZE.pack( len( header ) ) )
+        self._file.write( header )
+
+    def write( self, generation : int, score : float, genes : GeneArray, image : np.ndarray ) -> None:
+        """
+        Writes the genes that were added since the previous record.
+        image is the image of the specimen in the color space it is drawn in, like its cached_image,
+        which is only stored for keyframes.
+        """
+        assert isinstance( genes, GeneArray ), 'Gene journals only support genes in a GeneArray'
+        if self._file is None:
+            self._file = open( self._path, 'wb' )
+            self._write_header( genes.gene_type )
+
+        # a genome that got shorter has changed in other ways than appending genes, so we store all of it
+        start_index = self._n_written_genes if len( genes ) >= self._n_written_genes else 0
+        is_keyframe = (
+            self.n_records == 0
+            or start_index == 0
+            or self._n_records_since_keyframe + 1 >= self._keyframe_interval
+        )
+        kind = RECORD_KIND_KEYFRAME if is_keyframe else RECORD_KIND_DELTA
+        n_new_genes = len( genes ) - start_index
+
+        self._file.write( _RECORD_HEADER.pack( kind, generation, score, start_index, n_new_genes ) )
+        for name in GENE_SCHEMAS[ genes.gene_type ].columns:
+            self._file.write( np.ascontiguousarray( genes.get_column( name )[ start_index: ] ).tobytes() )
+        if is_keyframe:
+            is_success, png = cv2.imencode( '.png', image )
+            assert is_success, 'Could not encode keyframe'
+            self._file.write( _SIZE.pack( len( png ) ) )
+            self._file.write( png.tobytes() )
+            self._n_records_since_keyframe = 0
+        else:
+            self._n_records_since_keyframe += 1
+
+        self._n_written_genes = len( genes )
+        self.n_records += 1
+
+    def get_checkpoint_state( self ) -> Dict:
+        """
+        Everything needed to continue writing after the last record, see restore_checkpoint_state
+        """
+        self.flush()
+        return {
+            'n_bytes'                   : self._file.tell() if self._file is not None else 0,
+            'n_written_genes'           : self._n_written_genes,
+            'n_records_since_keyframe'  : self._n_records_since_keyframe,
+            'n_records'                 : self.n_records,
+        }
+
+    def restore_checkpoint_state( self, state : Dict ) -> None:
+        """
+        Continues writing after the records that were written before the checkpoint,
+        records written after the checkpoint are removed
+        """
+        if state[ 'n_bytes' ] == 0:
+            return
+        self._file = open( self._path, 'r+b' )
+        self._file.truncate( state[ 'n_bytes' ] )
+        self._file.seek( state[ 'n_bytes' ] )
+        self._n_written_genes = state[ 'n_written_genes' ]
+        self._n_records_since_keyframe = state[ 'n_records_since_keyframe' ]
+        self.n_records = state[ 'n_records' ]
+
+    def flush( self ) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync( self._file.fileno() )
+
+    def close( self ) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _read_exactly( file : BinaryIO, n_bytes : int ) -> bytes:
+    data = file.read( n_bytes )
+    if len( data ) != n_bytes:
+        raise EOFError( 'Gene journal ended in the middle of a record' )
+    return data
+
+
+def _read_header( file : BinaryIO ) -> Tuple[ type, List[ Tuple[ str, np.dtype, int ] ] ]:
+    magic = file.read( len( GENE_JOURNAL_MAGIC ) )
+    assert magic == GENE_JOURNAL_MAGIC, 'Not a gene journal'
+    header_size, = _HEADER_SIZE.unpack( _read_exactly( file, _HEADER_SIZE.size ) )
+    header = json.loads( _read_exactly( file, header_size ) )
+    assert header[ 'version' ] == GENE_JOURNAL_VERSION, f'Unsupported gene journal version {header[ "version" ]}'
+    gene_types_by_name : Dict[ str, type ] = { gene_type.__name__ : gene_type for gene_type in GENE_SCHEMAS }
+    columns = [ ( name, np.dtype( dtype ), width ) for name, dtype, width in header[ 'columns' ] ]
+    return gene_types_by_name[ header[ 'gene_type' ] ], columns
+
+
+def read_gene_journal( path : Path ) -> Iterator[ GeneJournalRecord ]:
+    """
+    Yields all records of a gene journal, in order.
+    Keyframe images are only decoded when asked for, see GeneJournalRecord.get_image.
+    A record that was only partially written, for example because the run crashed, ends the journal.
+    """
+    with open( path, 'rb' ) as file:
+        gene_type, columns = _read_header( file )
+        while True:
+            record_header = file.read( _RECORD_HEADER.size )
+            if len( record_header ) == 0:
+                return
+            try:
+                if len( record_header ) != _RECORD_HEADER.size:
+                    raise EOFError( 'Gene journal ended in the middle of a record' )
+                kind, generation, score, start_index, n_new_genes = _RECORD_HEADER.unpack( record_header )
+                column_values = { }
+                for name, dtype, width in columns:
+                    shape = ( n_new_genes, width ) if width > 1 else ( n_new_genes, )
+                    n_bytes = int( np.prod( shape ) ) * dtype.itemsize
+                    column_values[ name ] = np.frombuffer( _read_exactly( file, n_bytes ), dtype = dtype ).reshape( shape ).copy()
+                png = None
+                if kind == RECORD_KIND_KEYFRAME:
+                    png_size, = _SIZE.unpack( _read_exactly( file, _SIZE.size ) )
+                    png = _read_exactly( file, png_size )
+            except EOFError:
+                logger.warning( f'Ignoring the last record of {path}, which was only partially written' )
+                return
+
+            new_genes = GeneArray.__new__( GeneArray )
+            new_genes.__setstate__( { 'gene_type' : gene_type, 'columns' : column_values } )
+            yield GeneJournalRecord(
+                kind = kind,
+                generation = generation,
+                score = score,
+                start_index = start_index,
+                new_genes = new_genes,
+                png = png,
+            )
@@ -1,14 +1,31 @@
 import random
 
+from genetic_algorithms.common.checkpoint import GeneratorState, get_restored_population, restore_random_states
 from genetic_algorithms.common.genetic_algorithm_protocol import GeneticAlgorithm
-from typing import Generator
+from genetic_algorithms.common.profiler import NULL_PROFILER, NullProfiler
+from typing import Generator, Optional
 
 import numpy as np
 
 
-def make_genetic_algorithm_generator( genetic_algorithm : GeneticAlgorithm, random_seed : int = 1337 ) -> Generator:
+def make_genetic_algorithm_generator(
+        genetic_algorithm   : GeneticAlgorithm,
+        random_seed         : int = 1337,
+        state               : Optional[ GeneratorState ] = None,
+        profiler            : NullProfiler = NULL_PROFILER,
+) -> Generator:
     """
     A generator that for every iteration of the genetic algorithm returns results
+
+    Specimens from elsewhere, like the best specimens of other islands, see island_model.py,
+    can be sent into the generator with generator.send( immigrants ).
+    They join the parents of the next generation, and are only kept if they survive selection.
+    Iterating as usual sends None, which does not add anything.
+
+    The state is updated every generation, so that it can be stored in a checkpoint, see checkpoint.py
+    A state from a checkpoint continues from there, instead of starting over.
+
+    Every phase of every generation is timed by the profiler, see profiler.py
     """
     # use a seed to make things reproducible
     random.seed( random_seed )
@@ -16,36 +33,57 @@ def make_genetic_algorithm_generator( genetic_algorithm : GeneticAlgorithm, rand
 
     generation_index = 0
     parent_population = genetic_algorithm.get_initial_population()
+    if state is not None and state.is_resuming():
+        # the initial population is still created, since algorithms prepare things for it
+        parent_population = get_restored_population( parent_population, state.population )
+        generation_index = state.generation_index
+        restore_random_states( state )
 
     while not genetic_algorithm.is_done():
         generation_index += 1
+        profiler.begin_generation( generation_index )
 
         # Note that performing reproduction for the first time,
         # might not result in any offspring.
-        population = genetic_algorithm.apply_reproduction( parent_population )
-        genetic_algorithm.apply_mutation_inplace( population )
+        with profiler.phase( 'reproduction' ):
+            population = genetic_algorithm.apply_reproduction( parent_population )
+        with profiler.phase( 'mutation' ):
+            genetic_algorithm.apply_mutation_inplace( population )
+        profiler.count( 'n_offspring', len( population ) )
 
         # add non-mutated parents back to population,
         # to guarantee that fitness scores will never become worse
         population += parent_population
 
-        fitness_scores = genetic_algorithm.get_fitness( population )
-        selected_population, selected_fitness_scores = genetic_algorithm.apply_selection(
-            population,
-            fitness_scores,
-        )
+        with profiler.phase( 'fitness' ):
+            fitness_scores = genetic_algorithm.get_fitness( population )
+        profiler.count( 'n_scored', len( population ) )
+        with profiler.phase( 'selection' ):
+            selected_population, selected_fitness_scores = genetic_algorithm.apply_selection(
+                population,
+                fitness_scores,
+            )
 
         # Sort population on fitness
         # Lower fitness score is better!
-        scored_population = zip( selected_population, selected_fitness_scores )
-        get_fitness = lambda t : t[ 1 ]
-        population_sorted, fitness_scores_sorted = zip( *sorted( scored_population, key = get_fitness ) )
+        with profiler.phase( 'sorting' ):
+            scored_population = zip( selected_population, selected_fitness_scores )
+            get_fitness = lambda t : t[ 1 ]
+            population_sorted, fitness_scores_sorted = zip( *sorted( scored_population, key = get_fitness ) )
         best_specimen = population_sorted[0]
 
         # This population will be the parents of the next generation
         parent_population = list(population_sorted)
 
-        best_image = genetic_algorithm.get_specimen_image_rgb(best_specimen)
+        with profiler.phase( 'image' ):
+            best_image = genetic_algorithm.get_specimen_image_rgb(best_specimen)
         best_score = fitness_scores_sorted[0]
+        profiler.end_generation()
+
+        if state is not None:
+            state.generation_index = generation_index
+            state.population = parent_population
 
-        yield generation_index, best_image, best_score, best_specimen
+        immigrants = yield generation_index, best_image, best_score, best_specimen
+        if immigrants:
+            parent_population += immigrants
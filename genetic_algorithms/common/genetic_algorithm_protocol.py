@@ -44,3 +44,22 @@ class GeneticAlgorithm(Protocol):
     @abstractmethod
     def is_done( self ) -> bool:
         pass
+
+
+class InplaceGeneticAlgorithm( GeneticAlgorithm, Protocol ):
+    """
+    Additional functions that are expected to exist,
+    in order to use make_inplace_genetic_algorithm_generator
+    """
+
+    @abstractmethod
+    def begin_mutation_inplace( self, specimen : Specimen ) -> None:
+        pass
+
+    @abstractmethod
+    def commit_mutation_inplace( self, specimen : Specimen ) -> None:
+        pass
+
+    @abstractmethod
+    def revert_mutation_inplace( self, specimen : Specimen ) -> None:
+        pass
@@ -0,0 +1,74 @@
+import random
+
+from genetic_algorithms.common.checkpoint import GeneratorState, get_restored_population, restore_random_states
+from genetic_algorithms.common.genetic_algorithm_protocol import InplaceGeneticAlgorithm
+from genetic_algorithms.common.profiler import NULL_PROFILER, NullProfiler
+from typing import Generator, Optional
+
+import numpy as np
+
+
+def make_inplace_genetic_algorithm_generator(
+        genetic_algorithm   : InplaceGeneticAlgorithm,
+        random_seed         : int = 1337,
+        state               : Optional[ GeneratorState ] = None,
+        profiler            : NullProfiler = NULL_PROFILER,
+) -> Generator:
+    """
+    A generator that for every iteration of the genetic algorithm returns results,
+    just like make_genetic_algorithm_generator, but for a population of a single specimen.
+
+    Instead of copying the specimen, mutating the copy and selecting the best of the two,
+    we mutate the specimen in place, and revert the mutation if it made the fitness score worse.
+    Note that the yielded image and specimen are therefore modified by the next iteration.
+    See make_genetic_algorithm_generator for the state and the profiler.
+    """
+    # use a seed to make things reproducible
+    random.seed( random_seed )
+    np.random.seed( random_seed )
+
+    generation_index = 0
+    initial_population = genetic_algorithm.get_initial_population()
+    assert len( initial_population ) == 1, 'Mutating in place only works for a population of a single specimen'
+    specimen = initial_population[ 0 ]
+    if state is not None and state.is_resuming():
+        # the initial population is still created, since algorithms prepare things for it
+        specimen = get_restored_population( initial_population, state.population )[ 0 ]
+        best_score = state.best_score
+        generation_index = state.generation_index
+        restore_random_states( state )
+    else:
+        best_score = genetic_algorithm.get_fitness( [ specimen ] )[ 0 ]
+
+    while not genetic_algorithm.is_done():
+        generation_index += 1
+        profiler.begin_generation( generation_index )
+
+        with profiler.phase( 'mutation' ):
+            genetic_algorithm.begin_mutation_inplace( specimen )
+            genetic_algorithm.apply_mutation_inplace( [ specimen ] )
+        with profiler.phase( 'fitness' ):
+            score = genetic_algorithm.get_fitness( [ specimen ] )[ 0 ]
+        profiler.count( 'n_scored' )
+
+        # Lower fitness score is better!
+        # On equal scores we keep the mutation,
+        # just like sorting a population with the mutated specimen in front of its parent would.
+        with profiler.phase( 'selection' ):
+            if score <= best_score:
+                genetic_algorithm.commit_mutation_inplace( specimen )
+                best_score = score
+                profiler.count( 'n_accepted' )
+            else:
+                genetic_algorithm.revert_mutation_inplace( specimen )
+
+        with profiler.phase( 'image' ):
+            best_image = genetic_algorithm.get_specimen_image_rgb( specimen )
+        profiler.end_generation()
+
+        if state is not None:
+            state.generation_index = generation_index
+            state.population = [ specimen ]
+            state.best_score = best_score
+
+        yield generation_index, best_image, best_score, specimen
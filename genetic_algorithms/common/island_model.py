@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+import logging
+import multiprocessing
+import queue
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.common.reproduction import random_list_crossover
+from utils.shared_arrays import SharedArrayHandle, SharedArrays
+
+
+logger = logging.getLogger(__name__)
+
+
+# The island model runs a separate population on every island, every island in its own process.
+# Every migration_interval generations, every island sends the genes of its best specimen to the next island in a ring,
+# and receives the genes of the best specimen of the previous island.
+# Immigrants are crossed with the best local specimen,
+# and the immigrant and both children join the parents of the next generation, see make_genetic_algorithm_generator.
+# Islands wait for their immigrants, so every island runs the same number of generations,
+# and results do not depend on how fast the islands happen to run.
+#
+# Genetic algorithms on islands need get_specimen_genes, and get_specimen_from_genes to turn received genes into specimens,
+# like Abstract has.
+
+
+@dataclass
+class IslandResult:
+    island_index    : int
+    random_seed     : int
+    best_score      : float
+    best_genes      : Any
+    best_image_rgb  : np.ndarray
+
+    # ( seconds since the island started, generation, best score ) for every generation
+    history         : List[ Tuple[ float, int, float ] ]
+
+
+def _get_immigrants( genetic_algorithm, best_specimen, immigrant_genes ) -> List:
+    # random_list_crossover shuffles its input in place, and returns children with copies of the genes
+    parent_genes = [ genetic_algorithm.get_specimen_genes( best_specimen ), immigrant_genes ]
+    children_genes = random_list_crossover( parent_genes )
+    return [
+        genetic_algorithm.get_specimen_from_genes( genes )
+        for genes in [ immigrant_genes, *children_genes ]
+    ]
+
+
+def _run_island(
+        island_index        : int,
+        f_get               : Callable,
+        target_image        : SharedArrayHandle,
+        algorithm_arguments : Dict,
+        n_generations       : int,
+        migration_interval  : int,
+        random_seed         : int,
+        inbox               : Optional[ multiprocessing.Queue ],
+        outbox              : Optional[ multiprocessing.Queue ],
+        result_queue        : multiprocessing.Queue,
+) -> None:
+    # worker processes do not inherit logging configuration when they are spawned
+    logging.basicConfig( level = logging.INFO )
+    genetic_algorithm = f_get( target_image.attach(), **algorithm_arguments )
+    genetic_generator = make_genetic_algorithm_generator( genetic_algorithm, random_seed )
+
+    history = [ ]
+    start_time = time.perf_counter()
+    immigrants = None
+    try:
+        while True:
+            generation, best_image_rgb, best_score, best_specimen = genetic_generator.send( immigrants )
+            history.append( ( time.perf_counter() - start_time, generation, best_score ) )
+            if generation >= n_generations:
+                break
+
+            immigrants = None
+            if outbox is not None and generation % migration_interval == 0:
+                # send before receiving, otherwise all islands would wait for each other
+                outbox.put( genetic_algorithm.get_specimen_genes( best_specimen ) )
+                immigrants = _get_immigrants( genetic_algorithm, best_specimen, inbox.get() )
+    finally:
+        genetic_algorithm.close()
+
+    logger.info( f'Island {island_index} finished {n_generations} generations with score {best_score}' )
+    result_queue.put( IslandResult(
+        island_index = island_index,
+        random_seed = random_seed,
+        best_score = best_score,
+        best_genes = genetic_algorithm.get_specimen_genes( best_specimen ),
+        best_image_rgb = best_image_rgb,
+        history = history,
+    ) )
+
+
+def run_island_model(
+        f_get               : Callable,
+        target_image        : np.ndarray,
+        algorithm_arguments : Optional[ Dict ] = None,
+        n_islands           : int = 4,
+        n_generations       : int = 1000,
+        migration_interval  : int = 50,
+        random_seed         : int = 1337,
+) -> List[ IslandResult ]:
+    """
+    Runs a genetic algorithm on n_islands islands, each in its own process,
+    see the comments at the top of this file.
+    f_get creates the genetic algorithm for the target image, like genetic_algorithms.impl.abstract.get,
+    and has to be a module level function, so that it can be sent to the worker processes.
+    Every island gets its own seed, random_seed + its index.
+    Results are returned in the order of the islands.
+    """
+    assert migration_interval > 0
+    context = multiprocessing.get_context()
+    # island i sends to queue i, which is read by island i + 1
+    queues = [ context.Queue() for _ in range( n_islands ) ] if n_islands > 1 else None
+    result_queue = context.Queue()
+
+    logger.info( f'Running {n_islands} islands for {n_generations} generations, migrating every {migration_interval} generations' )
+    with SharedArrays() as shared_arrays:
+        shared_target_image = shared_arrays.share( target_image )
+        processes = [
+            context.Process(
+                target = _run_island,
+                args = (
+                    island_index,
+                    f_get,
+                    shared_target_image,
+                    algorithm_arguments or { },
+                    n_generations,
+                    migration_interval,
+                    random_seed + island_index,
+                    queues[ island_index - 1 ] if queues else None,
+                    queues[ island_index ] if queues else None,
+                    result_queue,
+                ),
+            )
+            for island_index in range( n_islands )
+        ]
+        for process in processes:
+            process.start()
+        # results have to be received before joining, since a process does not exit while its queue is not empty
+        results = [ ]
+        while len( results ) < n_islands:
+            try:
+                results.append( result_queue.get( timeout = 1 ) )
+            except queue.Empty:
+                # the other islands would wait forever for the immigrants of an island that died
+                failed_processes = [ process for process in processes if process.exitcode not in ( None, 0 ) ]
+                if failed_processes:
+                    for process in processes:
+                        process.terminate()
+                    raise RuntimeError( f'{len( failed_processes )} islands failed' )
+        for process in processes:
+            process.join()
+
+    results = sorted( results, key = lambda result : result.island_index )
+    best_result = min( results, key = lambda result : result.best_score )
+    logger.info( f'Best score {best_result.best_score} on island {best_result.island_index}' )
+    return results
+
+
+def get_best_score_over_time( results : List[ IslandResult ] ) -> List[ Tuple[ float, float ] ]:
+    """
+    Returns ( seconds, best score of all islands so far ), for every generation of every island
+    """
+    history = sorted( ( seconds, score ) for result in results for seconds, _, score in result.history )
+    best_scores = np.minimum.accumulate( [ score for _, score in history ] )
+    return [ ( seconds, float( best_score ) ) for ( seconds, _ ), best_score in zip( history, best_scores ) ]
@@ -32,4 +32,8 @@ def mutate_specimen_inplace(
 
     for i in mutation_indices:
         chosen_mutation = random.choices( mutation_functions, weights = mutation_weights )[ 0 ]
-        chosen_mutation( specimen.genes[i] )
+        # Mutations change the gene in place,
+        # but genes from a GeneArray are copies, so we have to write them back
+        gene = specimen.genes[i]
+        chosen_mutation( gene )
+        specimen.genes[i] = gene
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from genetic_algorithms.common.genetic_algorithm_protocol import Specimen, Image
+from primitives.rectangle import Rectangle
+from utils.absolute_difference_image import get_absolute_difference_image
+
+
+class PaintOnTopMixin( ABC ):
+
+    """
+    For genetic algorithms that only add new genes on top of their specimen, like Painting and Pointillism,
+    which draw every new gene directly on the cached image, instead of drawing all genes again.
+
+    Mix this in before SimpleGeneticAlgorithmBase, which provides the state and the dirty rectangles used here.
+    Concrete algorithms implement how to sample, locate and draw a single gene.
+    """
+
+    def is_append_only( self ) -> bool:
+        """
+        Whether the genes of every best specimen start with the genes of the best specimen before it,
+        which gene journals rely on, see genetic_algorithms/common/gene_journal.py.
+        With more than one specimen, the best specimen can switch to another lineage.
+        """
+        return self._n_population == 1
+
+    @abstractmethod
+    def _sample_new_gene( self, specimen : Specimen ):
+        pass
+
+    @abstractmethod
+    def _get_gene_rectangle( self, gene, image_shape ) -> Rectangle:
+        """
+        The region of an image of image_shape that drawing the gene can change
+        """
+        pass
+
+    @abstractmethod
+    def _draw_gene_on_image( self, gene, image : Image ) -> None:
+        pass
+
+    def _get_initial_image( self, blank_image : Image ) -> Image:
+        """
+        Returns a copy of the blank image, with the initial genes drawn on top, if any,
+        see SimpleGeneticAlgorithmBase.set_initial_genes
+        """
+        initial_image = blank_image.copy()
+        for gene in self._initial_genes or [ ]:
+            self._draw_gene_on_image( gene, initial_image )
+        return initial_image
+
+    def _get_initial_absolute_difference_image( self, blank_image : Image, initial_image : Image ) -> Image:
+        if self._initial_genes is None:
+            return self._get_blank_absolute_difference_image( blank_image )
+        return get_absolute_difference_image( initial_image, self._target_image )
+
+    def _add_gene( self, specimen : Specimen, gene, rectangle : Rectangle ) -> None:
+        self._mark_rectangle_dirty( specimen, rectangle )
+        self._draw_gene_on_image( gene, specimen.cached_image )
+        self.get_specimen_genes( specimen ).append( gene )
+
+    def _get_local_difference_delta( self, specimen : Specimen, gene, rectangle : Rectangle ) -> float:
+        """
+        Returns by how much the sum of the diff image would change by drawing the gene,
+        by only drawing it and comparing it with the target image inside its rectangle.
+        The cached image is restored afterwards.
+        This expects the diff image to be up to date with the cached image.
+        """
+        region = rectangle.get_slices()
+        cached_image_patch = specimen.cached_image[ region ].copy()
+        self._draw_gene_on_image( gene, specimen.cached_image )
+        new_region_sum = float( np.sum( get_absolute_difference_image( specimen.cached_image[ region ], self._target_image[ region ] ) ) )
+        specimen.cached_image[ region ] = cached_image_patch
+        return new_region_sum - float( np.sum( specimen.diff_image[ region ] ) )
+
+    def _add_new_genes( self, specimen : Specimen ) -> None:
+        """
+        Adds a new gene on top of the specimen.
+
+        With n_candidates larger than 1, we sample that many candidate genes,
+        and score each of them only on its own rectangle, instead of on the entire image.
+        The best candidate is added, whether it is an improvement or not,
+        so that the genetic algorithm still decides whether to keep the mutation.
+        With n_committed_candidates larger than 1, other candidates that improve the image are added too,
+        as long as they do not overlap any of the added candidates,
+        so that their improvements simply add up.
+        This gives more accepted genes per generation, and thus per second,
+        because the overhead of a generation is only paid once.
+        """
+        if self._n_candidates == 1:
+            gene = self._sample_new_gene( specimen )
+            self._add_gene( specimen, gene, self._get_gene_rectangle( gene, specimen.cached_image.shape ) )
+            return
+
+        scored_candidates = [ ]
+        for _ in range( self._n_candidates ):
+            gene = self._sample_new_gene( specimen )
+            rectangle = self._get_gene_rectangle( gene, specimen.cached_image.shape )
+            delta = self._get_local_difference_delta( specimen, gene, rectangle )
+            scored_candidates.append( ( delta, gene, rectangle ) )
+
+        # sorting is stable, so on equal deltas the candidate that was sampled first wins
+        scored_candidates.sort( key = lambda scored_candidate : scored_candidate[ 0 ] )
+        committed_candidates = scored_candidates[ :1 ]
+        for delta, gene, rectangle in scored_candidates[ 1: ]:
+            if len( committed_candidates ) == self._n_committed_candidates or delta >= 0:
+                break
+            if not any( rectangle.overlaps( committed_rectangle ) for _, _, committed_rectangle in committed_candidates ):
+                committed_candidates.append( ( delta, gene, rectangle ) )
+
+        for _, gene, rectangle in committed_candidates:
+            self._add_gene( specimen, gene, rectangle )
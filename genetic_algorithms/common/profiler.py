@@ -0,0 +1,165 @@
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import csv
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Deque, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Profilers record how long every phase of every generation takes, like reproduction, mutation and fitness,
+# together with counters, like the number of specimens scored.
+# Generators always use a profiler, which by default is NULL_PROFILER, that does not record anything,
+# so that profiling costs next to nothing when it is not used.
+
+
+class NullProfiler:
+
+    _NULL_CONTEXT = nullcontext()
+
+    def begin_generation( self, generation_index : int ) -> None:
+        pass
+
+    def phase( self, name : str ):
+        return self._NULL_CONTEXT
+
+    def count( self, name : str, n : int = 1 ) -> None:
+        pass
+
+    def end_generation( self ) -> None:
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class GenerationProfiler( NullProfiler ):
+
+    """
+    Records the duration of every phase, and all counters, for every generation.
+    Every summary_interval generations, the mean durations over the last summary_window generations are logged,
+    so that a long run shows where its time goes while it runs, and how that changes as it converges.
+
+        with profiler.phase( 'fitness' ):
+            fitness_scores = genetic_algorithm.get_fitness( population )
+    """
+
+    def __init__( self, summary_interval : Optional[ int ] = 1000, summary_window : int = 1000 ):
+        self._summary_interval = summary_interval
+        self._generation_indices : List[ int ] = [ ]
+
+        # a list of values per phase or counter, with a value for every generation
+        self._phase_durations : Dict[ str, List[ float ] ] = { }
+        self._counters : Dict[ str, List[ int ] ] = { }
+        self._current_phase_durations : Dict[ str, float ] = { }
+        self._current_counters : Dict[ str, int ] = { }
+        self._recent_phase_durations : Deque[ Dict[ str, float ] ] = deque( maxlen = summary_window )
+
+    @property
+    def n_generations( self ) -> int:
+        return len( self._generation_indices )
+
+    def begin_generation( self, generation_index : int ) -> None:
+        self._current_generation_index = generation_index
+        self._current_phase_durations = { }
+        self._current_counters = { }
+
+    @contextmanager
+    def phase( self, name : str ) -> Iterator[ None ]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            self._current_phase_durations[ name ] = self._current_phase_durations.get( name, 0.0 ) + duration
+
+    def count( self, name : str, n : int = 1 ) -> None:
+        self._current_counters[ name ] = self._current_counters.get( name, 0 ) + n
+
+    @staticmethod
+    def _append_values( columns : Dict[ str, List ], values : Dict, n_previous : int, default ) -> None:
+        # phases and counters that show up later get default values for earlier generations
+        for name in values:
+            if name not in columns:
+                columns[ name ] = [ default ] * n_previous
+        for name, column in columns.items():
+            column.append( values.get( name, default ) )
+
+    def end_generation( self ) -> None:
+        n_previous = self.n_generations
+        self._append_values( self._phase_durations, self._current_phase_durations, n_previous, 0.0 )
+        self._append_values( self._counters, self._current_counters, n_previous, 0 )
+        self._generation_indices.append( self._current_generation_index )
+        self._recent_phase_durations.append( self._current_phase_durations )
+
+        if self._summary_interval and self.n_generations % self._summary_interval == 0:
+            self.log_rolling_summary()
+
+    def get_rolling_summary( self ) -> Dict[ str, float ]:
+        """
+        Returns the mean duration of every phase in milliseconds, over the most recent generations
+        """
+        n_recent = len( self._recent_phase_durations )
+        if n_recent == 0:
+            return { }
+        summary = { }
+        for phase_durations in self._recent_phase_durations:
+            for name, duration in phase_durations.items():
+                summary[ name ] = summary.get( name, 0.0 ) + duration
+        return { name : 1000 * total_duration / n_recent for name, total_duration in summary.items() }
+
+    def log_rolling_summary( self ) -> None:
+        summary = self.get_rolling_summary()
+        total_milliseconds = sum( summary.values() )
+        phase_strings = [
+            f'{name} {milliseconds:.3f} ms ({milliseconds / total_milliseconds:.0%})'
+            for name, milliseconds in sorted( summary.items(), key = lambda item : -item[ 1 ] )
+        ] if total_milliseconds > 0 else [ ]
+        logger.info(
+            f'Mean of the last {len( self._recent_phase_durations )} generations: '
+            f'{total_milliseconds:.3f} ms per generation, ' + ', '.join( phase_strings )
+        )
+
+    def get_summary( self ) -> Dict[ str, Dict[ str, float ] ]:
+        """
+        Returns the total and mean duration of every phase over all generations, and its share of the total
+        """
+        total_duration = sum( sum( durations ) for durations in self._phase_durations.values() )
+        return {
+            name : {
+                'total_seconds' : sum( durations ),
+                'mean_milliseconds' : 1000 * sum( durations ) / len( durations ),
+                'share' : sum( durations ) / total_duration if total_duration > 0 else 0.0,
+            }
+            for name, durations in self._phase_durations.items()
+        }
+
+    def write_json( self, path : Path ) -> None:
+        with open( path, 'w' ) as json_file:
+            json.dump( {
+                'n_generations' : self.n_generations,
+                'summary' : self.get_summary(),
+                'generation_indices' : self._generation_indices,
+                'phase_seconds' : self._phase_durations,
+                'counters' : self._counters,
+            }, json_file )
+        logger.info( f'Wrote profile to {path}' )
+
+    def write_csv( self, path : Path ) -> None:
+        # a row per generation, with the durations of phases in milliseconds
+        phase_names = list( self._phase_durations )
+        counter_names = list( self._counters )
+        with open( path, 'w', newline = '' ) as csv_file:
+            writer = csv.writer( csv_file )
+            writer.writerow( [ 'generation', *( f'{name}_ms' for name in phase_names ), *counter_names ] )
+            for i_generation, generation_index in enumerate( self._generation_indices ):
+                writer.writerow( [
+                    generation_index,
+                    *( round( 1000 * self._phase_durations[ name ][ i_generation ], 6 ) for name in phase_names ),
+                    *( self._counters[ name ][ i_generation ] for name in counter_names ),
+                ] )
+        logger.info( f'Wrote profile to {path}' )
@@ -2,6 +2,7 @@ import copy
 import random
 
 from genetic_algorithms.common.genetic_algorithm_protocol import Population
+from primitives.gene_array import make_genes_like
 
 
 def specimen_random_distribute_crossover( parent_1, parent_2 ):
@@ -29,7 +30,8 @@ def specimen_random_distribute_crossover( parent_1, parent_2 ):
         else :
             child_2.append( longer_parent[ gene_i ] )
 
-    return child_1, child_2
+    # children use the same kind of gene container as their parents, like a GeneArray
+    return make_genes_like( parent_1, child_1 ), make_genes_like( parent_1, child_2 )
 
 
 def random_list_crossover( population : Population ) -> Population:
@@ -0,0 +1,136 @@
+import copy
+import logging
+import pickle
+import queue
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+# Result writers write the intermediate and final results of a run,
+# an image, and optionally the pickled specimen.
+# Encoding a PNG and writing a large pickle can take hundreds of milliseconds for large images,
+# which AsyncResultWriter moves off the evolution loop, to a background thread.
+# What happens when the background thread can not keep up is decided by a policy:
+# block waits until there is room in the queue again, drop skips the result.
+# Final results are never dropped.
+
+
+WRITE_POLICY_BLOCK = 'block'
+WRITE_POLICY_DROP = 'drop'
+
+
+class ResultWriter:
+
+    """
+    Writes results immediately, on the calling thread
+    """
+
+    def __init__( self, output_directory_path, is_pickling_desired : bool ):
+        self._output_directory_path = output_directory_path
+        self._is_pickling_desired = is_pickling_desired
+
+    def __enter__( self ) -> 'ResultWriter':
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ) -> None:
+        self.close()
+
+    def _write_files( self, report_string : str, image : np.ndarray, specimen_state : Optional[ Dict ] ) -> None:
+        cv2.imwrite( f'{self._output_directory_path}/{report_string}.png', image )
+        if specimen_state is not None:
+            pickle_file_path = f'{self._output_directory_path}/{report_string}.pickle'
+            with open( pickle_file_path, 'wb' ) as pickle_file:
+                pickle.dump( specimen_state, pickle_file )
+
+    def write( self, report_string : str, image : np.ndarray, specimen, is_final : bool = False ) -> None:
+        self._write_files( report_string, image, specimen.__dict__ if self._is_pickling_desired else None )
+
+    def flush( self ) -> None:
+        pass
+
+    def close( self ) -> None:
+        pass
+
+
+class AsyncResultWriter( ResultWriter ):
+
+    """
+    Writes results on a background thread, through a queue of at most max_queue_size results.
+
+    Results are snapshotted when they are queued, since generators may modify the yielded image and specimen in place,
+    see make_inplace_genetic_algorithm_generator.
+    The image and the fields of the specimen are copied, which only copies a few arrays,
+    and the copy of the specimen is pickled on the background thread, like the image is encoded there.
+    Closing waits until everything in the queue is written, and raises any error of the background thread.
+    """
+
+    def __init__(
+            self,
+            output_directory_path,
+            is_pickling_desired : bool,
+            max_queue_size      : int = 4,
+            policy              : str = WRITE_POLICY_BLOCK,
+    ):
+        assert policy in ( WRITE_POLICY_BLOCK, WRITE_POLICY_DROP ), f'Unknown write policy "{policy}"'
+        super().__init__( output_directory_path, is_pickling_desired )
+        self._policy = policy
+        self._queue = queue.Queue( maxsize = max_queue_size )
+        self._error : Optional[ BaseException ] = None
+        self.n_written = 0
+        self.n_dropped = 0
+        self._thread = threading.Thread( target = self._write_queued_results, name = 'AsyncResultWriter', daemon = True )
+        self._thread.start()
+
+    def _get_specimen_snapshot( self, specimen ) -> Optional[ Dict ]:
+        if not self._is_pickling_desired:
+            return None
+        # genes are in a GeneArray, so this copies arrays, instead of every gene as a separate object
+        return copy.deepcopy( specimen.__dict__ )
+
+    def _write_queued_results( self ) -> None:
+        while True:
+            result = self._queue.get()
+            if result is None:
+                self._queue.task_done()
+                return
+            try:
+                self._write_files( *result )
+                self.n_written += 1
+            except BaseException as error:
+                # we keep emptying the queue, so that writing never blocks forever
+                logger.exception( 'Writing results failed' )
+                self._error = self._error or error
+            self._queue.task_done()
+
+    def write( self, report_string : str, image : np.ndarray, specimen, is_final : bool = False ) -> None:
+        assert self._thread.is_alive(), 'The writer was closed'
+        result = ( report_string, image.copy(), self._get_specimen_snapshot( specimen ) )
+        if is_final or self._policy == WRITE_POLICY_BLOCK:
+            self._queue.put( result )
+            return
+        try:
+            self._queue.put_nowait( result )
+        except queue.Full:
+            self.n_dropped += 1
+            logger.debug( f'Dropped {report_string}, the writer can not keep up' )
+
+    def flush( self ) -> None:
+        """
+        Waits until everything in the queue is written
+        """
+        self._queue.join()
+
+    def close( self ) -> None:
+        if self._thread.is_alive():
+            self._queue.put( None )
+            self._thread.join()
+            logger.info( f'Wrote {self.n_written} results, dropped {self.n_dropped}' )
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
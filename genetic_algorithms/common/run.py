@@ -1,16 +1,32 @@
+from contextlib import closing, nullcontext
+from copy import deepcopy
 from datetime import datetime
 import logging
 import os
 from pathlib import Path
-import pickle
 from runpy import run_path
 from shutil import rmtree
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Optional, Sequence
 
 import cv2
 
+from genetic_algorithms.common.checkpoint import (
+    CHECKPOINT_FILE_NAME,
+    GeneratorState,
+    load_checkpoint,
+    remove_results_after_generation,
+    save_checkpoint,
+)
+from genetic_algorithms.common.gene_journal import GeneJournalWriter
 from genetic_algorithms.common.genetic_algorithm_protocol import GeneticAlgorithm
 from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.common.inplace_genetic_algorithm_generator import make_inplace_genetic_algorithm_generator
+from genetic_algorithms.common.paint_on_top_mixin import PaintOnTopMixin
+from genetic_algorithms.common.profiler import NULL_PROFILER, GenerationProfiler
+from genetic_algorithms.common.result_writer import WRITE_POLICY_BLOCK, AsyncResultWriter, ResultWriter
+from genetic_algorithms.common.termination import ConvergenceCurve, RunProgress, TerminationPolicy, get_terminating_policy
+from primitives.gene_array import get_scaled_genes
 
 
 logger = logging.getLogger(__name__)
@@ -27,71 +43,196 @@ def run_genetic_algorithm_strategy(
     score_interval              : int,
     is_pickling_desired         : bool,
     termination_score           : int,
+    use_inplace_generator       : bool = False,
+    random_seed                 : int = 1337,
+    # write results on a background thread, see genetic_algorithms/common/result_writer.py
+    use_async_result_writer     : bool = True,
+    result_write_policy         : str = WRITE_POLICY_BLOCK,
+    # Append the genes of every improvement to a journal, which is much smaller than pickling every result,
+    # so results are not pickled when the journal is used.
+    # Only for algorithms that only append genes to a single specimen, see genetic_algorithms/common/gene_journal.py
+    use_gene_journal            : bool = False,
+    gene_journal_keyframe_interval : int = 1000,
+    # Write a checkpoint to the output directory whenever this many seconds have passed since the last one,
+    # and continue from the checkpoint in the output directory, if there is one, when resuming,
+    # see genetic_algorithms/common/checkpoint.py
+    checkpoint_interval_seconds : Optional[ float ] = None,
+    resume                      : bool = False,
+    # Time every phase of every generation, and write the timings to the output directory when done,
+    # see genetic_algorithms/common/profiler.py
+    profiler                    : Optional[ GenerationProfiler ] = None,
+    # Stop on a budget of time or compute, next to patience and the termination score, whichever comes first,
+    # and write the convergence curve to the output directory when done, see genetic_algorithms/common/termination.py
+    termination_policies        : Sequence[ TerminationPolicy ] = ( ),
+    is_convergence_curve_desired : bool = False,
 ) -> Any:
     last_rounded_score = 100 * SCORE_MULTIPLIER
     last_written_score = last_rounded_score
     n_iterations_with_same_score = 0
-    last_update_time = datetime.now()
-
-    genetic_generator = make_genetic_algorithm_generator( genetic_algorithm_strategy )
-
-    def write_results(report_string, best_image_rgb, best_specimen_raw):
-        cv2.imwrite( f'{output_directory_path}/{report_string}.png', best_image_rgb )
-        # store pickled specimen if desired
-        if is_pickling_desired :
-            pickle_file_path = f'{output_directory_path}/{report_string}.pickle'
-            with open( pickle_file_path, 'wb' ) as pickle_file :
-                pickle.dump( best_specimen_raw.__dict__, pickle_file )
+    last_update_time = time.perf_counter()
+    previous_elapsed_seconds = 0.0
+    is_convergence_curve_desired = is_convergence_curve_desired or len( termination_policies ) > 0
+    convergence_curve = ConvergenceCurve()
+
+    checkpoint_path = Path( output_directory_path ) / CHECKPOINT_FILE_NAME
+    checkpoint = load_checkpoint( checkpoint_path ) if resume else None
+    generator_state = None
+    if checkpoint is not None:
+        generator_state = checkpoint.generator_state
+        last_rounded_score = checkpoint.run_state[ 'last_rounded_score' ]
+        last_written_score = checkpoint.run_state[ 'last_written_score' ]
+        n_iterations_with_same_score = checkpoint.run_state[ 'n_iterations_with_same_score' ]
+        previous_elapsed_seconds = checkpoint.run_state.get( 'elapsed_seconds', 0.0 )
+        convergence_curve = checkpoint.run_state.get( 'convergence_curve' ) or convergence_curve
+        remove_results_after_generation( output_directory_path, generator_state.generation_index )
+    elif checkpoint_interval_seconds is not None:
+        generator_state = GeneratorState()
+    last_checkpoint_time = time.perf_counter()
+
+    # Mutating in place avoids copying the specimen every generation,
+    # but only works for algorithms that paint on top of a single specimen
+    if use_inplace_generator:
+        genetic_generator = make_inplace_genetic_algorithm_generator( genetic_algorithm_strategy, random_seed, generator_state, profiler or NULL_PROFILER )
+    else:
+        genetic_generator = make_genetic_algorithm_generator( genetic_algorithm_strategy, random_seed, generator_state, profiler or NULL_PROFILER )
+
+    if use_gene_journal:
+        # a journal of an algorithm that changes or replaces genes could not be replayed
+        assert isinstance( genetic_algorithm_strategy, PaintOnTopMixin ) and genetic_algorithm_strategy.is_append_only(), \
+            'Gene journals only support algorithms that only append genes to a single specimen'
+    if use_gene_journal and is_pickling_desired:
+        logger.info( 'Not pickling results, since the gene journal already has the genes of every improvement' )
+        is_pickling_desired = False
+    if use_async_result_writer:
+        result_writer = AsyncResultWriter( output_directory_path, is_pickling_desired, policy = result_write_policy )
+    else:
+        result_writer = ResultWriter( output_directory_path, is_pickling_desired )
+    gene_journal_writer = GeneJournalWriter( Path( output_directory_path ) / 'genes.journal', gene_journal_keyframe_interval ) if use_gene_journal else None
+    if gene_journal_writer is not None and checkpoint is not None:
+        gene_journal_writer.restore_checkpoint_state( checkpoint.run_state[ 'gene_journal' ] )
+
+    def write_gene_journal( generation, best_score, best_specimen_raw ):
+        if gene_journal_writer is not None:
+            gene_journal_writer.write(
+                generation,
+                best_score,
+                genetic_algorithm_strategy.get_specimen_genes( best_specimen_raw ),
+                best_specimen_raw.cached_image,
+            )
 
     logger.info('Running visual genetic algorithm')
     start_time = datetime.now()
+    # time spent before continuing from a checkpoint counts towards the budget of termination policies
+    run_start_time = time.perf_counter() - previous_elapsed_seconds
     best_specimen_raw = None  # just to make sure that the variable exists in case the generator is empty
-    for generation, best_image_rgb, best_score, best_specimen_raw in genetic_generator:
-        current_update_time = datetime.now()
-        update_time_microseconds = ( current_update_time - last_update_time ).microseconds
-        last_update_time = current_update_time
-
-        # we want to use the score (commonly an equality percentage) and 3 decimals
-        rounded_score = round( best_score * 100 * SCORE_MULTIPLIER )
-        report_string = f'gen_{generation:06d}__dt_{update_time_microseconds}_ms__score_{rounded_score}'
-
-        logger.info( report_string )
-
-        # if score does not change, have patience.
-        if rounded_score == last_rounded_score:
-            n_iterations_with_same_score += 1
-        else:
-            n_iterations_with_same_score = 0
-
-            # We only write images if they show enough improvement compared to the last written one
-            if last_written_score - rounded_score >= score_interval:
-                write_results( report_string, best_image_rgb, best_specimen_raw)
-                last_written_score = rounded_score
-
-        # if ran out of patience, write the final result, and break
-        if (
-            n_iterations_with_same_score == n_iterations_patience
-            or rounded_score <= termination_score
-        ):
-            write_results( report_string, best_image_rgb, best_specimen_raw)
-            logger.info( 'Ran out of patience' )
-            break
-
-        last_rounded_score = rounded_score
+    # closing the writers waits until all results are written, also when something goes wrong,
+    # and closing the genetic algorithm stops its worker processes, if any
+    with result_writer, ( gene_journal_writer or nullcontext() ), closing( genetic_algorithm_strategy ):
+        for generation, best_image_rgb, best_score, best_specimen_raw in genetic_generator:
+            current_update_time = time.perf_counter()
+            update_time_milliseconds = round( 1000 * ( current_update_time - last_update_time ) )
+            last_update_time = current_update_time
+
+            # we want to use the score (commonly an equality percentage) and 3 decimals
+            rounded_score = round( best_score * 100 * SCORE_MULTIPLIER )
+            report_string = f'gen_{generation:06d}__dt_{update_time_milliseconds}_ms__score_{rounded_score}'
+
+            logger.info( report_string )
+
+            progress = None
+            if is_convergence_curve_desired:
+                progress = RunProgress(
+                    generation = generation,
+                    seconds = current_update_time - run_start_time,
+                    best_score = best_score,
+                    n_genes = len( genetic_algorithm_strategy.get_specimen_genes( best_specimen_raw ) ),
+                )
+                if rounded_score != last_rounded_score:
+                    convergence_curve.add( progress )
+            terminating_policy = get_terminating_policy( termination_policies, progress ) if termination_policies else None
+
+            # if score does not change, have patience.
+            if rounded_score == last_rounded_score:
+                n_iterations_with_same_score += 1
+            else:
+                n_iterations_with_same_score = 0
+                write_gene_journal( generation, best_score, best_specimen_raw )
+
+                # We only write images if they show enough improvement compared to the last written one
+                if last_written_score - rounded_score >= score_interval:
+                    result_writer.write( report_string, best_image_rgb, best_specimen_raw )
+                    last_written_score = rounded_score
+
+            # if ran out of patience, or budget, write the final result, and break
+            if (
+                n_iterations_with_same_score == n_iterations_patience
+                or rounded_score <= termination_score
+                or terminating_policy is not None
+            ):
+                result_writer.write( report_string, best_image_rgb, best_specimen_raw, is_final = True )
+                # improvements were already written to the journal and the convergence curve
+                if rounded_score == last_rounded_score:
+                    write_gene_journal( generation, best_score, best_specimen_raw )
+                    if progress is not None:
+                        convergence_curve.add( progress )
+                if terminating_policy is not None:
+                    logger.info( f'Stopped by {terminating_policy}' )
+                else:
+                    logger.info( 'Ran out of patience' )
+                break
+
+            last_rounded_score = rounded_score
+
+            if checkpoint_interval_seconds is not None and time.perf_counter() - last_checkpoint_time >= checkpoint_interval_seconds:
+                # results up to here have to be written, since they are not written again when continuing
+                result_writer.flush()
+                save_checkpoint( checkpoint_path, generator_state, {
+                    'last_rounded_score'            : last_rounded_score,
+                    'last_written_score'            : last_written_score,
+                    'n_iterations_with_same_score'  : n_iterations_with_same_score,
+                    'gene_journal'                  : gene_journal_writer.get_checkpoint_state() if gene_journal_writer is not None else None,
+                    'elapsed_seconds'               : time.perf_counter() - run_start_time,
+                    'convergence_curve'             : convergence_curve,
+                } )
+                last_checkpoint_time = time.perf_counter()
 
     end_time = datetime.now()
     convergence_time = end_time - start_time
-    logger.info( f'Converged in {convergence_time.seconds} seconds.' )
+    logger.info( f'Converged in {convergence_time.total_seconds():.1f} seconds.' )
+    if profiler is not None:
+        profiler.log_rolling_summary()
+        profiler.write_json( Path( output_directory_path ) / 'profile.json' )
+        profiler.write_csv( Path( output_directory_path ) / 'profile.csv' )
+    if is_convergence_curve_desired:
+        convergence_curve.write_csv( Path( output_directory_path ) / 'convergence.csv' )
     logger.info( 'DONE' )
     return best_specimen_raw
 
 
+def _prepare_output_directory( output_directory_path : Path, resume : bool ) -> None:
+    if resume and output_directory_path.exists():
+        logger.info( f'Continuing in the existing output directory' )
+        return
+    logger.info( f'Ensuring an empty output directory' )
+    if output_directory_path.exists():
+        rmtree( output_directory_path )
+    os.mkdir( f'{output_directory_path}' )
+
+
 def _load_get_function_from_python_file( path : Path ):
     module   = run_path( str( path ) )
     f_get    = module.get( 'get' )
     return f_get
 
 
+def _load_get_function_by_name( algorithm_file_name : str ):
+    root_directory_path = Path(__file__).parent.parent.parent
+    logger.info( f'Looking for algorithm with name "{algorithm_file_name}"' )
+    algorithm_file_path = Path(f'{root_directory_path}/genetic_algorithms/impl/{algorithm_file_name}.py')
+    logger.info( f'Loading algorithm from {algorithm_file_path}' )
+    return _load_get_function_from_python_file( algorithm_file_path )
+
+
 def run_genetic_algorithm_by_name(
         input_image_path        : Path,
         output_directory_path   : Path,
@@ -100,23 +241,25 @@ def run_genetic_algorithm_by_name(
         n_iterations_patience   : int   = 100,
         score_interval          : int   = 500,
         is_pickling_desired     : bool  = True,
-        termination_score       : int   = 3500
+        termination_score       : int   = 3500,
+        use_inplace_generator   : bool  = False,
+        random_seed             : int   = 1337,
+        use_gene_journal        : bool  = False,
+        gene_journal_keyframe_interval : int = 1000,
+        checkpoint_interval_seconds : Optional[ float ] = None,
+        resume                  : bool  = False,
+        profiler                : Optional[ GenerationProfiler ] = None,
+        termination_policies    : Sequence[ TerminationPolicy ] = ( ),
+        is_convergence_curve_desired : bool = False,
 ) -> Any:
 
     logger.info( f'Loading input image from {input_image_path}' )
     target_image = cv2.imread( str( input_image_path ) )
     assert target_image is not None, f"Could not read target_image: {input_image_path}"
 
-    logger.info( f'Ensuring an empty output directory' )
-    if output_directory_path.exists():
-        rmtree( output_directory_path )
-    os.mkdir( f'{output_directory_path}' )
+    _prepare_output_directory( output_directory_path, resume )
 
-    root_directory_path = Path(__file__).parent.parent.parent
-    logger.info( f'Looking for algorithm with name "{algorithm_file_name}"' )
-    algorithm_file_path = Path(f'{root_directory_path}/genetic_algorithms/impl/{algorithm_file_name}.py')
-    logger.info( f'Loading algorithm from {algorithm_file_path}' )
-    f_get = _load_get_function_from_python_file( algorithm_file_path )
+    f_get = _load_get_function_by_name( algorithm_file_name )
 
     algorithm_arguments = algorithm_arguments or { }
     genetic_algorithm = f_get(target_image, **algorithm_arguments)
@@ -127,11 +270,30 @@ def run_genetic_algorithm_by_name(
         n_iterations_patience,
         score_interval,
         is_pickling_desired,
-        termination_score
+        termination_score,
+        use_inplace_generator,
+        random_seed,
+        use_gene_journal = use_gene_journal,
+        gene_journal_keyframe_interval = gene_journal_keyframe_interval,
+        checkpoint_interval_seconds = checkpoint_interval_seconds,
+        resume = resume,
+        profiler = profiler,
+        termination_policies = termination_policies,
+        is_convergence_curve_desired = is_convergence_curve_desired,
     )
     return result
 
 
+def resume_genetic_algorithm_by_name( **kwargs ) -> Any:
+    """
+    Continues a run of run_genetic_algorithm_by_name from the last checkpoint in its output directory,
+    with the same arguments as the run.
+    The results are exactly the same as they would have been if the run had never stopped.
+    Starts over if there is no checkpoint.
+    """
+    return run_genetic_algorithm_by_name( **kwargs, resume = True )
+
+
 def run_genetic_algorithm_pointillism(
         input_image_path        : Path,
         output_directory_path   : Path,
@@ -140,16 +302,22 @@ def run_genetic_algorithm_pointillism(
         n_iterations_patience   : int   = 100,
         score_interval          : int   = 500,
         is_pickling_desired     : bool  = False,
-        termination_score       : int   = 3500
+        termination_score       : int   = 3500,
+        use_inplace_generator   : bool  = False,
+        random_seed             : int   = 1337,
+        use_gene_journal        : bool  = False,
+        gene_journal_keyframe_interval : int = 1000,
+        checkpoint_interval_seconds : Optional[ float ] = None,
+        resume                  : bool  = False,
+        profiler                : Optional[ GenerationProfiler ] = None,
+        termination_policies    : Sequence[ TerminationPolicy ] = ( ),
+        is_convergence_curve_desired : bool = False,
 ) -> Any:
     logger.info( f'Loading input image from {input_image_path}' )
     target_image = cv2.imread( str( input_image_path ) )
     assert target_image is not None, f"Could not read target_image: {input_image_path}"
 
-    logger.info( f'Ensuring an empty output directory' )
-    if output_directory_path.exists():
-        rmtree( output_directory_path )
-    os.mkdir( f'{output_directory_path}' )
+    _prepare_output_directory( output_directory_path, resume )
 
     from genetic_algorithms.impl.pointillism import get as f_get
 
@@ -162,6 +330,82 @@ def run_genetic_algorithm_pointillism(
         n_iterations_patience,
         score_interval,
         is_pickling_desired,
-        termination_score
+        termination_score,
+        use_inplace_generator,
+        random_seed,
+        use_gene_journal = use_gene_journal,
+        gene_journal_keyframe_interval = gene_journal_keyframe_interval,
+        checkpoint_interval_seconds = checkpoint_interval_seconds,
+        resume = resume,
+        profiler = profiler,
+        termination_policies = termination_policies,
+        is_convergence_curve_desired = is_convergence_curve_desired,
     )
     return result
+
+
+def run_genetic_algorithm_pyramid(
+        input_image_path        : Path,
+        output_directory_path   : Path,
+        algorithm_file_name     : str,
+        algorithm_arguments     : Optional[Dict] = None,
+        pyramid_scales          : Sequence[ float ] = ( 0.25, 0.5, 1.0 ),
+        n_iterations_patience   : int   = 100,
+        score_interval          : int   = 500,
+        is_pickling_desired     : bool  = True,
+        termination_score       : int   = 3500,
+        use_inplace_generator   : bool  = False,
+        random_seed             : int   = 1337,
+        # any other arguments of run_genetic_algorithm_strategy, like checkpoints, a profiler or termination policies,
+        # which apply to every level
+        **strategy_kwargs,
+) -> Any:
+    """
+    Evolves at a low resolution first, and continues at higher resolutions, coarse to fine.
+    Early genes are large and do not need fine detail, and are much cheaper to draw and score at a low resolution.
+    Every level runs until it runs out of patience, or reaches the termination score,
+    after which the genes of the best specimen are scaled up and used as the initial genes of the next level.
+    The results of every level are written to a subdirectory of the output directory.
+    """
+    logger.info( f'Loading input image from {input_image_path}' )
+    target_image = cv2.imread( str( input_image_path ) )
+    assert target_image is not None, f"Could not read target_image: {input_image_path}"
+
+    _prepare_output_directory( output_directory_path, strategy_kwargs.get( 'resume', False ) )
+
+    f_get = _load_get_function_by_name( algorithm_file_name )
+    algorithm_arguments = algorithm_arguments or { }
+
+    target_height, target_width = target_image.shape[ :2 ]
+    result = None
+    previous_genes = None
+    previous_width = None
+    for level_index, scale in enumerate( pyramid_scales ):
+        level_width = max( 1, round( target_width * scale ) )
+        level_height = max( 1, round( target_height * scale ) )
+        level_image = cv2.resize( target_image, ( level_width, level_height ), interpolation = cv2.INTER_AREA )
+        level_output_directory_path = output_directory_path / f'level_{level_index}__scale_{scale}'
+        os.makedirs( f'{level_output_directory_path}', exist_ok = True )
+        logger.info( f'Running pyramid level {level_index} at scale {scale}, {level_width}x{level_height} pixels' )
+
+        # termination policies keep track of the progress of a run, so every level gets fresh copies
+        level_strategy_kwargs = dict( strategy_kwargs, termination_policies = deepcopy( strategy_kwargs.get( 'termination_policies', ( ) ) ) )
+
+        genetic_algorithm = f_get( level_image, **algorithm_arguments )
+        if previous_genes is not None:
+            genetic_algorithm.set_initial_genes( get_scaled_genes( previous_genes, level_width / previous_width ) )
+
+        result = run_genetic_algorithm_strategy(
+            level_output_directory_path,
+            genetic_algorithm,
+            n_iterations_patience,
+            score_interval,
+            is_pickling_desired,
+            termination_score,
+            use_inplace_generator,
+            random_seed,
+            **level_strategy_kwargs,
+        )
+        previous_genes = genetic_algorithm.get_specimen_genes( result )
+        previous_width = level_width
+    return result
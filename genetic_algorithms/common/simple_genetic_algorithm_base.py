@@ -1,10 +1,22 @@
-from typing import Tuple
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 from genetic_algorithms.common.reproduction import asexual_copy_reproduction
-from genetic_algorithms.common.fitness import get_fitness_from_absolute_difference_image
+from genetic_algorithms.common.fitness import (
+    get_fitness_from_absolute_difference_image,
+    get_fitness_from_absolute_difference_sum,
+)
 from genetic_algorithms.common.selection import select_top_n
-from utils.absolute_difference_image import get_absolute_difference_image
+from primitives.rectangle import Rectangle
+from utils.absolute_difference_image import (
+    get_absolute_difference_image,
+    update_absolute_difference_image_in_rectangle,
+)
+from utils.preprocessing_cache import PreprocessingCache, get_preprocessed
+from utils.weighted_position_sampler import WeightedPositionSampler
 
 from genetic_algorithms.common.genetic_algorithm_protocol import (
     Specimen,
@@ -14,6 +26,18 @@ from genetic_algorithms.common.genetic_algorithm_protocol import (
 )
 
 
+@dataclass
+class SpecimenUndo:
+    """
+    Everything needed to revert a mutation that was applied in place,
+    see SimpleGeneticAlgorithmBase.begin_mutation_inplace
+    """
+    n_genes : int
+    diff_sum : float
+    # ( rectangle, cached_image patch, diff_image patch ), in the order they were saved
+    patches : List[ Tuple[ Rectangle, Image, Image ] ] = field( default_factory = list )
+
+
 class SimpleGeneticAlgorithmBase( ABC ):
 
     """
@@ -29,10 +53,25 @@ class SimpleGeneticAlgorithmBase( ABC ):
     but the benefit of a genetic/evolutionary setup is that you can easily experiment with many cool variations!
     """
 
-    def __init__( self, target_image : Image, n_population : int = 1, n_selection : int = 1 ):
+    def __init__(
+            self,
+            target_image            : Image,
+            n_population            : int = 1,
+            n_selection             : int = 1,
+            use_incremental_fitness : bool = False,
+            preprocessing_cache     : Optional[ PreprocessingCache ] = None,
+            n_candidates            : int = 1,
+            n_committed_candidates  : int = 1,
+    ):
         self._target_image = target_image
         self._n_population = n_population
         self._n_selection = n_selection
+        self._use_incremental_fitness = use_incremental_fitness
+        self._preprocessing_cache = preprocessing_cache
+        assert n_candidates >= 1 and 1 <= n_committed_candidates <= n_candidates
+        self._n_candidates = n_candidates
+        self._n_committed_candidates = n_committed_candidates
+        self._initial_genes = None
         self._height, self._width, self._channels = self._target_image.shape
 
     @abstractmethod
@@ -50,6 +89,31 @@ class SimpleGeneticAlgorithmBase( ABC ):
         """
         pass
 
+    def _get_blank_absolute_difference_image( self, blank_image : Image ) -> Image:
+        """
+        The absolute difference image between a blank image and the target image,
+        loaded from the preprocessing cache if available.
+        Note that this always returns a writeable copy, because diff images can be updated in place.
+        """
+        # blank images have a single color, so that color and the target image are all that matter
+        blank_color = tuple( int( value ) for value in blank_image[ 0, 0 ] )
+        return get_preprocessed(
+            self._preprocessing_cache,
+            'blank_absolute_difference_image',
+            self._target_image,
+            { 'blank_color' : blank_color },
+            lambda : { 'absolute_difference_image' : get_absolute_difference_image( blank_image, self._target_image ) },
+            mmap_mode = None,
+        )[ 'absolute_difference_image' ]
+
+    def set_initial_genes( self, genes ) -> None:
+        """
+        Start from these genes instead of from a blank image,
+        for example from the genes of a run at a lower resolution, see run_genetic_algorithm_pyramid.
+        This has to be called before get_initial_population.
+        """
+        self._initial_genes = genes
+
     def apply_reproduction( self, population : Population ) -> Population:
         """
         Note that currently the parent populations is always added back to the population after mutations.
@@ -64,6 +128,9 @@ class SimpleGeneticAlgorithmBase( ABC ):
         Note that throughout this project it is assumed that lower fitness scores are better.
         Scores are commonly a percentage, measuring equality between result and target
         """
+        if self._use_incremental_fitness:
+            return self._get_incremental_fitness( population )
+
         population_fitnesses = [ ]
         for specimen in population :
             absolute_difference_image = get_absolute_difference_image( specimen.cached_image, self._target_image )
@@ -72,6 +139,110 @@ class SimpleGeneticAlgorithmBase( ABC ):
             population_fitnesses.append( fitness )
         return population_fitnesses
 
+    def _mark_rectangle_dirty( self, specimen : Specimen, rectangle : Rectangle ) -> None:
+        """
+        When using incremental fitness, mutations should report every region of the cached image they draw in,
+        before drawing in it.
+        """
+        if not self._use_incremental_fitness:
+            return
+
+        specimen.dirty_rectangles.append( rectangle )
+
+        # When mutating in place, we save the pixels that are about to be drawn over,
+        # which is why this has to be called before drawing
+        if specimen.undo is not None:
+            region = rectangle.get_slices()
+            specimen.undo.patches.append( (
+                rectangle,
+                specimen.cached_image[ region ].copy(),
+                specimen.diff_image[ region ].copy(),
+            ) )
+
+    def _get_incremental_fitness( self, population: Population ) -> FitnessScores:
+        """
+        Instead of computing the difference with the target image for the entire image,
+        only the dirty rectangles of the diff image are updated in place,
+        and a running sum of the diff image is kept per specimen.
+        This makes the cost per generation scale with the size of the mutations instead of the size of the image.
+        This requires the Specimen to have a diff_sum, dirty_rectangles, position_sampler and undo.
+        """
+        population_fitnesses = [ ]
+        for specimen in population :
+            if specimen.diff_sum is None:
+                specimen.diff_image = get_absolute_difference_image( specimen.cached_image, self._target_image )
+                specimen.diff_sum = float( np.sum( specimen.diff_image ) )
+            else:
+                position_sampler = specimen.position_sampler
+                if position_sampler is not None and position_sampler.weight_image is not specimen.diff_image:
+                    position_sampler = None
+                for rectangle in specimen.dirty_rectangles:
+                    specimen.diff_sum += update_absolute_difference_image_in_rectangle(
+                        specimen.diff_image,
+                        specimen.cached_image,
+                        self._target_image,
+                        rectangle
+                    )
+                    if position_sampler is not None:
+                        position_sampler.update_region( rectangle.y_min, rectangle.y_max, rectangle.x_min, rectangle.x_max )
+            specimen.dirty_rectangles.clear()
+            fitness = get_fitness_from_absolute_difference_sum( specimen.diff_sum, specimen.diff_image.size )
+            population_fitnesses.append( fitness )
+        return population_fitnesses
+
+    def get_specimen_genes( self, specimen : Specimen ) -> List:
+        return specimen.genes
+
+    def begin_mutation_inplace( self, specimen : Specimen ) -> None:
+        """
+        For algorithms that only paint on top of their specimen,
+        we do not need to copy the specimen to be able to compare it with its mutated version.
+        Instead, we save only the pixels under every new stroke, and put them back if the mutation was bad.
+        See make_inplace_genetic_algorithm_generator
+        """
+        assert self._use_incremental_fitness, 'Mutating in place requires use_incremental_fitness'
+        specimen.undo = SpecimenUndo(
+            n_genes = len( self.get_specimen_genes( specimen ) ),
+            diff_sum = specimen.diff_sum,
+        )
+
+    def commit_mutation_inplace( self, specimen : Specimen ) -> None:
+        specimen.undo = None
+
+    def revert_mutation_inplace( self, specimen : Specimen ) -> None:
+        undo = specimen.undo
+        position_sampler = specimen.position_sampler
+        if position_sampler is not None and position_sampler.weight_image is not specimen.diff_image:
+            position_sampler = None
+
+        # patches can overlap, so we restore them in reverse order
+        for rectangle, cached_image_patch, diff_image_patch in reversed( undo.patches ):
+            region = rectangle.get_slices()
+            specimen.cached_image[ region ] = cached_image_patch
+            specimen.diff_image[ region ] = diff_image_patch
+            if position_sampler is not None:
+                position_sampler.update_region( rectangle.y_min, rectangle.y_max, rectangle.x_min, rectangle.x_max )
+
+        specimen.diff_sum = undo.diff_sum
+        del self.get_specimen_genes( specimen )[ undo.n_genes: ]
+        specimen.undo = None
+
+    def get_position_sampler( self, specimen : Specimen ) -> WeightedPositionSampler:
+        """
+        Returns a sampler for positions weighted by the diff image of the specimen.
+        The sampler is stored on the specimen, and is only rebuilt when the diff image was replaced,
+        so sampling many positions from the same diff image only pays for building the sampler once.
+        Note that without use_incremental_fitness, get_fitness replaces the diff image every generation,
+        so the sampler is rebuilt every generation, and sampling still costs O(pixels) per generation.
+        Only with use_incremental_fitness is the sampler updated in place, for the regions that were drawn on,
+        and does sampling a position take logarithmic time.
+        """
+        position_sampler = specimen.position_sampler
+        if position_sampler is None or position_sampler.weight_image is not specimen.diff_image:
+            position_sampler = WeightedPositionSampler( specimen.diff_image )
+            specimen.position_sampler = position_sampler
+        return position_sampler
+
     def apply_selection( self, population : Population, fitness_scores : FitnessScores ) -> Tuple[ Population, FitnessScores ]:
         """
         Selection is very simple: take the specimen with the top N fitness scores
@@ -93,3 +264,8 @@ class SimpleGeneticAlgorithmBase( ABC ):
         # However, the code that runs the genetic algorithm might impose additional termination criteria
         return False
 
+    def close( self ) -> None:
+        # Releases anything that outlives a single generation, like worker processes,
+        # called by run_genetic_algorithm_strategy when a run is done
+        pass
+
@@ -0,0 +1,130 @@
+from abc import abstractmethod
+from collections import deque
+import csv
+from dataclasses import dataclass, field
+import logging
+from pathlib import Path
+from typing import Deque, List, Optional, Protocol, Sequence, Tuple
+
+from genetic_algorithms.common.genetic_algorithm_protocol import FitnessScore
+
+
+logger = logging.getLogger(__name__)
+
+
+# Termination policies stop a run on a budget of time or compute,
+# next to the patience and termination score of run_genetic_algorithm_strategy, whichever comes first.
+# Every generation, every policy is given the progress of the run, and a run stops as soon as one policy says so.
+# Progress is also recorded in a convergence curve, which shows what quality a given budget would have bought.
+
+
+@dataclass
+class RunProgress:
+    generation      : int
+
+    # since the start of the run, including the time before continuing from a checkpoint
+    seconds         : float
+
+    # the fitness score of the best specimen, lower is better
+    best_score      : FitnessScore
+
+    # the number of genes of the best specimen, for Painting and Pointillism the number of accepted strokes
+    n_genes         : int
+
+
+class TerminationPolicy( Protocol ):
+
+    @abstractmethod
+    def should_terminate( self, progress : RunProgress ) -> bool:
+        pass
+
+
+@dataclass
+class WallClockTermination:
+    """
+    Stops after the run took max_seconds
+    """
+    max_seconds : float
+
+    def should_terminate( self, progress : RunProgress ) -> bool:
+        return progress.seconds >= self.max_seconds
+
+
+@dataclass
+class ImprovementRateTermination:
+    """
+    Stops when the score improved by less than min_improvement_per_second over the last window_seconds.
+    Improvements are in percentage points, like the scores in the names of results.
+    The rate is only judged once the policy has seen window_seconds of progress,
+    which starts over when continuing from a checkpoint.
+    """
+    min_improvement_per_second  : float
+    window_seconds              : float = 60.0
+
+    # ( seconds, best score ) of every improvement, the first is at or before the start of the window
+    _improvements               : Deque[ Tuple[ float, FitnessScore ] ] = field( default_factory = deque, repr = False )
+    _start_seconds              : Optional[ float ] = field( default = None, repr = False )
+
+    def should_terminate( self, progress : RunProgress ) -> bool:
+        if self._start_seconds is None:
+            self._start_seconds = progress.seconds
+        if not self._improvements or progress.best_score < self._improvements[ -1 ][ 1 ]:
+            self._improvements.append( ( progress.seconds, progress.best_score ) )
+
+        window_start_seconds = progress.seconds - self.window_seconds
+        if window_start_seconds < self._start_seconds:
+            return False
+        while len( self._improvements ) > 1 and self._improvements[ 1 ][ 0 ] <= window_start_seconds:
+            self._improvements.popleft()
+        _, window_start_score = self._improvements[ 0 ]
+        improvement_per_second = 100 * ( window_start_score - progress.best_score ) / self.window_seconds
+        return improvement_per_second < self.min_improvement_per_second
+
+
+@dataclass
+class AcceptedGenesTermination:
+    """
+    Stops when the best specimen has max_n_genes genes,
+    which for algorithms that paint on top of their specimen is a budget of strokes
+    """
+    max_n_genes : int
+
+    def should_terminate( self, progress : RunProgress ) -> bool:
+        return progress.n_genes >= self.max_n_genes
+
+
+def get_terminating_policy( termination_policies : Sequence[ TerminationPolicy ], progress : RunProgress ) -> Optional[ TerminationPolicy ]:
+    """
+    Returns the first policy that wants to stop, or None.
+    Every policy sees the progress of every generation, until one wants to stop, since some policies keep track of it.
+    """
+    for termination_policy in termination_policies:
+        if termination_policy.should_terminate( progress ):
+            return termination_policy
+    return None
+
+
+@dataclass
+class ConvergenceCurve:
+    """
+    The progress of a run at every generation that improved its rounded score, and at its last generation
+    """
+    points : List[ RunProgress ] = field( default_factory = list )
+
+    def add( self, progress : RunProgress ) -> None:
+        self.points.append( progress )
+
+    def write_csv( self, path : Path ) -> None:
+        with open( path, 'w', newline = '' ) as csv_file:
+            writer = csv.DictWriter( csv_file, fieldnames = [ 'generation', 'seconds', 'score', 'n_genes' ] )
+            writer.writeheader()
+            writer.writerows(
+                {
+                    'generation'    : progress.generation,
+                    'seconds'       : round( progress.seconds, 3 ),
+                    'score'         : round( progress.best_score * 100, 3 ),
+                    'n_genes'       : progress.n_genes,
+                }
+                for progress in self.points
+            )
+        logger.info( f'Wrote convergence curve to {path}' )
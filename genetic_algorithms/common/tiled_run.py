@@ -0,0 +1,241 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import logging
+import math
+import os
+from pathlib import Path
+from shutil import rmtree
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from genetic_algorithms.common.run import run_genetic_algorithm_strategy
+from genetic_algorithms.impl.pointillism import Pointillism
+from primitives.color import get_blank_image_like
+from primitives.ellipse import Ellipse, draw_ellipse_on_image
+from primitives.gene_array import GeneArray
+from primitives.rectangle import Rectangle
+from utils.color_palette import ColorPalette
+from utils.image_gradient import ImageGradient
+from utils.shared_arrays import SharedArrayHandle, SharedArrays, SharedColorPaletteHandle, SharedImageGradientHandle
+
+
+logger = logging.getLogger(__name__)
+
+
+# Very large images are split into overlapping tiles, which are evolved independently, in separate processes.
+# Every tile is responsible for the ellipses with their center in its core,
+# but also evolves the overlap around the core,
+# so that ellipses near the border of its core are chosen knowing what is painted on the other side of the border.
+# Ellipses with their center outside of the core are dropped, their neighbouring tile paints those.
+# Palette and gradient are computed once, for the entire image, and shared by all tiles,
+# so that tiles do not end up with different colors, or with different stroke directions at their borders.
+# The target image, palette and gradient are placed in shared memory, instead of being copied into every worker.
+
+
+@dataclass
+class Tile:
+    index   : int
+
+    # The region this tile keeps ellipses for, tiles do not overlap here
+    core    : Rectangle
+
+    # The core plus the overlap, which is the region that is actually evolved
+    region  : Rectangle
+
+
+@dataclass
+class TileResult:
+    tile                : Tile
+    genes               : GeneArray
+
+    # How far along the evolution of its tile every gene was added, from 0 to 1,
+    # used to merge the genes of all tiles in a sensible order
+    relative_progress   : np.ndarray
+
+
+def get_tiles( image_shape, tile_size : int, overlap : int ) -> List[ Tile ]:
+    image_height, image_width = image_shape[ :2 ]
+    tiles = [ ]
+    for y_min in range( 0, image_height, tile_size ):
+        for x_min in range( 0, image_width, tile_size ):
+            core = Rectangle(
+                x_min = x_min,
+                y_min = y_min,
+                x_max = min( x_min + tile_size, image_width ),
+                y_max = min( y_min + tile_size, image_height ),
+            )
+            region = Rectangle(
+                x_min = core.x_min - overlap,
+                y_min = core.y_min - overlap,
+                x_max = core.x_max + overlap,
+                y_max = core.y_max + overlap,
+            ).get_clipped( image_shape )
+            tiles.append( Tile( index = len( tiles ), core = core, region = region ) )
+    return tiles
+
+
+def _run_tile(
+        tile                        : Tile,
+        target_image                : SharedArrayHandle,
+        color_palette               : SharedColorPaletteHandle,
+        target_gradient             : SharedImageGradientHandle,
+        algorithm_arguments         : Dict,
+        output_directory_path       : Path,
+        run_arguments               : Dict,
+        random_seed                 : int,
+) -> TileResult:
+    # worker processes do not inherit logging configuration when they are spawned
+    logging.basicConfig( level = logging.INFO )
+    os.mkdir( f'{output_directory_path}' )
+
+    # tiles get the input image, so that they do their own color space conversion
+    genetic_algorithm = Pointillism(
+        target_image.attach()[ tile.region.get_slices() ],
+        out_path_color_palette = None,
+        color_palette = color_palette.attach(),
+        target_gradient = target_gradient.attach().get_region( tile.region ),
+        **algorithm_arguments,
+    )
+    result = run_genetic_algorithm_strategy(
+        output_directory_path,
+        genetic_algorithm,
+        random_seed = random_seed,
+        **run_arguments,
+    )
+    genes = genetic_algorithm.get_specimen_genes( result )
+    relative_progress = np.arange( len( genes ) ) / max( 1, len( genes ) )
+
+    # move to the coordinates of the entire image, and only keep the genes with their center in the core
+    x = genes.get_column( 'x' ) + tile.region.x_min
+    y = genes.get_column( 'y' ) + tile.region.y_min
+    is_in_core = (
+        ( tile.core.x_min <= x ) & ( x < tile.core.x_max )
+        & ( tile.core.y_min <= y ) & ( y < tile.core.y_max )
+    )
+    core_genes = genes.take( is_in_core )
+    core_genes.get_column( 'x' )[ : ] = x[ is_in_core ]
+    core_genes.get_column( 'y' )[ : ] = y[ is_in_core ]
+    return TileResult(
+        tile = tile,
+        genes = core_genes,
+        relative_progress = relative_progress[ is_in_core ],
+    )
+
+
+def merge_tile_genes( tile_results : List[ TileResult ] ) -> GeneArray:
+    """
+    Merges the genes of all tiles into a single list of genes, for the entire image.
+    Genes are ordered by how far along the evolution of their tile they were added,
+    so that fine ellipses near a border are drawn on top of the coarse ellipses of the neighbouring tile,
+    just like they would have been within a single tile.
+    """
+    genes = GeneArray( Ellipse )
+    for tile_result in tile_results:
+        genes.extend( tile_result.genes )
+    relative_progress = np.concatenate( [ tile_result.relative_progress for tile_result in tile_results ] )
+    # a stable sort keeps the order of the tiles for genes with the same progress
+    return genes.take( np.argsort( relative_progress, kind = 'stable' ) )
+
+
+def run_genetic_algorithm_pointillism_tiled(
+        input_image_path        : Path,
+        output_directory_path   : Path,
+        algorithm_arguments     : Optional[Dict] = None,
+        tile_size               : int   = 1024,
+        overlap                 : int   = 64,
+        n_workers               : Optional[ int ] = None,
+        n_iterations_patience   : int   = 100,
+        score_interval          : int   = 500,
+        is_pickling_desired     : bool  = False,
+        termination_score       : int   = 3500,
+        use_inplace_generator   : bool  = True,
+        random_seed             : int   = 1337,
+) -> Pointillism.Specimen:
+    """
+    Runs Pointillism on overlapping tiles of the input image, in a pool of worker processes,
+    and merges the genes of all tiles into a single specimen for the entire image.
+    The overlap should be at least as large as the long axis of most ellipses, to avoid visible seams.
+    Every tile gets its own seed, random_seed + its index, so results do not depend on the number of workers.
+    Results of every tile are written to a subdirectory of the output directory.
+    The merged specimen has no difference image, since that would take a lot of memory for images this large.
+    """
+    logger.info( f'Loading input image from {input_image_path}' )
+    target_image = cv2.imread( str( input_image_path ) )
+    assert target_image is not None, f"Could not read target_image: {input_image_path}"
+
+    logger.info( f'Ensuring an empty output directory' )
+    if output_directory_path.exists():
+        rmtree( output_directory_path )
+    os.mkdir( f'{output_directory_path}' )
+
+    algorithm_arguments = dict( algorithm_arguments or { } )
+    use_hsv = algorithm_arguments.get( 'use_hsv', False )
+    color_palette_arguments = algorithm_arguments.pop( 'color_palette_arguments', None ) or { }
+    if algorithm_arguments.get( 'short_axis_size' ) is None:
+        # ellipses should have the same size as they would have without tiles
+        algorithm_arguments[ 'short_axis_size' ] = int( math.ceil( min( target_image.shape[ :2 ] ) / 1000 ) )
+    if use_inplace_generator:
+        # mutating in place only works with incremental fitness, see SimpleGeneticAlgorithmBase.begin_mutation_inplace
+        algorithm_arguments[ 'use_incremental_fitness' ] = True
+
+    logger.info( 'Computing color palette and gradient for the entire image' )
+    global_image = cv2.cvtColor( target_image, cv2.COLOR_BGR2HSV ) if use_hsv else target_image
+    color_palette = ColorPalette(
+        global_image,
+        is_hsv = use_hsv,
+        out_path = f'{output_directory_path}/color_palette.png',
+        **color_palette_arguments
+    )
+    target_gradient = ImageGradient( global_image, is_hsv = use_hsv )
+
+    tiles = get_tiles( target_image.shape, tile_size, overlap )
+    run_arguments = {
+        'n_iterations_patience' : n_iterations_patience,
+        'score_interval'        : score_interval,
+        'is_pickling_desired'   : is_pickling_desired,
+        'termination_score'     : termination_score,
+        'use_inplace_generator' : use_inplace_generator,
+    }
+    logger.info( f'Running {len( tiles )} tiles of {tile_size} pixels with {n_workers or os.cpu_count()} workers' )
+    with SharedArrays() as shared_arrays, ProcessPoolExecutor( max_workers = n_workers ) as executor:
+        shared_target_image = shared_arrays.share( target_image )
+        shared_color_palette = shared_arrays.share_color_palette( color_palette )
+        shared_target_gradient = shared_arrays.share_image_gradient( target_gradient )
+        # the workers only use the shared copies, so there is no need to keep these in memory while they run
+        del global_image, target_gradient
+        logger.info( f'Shared {shared_arrays.n_bytes / 1024 ** 2:.1f} MB with the workers' )
+        futures = [
+            executor.submit(
+                _run_tile,
+                tile,
+                shared_target_image,
+                shared_color_palette,
+                shared_target_gradient,
+                algorithm_arguments,
+                output_directory_path / f'tile_{tile.index:04d}',
+                run_arguments,
+                random_seed + tile.index,
+            )
+            for tile in tiles
+        ]
+        tile_results = [ future.result() for future in futures ]
+
+    genes = merge_tile_genes( tile_results )
+    logger.info( f'Merged {len( genes )} genes of {len( tiles )} tiles' )
+
+    result_image = get_blank_image_like( target_image, use_hsv = use_hsv )
+    for gene in genes:
+        draw_ellipse_on_image( gene, result_image )
+    result = Pointillism.Specimen(
+        cached_image = result_image,
+        diff_image = None,
+        genes = genes,
+    )
+
+    if use_hsv:
+        result_image = cv2.cvtColor( result_image, cv2.COLOR_HSV2BGR )
+    cv2.imwrite( f'{output_directory_path}/merged_result.png', result_image )
+    logger.info( f'Wrote merged result to {output_directory_path}/merged_result.png' )
+    return result
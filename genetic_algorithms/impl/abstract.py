@@ -1,12 +1,22 @@
-import copy
 from dataclasses import dataclass
+from pathlib import Path
 import random
-from typing import List
+from typing import List, Optional
 
 import cv2
 import numpy as np
 
 import genetic_algorithms.common as GA_common
+from primitives.circle import Circle, draw_circle_on_image, get_circle_parameters, get_circle_rectangles, get_translated_circle
+from primitives.color import get_blank_image_like, random_hsv_color, random_shift_color_hue, random_shift_color_saturation, random_shift_color_value
+from primitives.gene_array import GeneArray
+from primitives.point import Point, random_point
+from primitives.rectangle import Rectangle, get_merged_rectangles, get_overlapping_rectangle_indices
+from utils.absolute_difference_image import update_absolute_difference_image_in_rectangle
+from utils.color_from_image import get_color_from_image
+from utils.preprocessing_cache import PreprocessingCache, get_preprocessed
+from utils.random_shift_within_range import random_shift_within_range
+from utils.weighted_position_sampler import WeightedPositionSampler
 
 
 class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
@@ -26,25 +36,58 @@ class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
 
     @dataclass
     class Specimen :
-        genes: List[ GA_common.Circle ]
+        genes: GeneArray # of Circle
         diff_image: np.ndarray
         cached_image: np.ndarray
 
+        # Used to sample new circle positions, weighted by diff_image
+        position_sampler: Optional[ WeightedPositionSampler ] = None
+
+        # Used for incremental rendering, see _get_incremental_fitness
+        # The parameters of the circles as they are drawn in cached_image, see get_circle_parameters,
+        # or None if cached_image does not match the genes
+        rendered_gene_parameters: Optional[ np.ndarray ] = None
+        diff_sum: Optional[ float ] = None
+
     def __init__(
             self,
             target_image,
             n_population    = 10,
             n_genes         = 10,
-            n_selection     = 3
+            n_selection     = 3,
+            preprocessing_cache_directory : Optional[ str ] = None,
+
+            # render and score specimens serially, in threads or in processes, see genetic_algorithms/common/evaluator.py
+            evaluator           : str = GA_common.EVALUATOR_SERIAL,
+            n_evaluator_workers : Optional[ int ] = None,
+
+            # only redraw the regions of the image where circles were changed
+            use_incremental_rendering : bool = False,
+
+            # skip rendering and scoring specimens with a genome that was scored before
+            use_fitness_cache           : bool = False,
+            fitness_cache_max_n_bytes   : int = 256 * 1024 ** 2,
     ):
+        preprocessing_cache = PreprocessingCache( Path( preprocessing_cache_directory ) ) if preprocessing_cache_directory else None
+
         # We will convert the target image to HSV,
         # so that it is easier to also compute fitness score in HSV
-        target_image_hsv = cv2.cvtColor( target_image, cv2.COLOR_BGR2HSV )
+        target_image_hsv = get_preprocessed(
+            preprocessing_cache,
+            'hsv_image',
+            target_image,
+            { },
+            lambda : { 'image' : cv2.cvtColor( target_image, cv2.COLOR_BGR2HSV ) },
+        )[ 'image' ]
         super().__init__(
             target_image_hsv,
             n_population = n_population,
-            n_selection = n_selection
+            n_selection = n_selection,
+            preprocessing_cache = preprocessing_cache,
         )
+        self._evaluator = GA_common.get_evaluator( evaluator, n_evaluator_workers )
+        self._use_incremental_rendering = use_incremental_rendering
+        self.fitness_cache = GA_common.FitnessCache( fitness_cache_max_n_bytes ) if use_fitness_cache else None
         self._n_genes = n_genes
         self._min_radius = int( 0.05 * min(self._width, self._height) )
         self._max_radius = int( 0.15 * min(self._width, self._height) )
@@ -52,13 +95,12 @@ class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
     def _get_random_circle_radius( self ) -> float:
         return random.randint( self._min_radius, self._max_radius )
 
-    def _get_random_circle( self, diff_image ) -> GA_common.Circle:
+    def _get_random_circle( self, position : Point ) -> Circle:
 
-        position = GA_common.sample_weighted_position_from_image( diff_image )
-        color = GA_common.get_color_from_image( self._target_image, position )
+        color = get_color_from_image( self._target_image, position )
         radius = self._get_random_circle_radius()
 
-        circle = GA_common.Circle(
+        circle = Circle(
             color = color,
             position = position,
             radius = radius,
@@ -67,63 +109,95 @@ class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
 
     def get_initial_population( self ) -> GA_common.Population:
         # we store the blank hsv image to make it easy to reuse later
-        self._blank_hsv_image = GA_common.get_blank_image_like( self._target_image, use_hsv = True )
-        absolute_difference_image = GA_common.get_absolute_difference_image( self._blank_hsv_image, self._target_image )
+        self._blank_hsv_image = get_blank_image_like( self._target_image, use_hsv = True )
+        absolute_difference_image = self._get_blank_absolute_difference_image( self._blank_hsv_image )
+        self._blank_absolute_difference_image = absolute_difference_image
+        self._evaluator.set_context( {
+            'blank_image'   : self._blank_hsv_image,
+            'target_image'  : self._target_image,
+            'f_draw_gene'   : draw_circle_on_image,
+        } )
+
+        position_sampler = WeightedPositionSampler( absolute_difference_image )
+        self._blank_position_sampler = position_sampler
+        if self._initial_genes is not None:
+            # every specimen starts with the genes of a previous run
+            return [ self.get_specimen_from_genes( self._initial_genes ) for _ in range( self._n_population ) ]
+
+        # all initial genes are sampled from the same diff image, so we draw all their positions at once
+        positions = position_sampler.sample_positions( self._n_population * self._n_genes )
 
         initial_population = []
-        for _i_specimen in range( self._n_population ):
-            circles = [ ]
-            for _i_gene in range( self._n_genes ) :
-                circles.append( self._get_random_circle( absolute_difference_image ) )
-            initial_population.append( self.Specimen( circles, absolute_difference_image, self._blank_hsv_image ) )
+        for i_specimen in range( self._n_population ):
+            specimen_positions = positions[ i_specimen * self._n_genes : ( i_specimen + 1 ) * self._n_genes ]
+            circles = GeneArray( Circle, [ self._get_random_circle( position ) for position in specimen_positions ] )
+            initial_population.append( self.Specimen(
+                circles,
+                absolute_difference_image,
+                self._blank_hsv_image,
+                position_sampler,
+            ) )
         return initial_population
 
+    def get_specimen_from_genes( self, genes ) -> Specimen:
+        """
+        Returns a new specimen with copies of the genes,
+        for example for genes that were received from another island, see genetic_algorithms/common/island_model.py
+        Its image is drawn when getting its fitness.
+        This has to be called after get_initial_population.
+        """
+        return self.Specimen(
+            GeneArray( Circle, genes ),
+            self._blank_absolute_difference_image,
+            self._blank_hsv_image,
+            self._blank_position_sampler,
+        )
 
     def apply_mutation_inplace( self, population : GA_common.Population ):
 
         # color
-        def mutation__shift_color_hue( circle : GA_common.Circle ) -> None:
-            circle.color = GA_common.random_shift_color_hue( color = circle.color, max_shift = 3 )
+        def mutation__shift_color_hue( circle : Circle ) -> None:
+            circle.color = random_shift_color_hue( color = circle.color, max_shift = 3 )
 
-        def mutation__shift_color_saturation( circle : GA_common.Circle ) -> None:
-            circle.color = GA_common.random_shift_color_saturation( color = circle.color, max_shift = 5 )
+        def mutation__shift_color_saturation( circle : Circle ) -> None:
+            circle.color = random_shift_color_saturation( color = circle.color, max_shift = 5 )
 
-        def mutation__shift_color_value( circle : GA_common.Circle ) -> None:
-            circle.color = GA_common.random_shift_color_value( color = circle.color, max_shift = 5 )
+        def mutation__shift_color_value( circle : Circle ) -> None:
+            circle.color = random_shift_color_value( color = circle.color, max_shift = 5 )
 
-        def mutation__random_color( circle : GA_common.Circle ) -> None:
-            circle.color = GA_common.random_hsv_color()
+        def mutation__random_color( circle : Circle ) -> None:
+            circle.color = random_hsv_color()
 
         # position
-        def mutation__shift_position_x( circle : GA_common.Circle ) -> None:
-            circle.position.x = int( GA_common.random_shift_within_range(
+        def mutation__shift_position_x( circle : Circle ) -> None:
+            circle.position.x = int( random_shift_within_range(
                 value = circle.position.x,
                 max_shift = 10,
                 range_min = 0,
                 range_max = self._width
             ) )
 
-        def mutation__shift_position_y( circle : GA_common.Circle ) -> None:
-            circle.position.y = int( GA_common.random_shift_within_range(
+        def mutation__shift_position_y( circle : Circle ) -> None:
+            circle.position.y = int( random_shift_within_range(
                 value = circle.position.y,
                 max_shift = 10,
                 range_min = 0,
                 range_max = self._height
             ) )
 
-        def mutation__random_position( circle : GA_common.Circle ) -> None:
-            circle.position = GA_common.random_point( self._width, self._height )
+        def mutation__random_position( circle : Circle ) -> None:
+            circle.position = random_point( self._width, self._height )
 
         # radius
-        def mutation__shift_radius( circle : GA_common.Circle ) -> None:
-            circle.radius = int( GA_common.random_shift_within_range(
+        def mutation__shift_radius( circle : Circle ) -> None:
+            circle.radius = int( random_shift_within_range(
                 value = circle.radius,
                 max_shift = 3,
                 range_min = self._min_radius,
                 range_max = self._max_radius
             ) )
 
-        def mutation__random_radius( circle : GA_common.Circle ) -> None:
+        def mutation__random_radius( circle : Circle ) -> None:
             circle.radius = self._get_random_circle_radius()
 
         weighted_mutations = (
@@ -145,24 +219,190 @@ class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
             GA_common.mutate_specimen_inplace(
                 specimen,
                 weighted_mutations,
-                lambda : self._get_random_circle( specimen.diff_image ),
+                lambda : self._get_random_circle( self.get_position_sampler( specimen ).sample_position() ),
                 p_add = 0,
                 p_del = 0,
             )
 
 
     def get_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
-        # super class expects a cached image per specimen,
-        # we have to update that image here,
-        # before using the super class method for getting fitness scores
-        for specimen in population:
-            # we redraw the entire image per specimen,
-            # because any gene could have been mutated
-            specimen.cached_image = copy.deepcopy( self._blank_hsv_image )
-            for circle in specimen.genes:
-                GA_common.draw_circle_on_image( circle, specimen.cached_image )
+        if self.fitness_cache is not None:
+            return self._get_cached_fitness( population )
+        return self._get_uncached_fitness( population )
+
+    def _get_uncached_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
+        if self._use_incremental_rendering:
+            return self._get_incremental_fitness( population )
+        return self._get_rendered_fitness( population )
+
+    def _get_cached_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
+        """
+        Specimens with a genome that is in the fitness cache take over the cached image and score.
+        Only the first specimen for every other genome is scored,
+        specimens with the same genome in the same population take over its results.
+        """
+        population_fitnesses = [ None ] * len( population )
+        fingerprints = [ ]
+        missed_indices_by_fingerprint = { }
+        for i_specimen, specimen in enumerate( population ):
+            fingerprint = GA_common.get_genome_fingerprint( get_circle_parameters( specimen.genes ) )
+            fingerprints.append( fingerprint )
+            if fingerprint in missed_indices_by_fingerprint:
+                missed_indices_by_fingerprint[ fingerprint ].append( i_specimen )
+                continue
+            entry = self.fitness_cache.get( fingerprint )
+            if entry is None:
+                missed_indices_by_fingerprint[ fingerprint ] = [ i_specimen ]
+                continue
+            self._set_specimen_state( specimen, entry.specimen_state )
+            population_fitnesses[ i_specimen ] = entry.fitness
+
+        scored_population = [ population[ indices[ 0 ] ] for indices in missed_indices_by_fingerprint.values() ]
+        scored_fitnesses = self._get_uncached_fitness( scored_population )
+        for indices, specimen, fitness in zip( missed_indices_by_fingerprint.values(), scored_population, scored_fitnesses ):
+            entry = GA_common.FitnessCacheEntry(
+                fitness = fitness,
+                specimen_state = {
+                    'cached_image'              : specimen.cached_image,
+                    'diff_image'                : specimen.diff_image,
+                    'rendered_gene_parameters'  : specimen.rendered_gene_parameters,
+                    'diff_sum'                  : specimen.diff_sum,
+                },
+            )
+            self.fitness_cache.put( fingerprints[ indices[ 0 ] ], entry )
+            for i_specimen in indices:
+                self._set_specimen_state( population[ i_specimen ], entry.specimen_state )
+                population_fitnesses[ i_specimen ] = fitness
+        return population_fitnesses
+
+    @staticmethod
+    def _set_specimen_state( specimen : Specimen, specimen_state : dict ) -> None:
+        for name, value in specimen_state.items():
+            setattr( specimen, name, value )
+
+    def _get_rendered_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
+        # We redraw the entire image per specimen, because any gene could have been mutated.
+        # Specimens are independent, so the evaluator can render and score them at the same time.
+        results = self._evaluator.map( GA_common.render_and_score_genes, [ specimen.genes for specimen in population ] )
+
+        population_fitnesses = [ ]
+        for specimen, ( cached_image, absolute_difference_image, fitness ) in zip( population, results ):
+            specimen.cached_image = cached_image
+            specimen.diff_image = absolute_difference_image
+            population_fitnesses.append( fitness )
+        return population_fitnesses
+
+    def _get_incremental_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
+        """
+        Mutations only change some of the genes, and children start as copies of their parent,
+        so most of the cached image is still correct.
+        We compare the genes to the genes that were drawn in the cached image,
+        and only redraw the regions covered by the old and new versions of the changed circles.
+        The diff image is updated for those regions only.
+        Specimens whose cached image does not match their genes at all are rendered from scratch.
+        """
+        population_fitnesses = [ None ] * len( population )
+        fully_rendered_indices = [ ]
+        for i_specimen, specimen in enumerate( population ):
+            gene_parameters = get_circle_parameters( specimen.genes )
+            gene_rectangles = get_circle_rectangles( gene_parameters, self._target_image.shape )
+            rectangles = self._get_changed_rectangles( specimen, gene_parameters, gene_rectangles )
+            if rectangles is None:
+                fully_rendered_indices.append( i_specimen )
+                continue
+
+            if self.fitness_cache is not None and rectangles:
+                # Images from the fitness cache are shared between specimens,
+                # and copying a population keeps them shared, so we copy them before modifying them in place
+                specimen.cached_image = specimen.cached_image.copy()
+                specimen.diff_image = specimen.diff_image.copy()
+            for rectangle in rectangles:
+                self._redraw_rectangle( specimen, rectangle, gene_rectangles )
+                update_absolute_difference_image_in_rectangle(
+                    specimen.diff_image,
+                    specimen.cached_image,
+                    self._target_image,
+                    rectangle,
+                )
+            if rectangles:
+                # Adding up the changes of the regions rounds differently than summing the entire diff image,
+                # and scores that differ in the last bit can change the order of selection,
+                # so we sum the entire diff image, like rendering from scratch does, which is cheap compared to drawing
+                specimen.diff_sum = float( np.sum( specimen.diff_image ) )
+            specimen.rendered_gene_parameters = gene_parameters
+            population_fitnesses[ i_specimen ] = GA_common.get_fitness_from_absolute_difference_sum(
+                specimen.diff_sum,
+                specimen.diff_image.size
+            )
 
-        return super().get_fitness( population )
+        fully_rendered_population = [ population[ i ] for i in fully_rendered_indices ]
+        fully_rendered_fitnesses = self._get_rendered_fitness( fully_rendered_population )
+        for i_specimen, specimen, fitness in zip( fully_rendered_indices, fully_rendered_population, fully_rendered_fitnesses ):
+            specimen.rendered_gene_parameters = get_circle_parameters( specimen.genes )
+            specimen.diff_sum = float( np.sum( specimen.diff_image ) )
+            population_fitnesses[ i_specimen ] = fitness
+        return population_fitnesses
+
+    def _get_changed_rectangles(
+            self,
+            specimen        : Specimen,
+            gene_parameters : np.ndarray,
+            gene_rectangles : np.ndarray,
+    ) -> Optional[ List[ Rectangle ] ]:
+        """
+        Returns the regions that have to be redrawn, or None if it is faster to redraw everything.
+        """
+        # Genes that were added or deleted shift all following genes,
+        # we do not bother with that and just redraw everything
+        rendered_gene_parameters = specimen.rendered_gene_parameters
+        if rendered_gene_parameters is None or len( rendered_gene_parameters ) != len( gene_parameters ):
+            return None
+
+        changed_indices = np.flatnonzero( np.any( rendered_gene_parameters != gene_parameters, axis = 1 ) )
+        rendered_gene_rectangles = get_circle_rectangles(
+            rendered_gene_parameters[ changed_indices ],
+            self._target_image.shape
+        )
+        rectangles = [
+            Rectangle( *( int( value ) for value in gene_rectangle ) )
+            for gene_rectangle in np.concatenate( [ rendered_gene_rectangles, gene_rectangles[ changed_indices ] ] )
+        ]
+        rectangles = get_merged_rectangles( rectangles )
+
+        n_redrawn_pixels = sum( rectangle.width * rectangle.height for rectangle in rectangles )
+        if n_redrawn_pixels >= self._width * self._height:
+            return None
+        return rectangles
+
+    def _redraw_rectangle( self, specimen : Specimen, rectangle : Rectangle, gene_rectangles : np.ndarray ) -> None:
+        """
+        Redraws all circles that overlap the rectangle, in order, on top of the blank image.
+        OpenCV anti-aliases circles slightly differently when they are clipped,
+        so we can not simply draw on the rectangle.
+        Instead we draw on a scratch region that is large enough to contain all overlapping circles,
+        which gives exactly the same pixels as drawing the entire image, and copy back the rectangle.
+        """
+        # the gene rectangles are our spatial index, we can find the overlapping circles without looping over them
+        overlapping_indices = get_overlapping_rectangle_indices( gene_rectangles, rectangle )
+        scratch_rectangle = rectangle
+        if len( overlapping_indices ) > 0:
+            overlapping_rectangles = gene_rectangles[ overlapping_indices ]
+            scratch_rectangle = Rectangle(
+                x_min = min( rectangle.x_min, int( np.min( overlapping_rectangles[ :, 0 ] ) ) ),
+                y_min = min( rectangle.y_min, int( np.min( overlapping_rectangles[ :, 1 ] ) ) ),
+                x_max = max( rectangle.x_max, int( np.max( overlapping_rectangles[ :, 2 ] ) ) ),
+                y_max = max( rectangle.y_max, int( np.max( overlapping_rectangles[ :, 3 ] ) ) ),
+            )
+
+        scratch_image = self._blank_hsv_image[ scratch_rectangle.get_slices() ].copy()
+        for i_gene in overlapping_indices:
+            circle = get_translated_circle( specimen.genes[ i_gene ], -scratch_rectangle.x_min, -scratch_rectangle.y_min )
+            draw_circle_on_image( circle, scratch_image )
+
+        specimen.cached_image[ rectangle.get_slices() ] = scratch_image[
+            rectangle.y_min - scratch_rectangle.y_min : rectangle.y_max - scratch_rectangle.y_min,
+            rectangle.x_min - scratch_rectangle.x_min : rectangle.x_max - scratch_rectangle.x_min,
+        ]
 
 
     def get_specimen_image_rgb( self, specimen: Specimen ) -> np.ndarray:
@@ -172,6 +412,10 @@ class Abstract( GA_common.SimpleGeneticAlgorithmBase ):
         rgb_image = cv2.cvtColor( hsv_image, cv2.COLOR_HSV2BGR )
         return rgb_image
 
+    def close( self ) -> None:
+        # stops the worker processes of the process evaluator, and removes the arrays it shared with them
+        self._evaluator.close()
+
 
 def get(target_image, **kwargs):
     return Abstract( target_image, **kwargs )
\ No newline at end of file
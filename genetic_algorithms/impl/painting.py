@@ -2,13 +2,16 @@ import copy
 from dataclasses import dataclass, field
 import math
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import genetic_algorithms.common as GA_common
 import primitives
-import utils
+from utils.color_from_image import get_color_from_image
+from utils.image_gradient import ImageGradient
+from utils.preprocessing_cache import PreprocessingCache
+from utils.weighted_position_sampler import WeightedPositionSampler
 
-class Painting( GA_common.SimpleGeneticAlgorithmBase ):
+class Painting( GA_common.PaintOnTopMixin, GA_common.SimpleGeneticAlgorithmBase ):
 
     """
     Iterative Painting
@@ -37,7 +40,19 @@ class Painting( GA_common.SimpleGeneticAlgorithmBase ):
         # But storing this info allows for better inspection,
         # and to later redraw the image with different settings, if pickled.
         # For that, see common.redraw.redraw_painting
-        brushes: List[ primitives.Brush ] = field( default_factory = list )
+        brushes: primitives.GeneArray = field( default_factory = lambda : primitives.GeneArray( primitives.Brush ) )
+
+        # Used to sample new brush positions, weighted by diff_image
+        position_sampler: Optional[ WeightedPositionSampler ] = None
+
+        # Only used with incremental fitness,
+        # see SimpleGeneticAlgorithmBase._get_incremental_fitness
+        diff_sum: Optional[ float ] = None
+        dirty_rectangles: List[ primitives.Rectangle ] = field( default_factory = list )
+
+        # Only used when mutating in place,
+        # see SimpleGeneticAlgorithmBase.begin_mutation_inplace
+        undo: Optional[ GA_common.SpecimenUndo ] = None
 
 
     def __init__(
@@ -50,10 +65,27 @@ class Painting( GA_common.SimpleGeneticAlgorithmBase ):
             # Note that it will affect convergence speed
             size_multiplier     : int = 1,
             min_brush_size      : int = 10,
-    ):
-        super().__init__( target_image )
 
-        self.target_gradient = utils.ImageGradient( self._target_image )
+            # only update the fitness for the region of the last brush stroke
+            use_incremental_fitness : bool = False,
+
+            # store preprocessing results on disk, so repeated runs on the same image can skip them
+            preprocessing_cache_directory : Optional[ str ] = None,
+
+            # try this many brush strokes per generation, and keep the best, see mains/benchmark_candidate_strokes.py
+            n_candidates            : int = 1,
+            n_committed_candidates  : int = 1,
+    ):
+        preprocessing_cache = PreprocessingCache( Path( preprocessing_cache_directory ) ) if preprocessing_cache_directory else None
+        super().__init__(
+            target_image,
+            use_incremental_fitness = use_incremental_fitness,
+            preprocessing_cache = preprocessing_cache,
+            n_candidates = n_candidates,
+            n_committed_candidates = n_committed_candidates,
+        )
+
+        self.target_gradient = ImageGradient( self._target_image, preprocessing_cache = preprocessing_cache )
         primitives.preload_brush_textures( Path( brush_directory ) )
 
         self.brush_size_multiplier = size_multiplier
@@ -61,13 +93,15 @@ class Painting( GA_common.SimpleGeneticAlgorithmBase ):
 
     def get_initial_population( self ) -> GA_common.Population:
         blank_image = primitives.get_blank_image_like( self._target_image )
-        abs_diff_image = GA_common.get_absolute_difference_image( blank_image, self._target_image )
+        initial_image = self._get_initial_image( blank_image )
+        abs_diff_image = self._get_initial_absolute_difference_image( blank_image, initial_image )
         fitness = GA_common.get_fitness_from_absolute_difference_image( abs_diff_image )
         initial_population = [
             self.Specimen(
-                cached_image = copy.deepcopy( blank_image ),
-                diff_image = abs_diff_image,
-                fitness = fitness
+                cached_image = copy.deepcopy( initial_image ),
+                diff_image = copy.deepcopy( abs_diff_image ),
+                fitness = fitness,
+                brushes = primitives.GeneArray( primitives.Brush, self._initial_genes or [ ] ),
             )
             for _ in range( self._n_population )
         ]
@@ -82,22 +116,29 @@ class Painting( GA_common.SimpleGeneticAlgorithmBase ):
         brush_size = max( self.min_brush_size, scaled_brush_size )
         return brush_size
 
+    def _sample_new_gene( self, specimen : Specimen ) -> primitives.Brush:
+        position = self.get_position_sampler( specimen ).sample_position()
+        color = get_color_from_image( self._target_image, position )
+        texture_index = primitives.random_brush_texture_index()
+        angle = math.degrees( self.target_gradient.get_direction( position ) )
+        brush_size = self._get_brush_size(specimen.fitness)
+        return primitives.Brush(
+            color = color,
+            position = position,
+            texture_index = texture_index,
+            angle = angle,
+            size = brush_size,
+        )
+
+    def _get_gene_rectangle( self, gene : primitives.Brush, image_shape ) -> primitives.Rectangle:
+        return primitives.get_brush_rectangle( gene, image_shape )
+
+    def _draw_gene_on_image( self, gene : primitives.Brush, image : primitives.Image ) -> None:
+        primitives.draw_brush_on_image( gene, image )
+
     def apply_mutation_inplace( self, population : GA_common.Population ):
         for specimen in population:
-            position = utils.sample_weighted_position_from_image( specimen.diff_image )
-            color = utils.get_color_from_image( self._target_image, position )
-            texture_index = primitives.random_brush_texture_index()
-            angle = math.degrees( self.target_gradient.get_direction( position ) )
-            brush_size = self._get_brush_size(specimen.fitness)
-            new_brush = primitives.Brush(
-                color = color,
-                position = position,
-                texture_index = texture_index,
-                angle = angle,
-                size = brush_size,
-            )
-            primitives.draw_brush_on_image( new_brush, specimen.cached_image )
-            specimen.brushes.append( new_brush )
+            self._add_new_genes( specimen )
 
     def get_fitness( self, population : GA_common.Population ) -> GA_common.FitnessScores:
         # we are caching the best fitness score as we use it for brush size calculation if autoscaling is True
@@ -107,6 +148,14 @@ class Painting( GA_common.SimpleGeneticAlgorithmBase ):
             specimen.fitness = fitness
         return population_fitnesses
 
+    def get_specimen_genes( self, specimen : Specimen ) -> primitives.GeneArray:
+        return specimen.brushes
+
+    def revert_mutation_inplace( self, specimen : Specimen ) -> None:
+        super().revert_mutation_inplace( specimen )
+        # the cached fitness has to match the reverted image again
+        specimen.fitness = GA_common.get_fitness_from_absolute_difference_sum( specimen.diff_sum, specimen.diff_image.size )
+
 
 def get(target_image, **kwargs):
     return Painting(target_image, **kwargs)
@@ -1,22 +1,27 @@
 import copy
 from dataclasses import dataclass, field
 import math
+from pathlib import Path
+from typing import List, Optional
 
 import cv2
 import numpy as np
 
 from genetic_algorithms.common.genetic_algorithm_protocol import Population
-from genetic_algorithms.common.simple_genetic_algorithm_base import SimpleGeneticAlgorithmBase
-from primitives.ellipse import Ellipse, draw_ellipse_on_image
+from genetic_algorithms.common.paint_on_top_mixin import PaintOnTopMixin
+from genetic_algorithms.common.simple_genetic_algorithm_base import SimpleGeneticAlgorithmBase, SpecimenUndo
+from primitives.ellipse import Ellipse, draw_ellipse_on_image, get_ellipse_rectangle
+from primitives.gene_array import GeneArray
+from primitives.rectangle import Rectangle
 from primitives.color import get_blank_image_like
 from utils.image_gradient import ImageGradient
 from utils.color_palette import ColorPalette
-from utils.absolute_difference_image import get_absolute_difference_image
 from utils.color_from_image import get_color_from_image
-from utils.sample_weighted_position_from_image import sample_weighted_position_from_image
+from utils.preprocessing_cache import PreprocessingCache, get_preprocessed
+from utils.weighted_position_sampler import WeightedPositionSampler
 
 
-class Pointillism( SimpleGeneticAlgorithmBase ):
+class Pointillism( PaintOnTopMixin, SimpleGeneticAlgorithmBase ):
 
     """
     Pointillism
@@ -33,7 +38,19 @@ class Pointillism( SimpleGeneticAlgorithmBase ):
         cached_image: np.ndarray
         diff_image: np.ndarray
 
-        genes: list[ Ellipse ] = field( default_factory = list )
+        genes: GeneArray = field( default_factory = lambda : GeneArray( Ellipse ) )
+
+        # Used to sample new ellipse positions, weighted by diff_image
+        position_sampler: Optional[ WeightedPositionSampler ] = None
+
+        # Only used with incremental fitness,
+        # see SimpleGeneticAlgorithmBase._get_incremental_fitness
+        diff_sum: Optional[ float ] = None
+        dirty_rectangles: List[ Rectangle ] = field( default_factory = list )
+
+        # Only used when mutating in place,
+        # see SimpleGeneticAlgorithmBase.begin_mutation_inplace
+        undo: Optional[ SpecimenUndo ] = None
 
 
     def __init__(
@@ -43,14 +60,52 @@ class Pointillism( SimpleGeneticAlgorithmBase ):
             use_hsv = False,
             short_axis_size = None,
             long_axis_multiplier = 0.005,
-            long_axis_exponent = 0.5
+            long_axis_exponent = 0.5,
+            use_incremental_fitness = False,
+            color_palette_arguments : Optional[ dict ] = None,
+            preprocessing_cache_directory : Optional[ str ] = None,
+            n_candidates = 1,
+            n_committed_candidates = 1,
+
+            # Use a palette and gradient that were computed before, instead of computing them for target_image,
+            # for example for the entire image when evolving tiles of it, see genetic_algorithms/common/tiled_run.py
+            # Note that they have to be computed in the same color space that is used here
+            color_palette : Optional[ ColorPalette ] = None,
+            target_gradient : Optional[ ImageGradient ] = None,
     ):
+        preprocessing_cache = PreprocessingCache( Path( preprocessing_cache_directory ) ) if preprocessing_cache_directory else None
         self.use_hsv = use_hsv
         if self.use_hsv:
-            target_image = cv2.cvtColor( target_image, cv2.COLOR_BGR2HSV )
-        super().__init__(target_image)
-        self._target_gradient = ImageGradient( self._target_image, is_hsv = self.use_hsv )
-        self._color_palette = ColorPalette( self._target_image, is_hsv = self.use_hsv, out_path = out_path_color_palette )
+            target_image = get_preprocessed(
+                preprocessing_cache,
+                'hsv_image',
+                target_image,
+                { },
+                lambda : { 'image' : cv2.cvtColor( target_image, cv2.COLOR_BGR2HSV ) },
+            )[ 'image' ]
+        super().__init__(
+            target_image,
+            use_incremental_fitness = use_incremental_fitness,
+            preprocessing_cache = preprocessing_cache,
+            n_candidates = n_candidates,
+            n_committed_candidates = n_committed_candidates,
+        )
+        if target_gradient is None:
+            target_gradient = ImageGradient(
+                self._target_image,
+                is_hsv = self.use_hsv,
+                preprocessing_cache = preprocessing_cache,
+            )
+        self._target_gradient = target_gradient
+        if color_palette is None:
+            color_palette = ColorPalette(
+                self._target_image,
+                is_hsv = self.use_hsv,
+                out_path = out_path_color_palette,
+                preprocessing_cache = preprocessing_cache,
+                **( color_palette_arguments or { } )
+            )
+        self._color_palette = color_palette
 
         if short_axis_size is None:
             # size of dots is based on shortest extend of width and height
@@ -64,16 +119,21 @@ class Pointillism( SimpleGeneticAlgorithmBase ):
 
     def get_initial_population( self ) -> Population:
         blank_image = get_blank_image_like( self._target_image, use_hsv = self.use_hsv )
-        abs_diff_image = get_absolute_difference_image( blank_image, self._target_image )
+        initial_image = self._get_initial_image( blank_image )
+        abs_diff_image = self._get_initial_absolute_difference_image( blank_image, initial_image )
 
         initial_population = [
-            self.Specimen( cached_image = copy.deepcopy( blank_image ), diff_image = abs_diff_image )
+            self.Specimen(
+                cached_image = copy.deepcopy( initial_image ),
+                diff_image = copy.deepcopy( abs_diff_image ),
+                genes = GeneArray( Ellipse, self._initial_genes or [ ] ),
+            )
             for _ in range( self._n_population )
         ]
         return initial_population
 
-    def _sample_new_ellipse( self, diff_image ):
-        position = sample_weighted_position_from_image( diff_image )
+    def _sample_new_gene( self, specimen : Specimen ) -> Ellipse:
+        position = self.get_position_sampler( specimen ).sample_position()
         target_color = get_color_from_image( self._target_image, position )
         color = self._color_palette.get_matching_color_with_probabilities( target_color )
         angle = self._target_gradient.get_direction( position ) + 90
@@ -89,11 +149,15 @@ class Pointillism( SimpleGeneticAlgorithmBase ):
             angle = angle,
         )
 
+    def _get_gene_rectangle( self, gene : Ellipse, image_shape ) -> Rectangle:
+        return get_ellipse_rectangle( gene, image_shape )
+
+    def _draw_gene_on_image( self, gene : Ellipse, image : np.ndarray ) -> None:
+        draw_ellipse_on_image( gene, image )
+
     def apply_mutation_inplace( self, population : Population ):
         for specimen in population:
-            new_ellipse = self._sample_new_ellipse( specimen.diff_image )
-            specimen.genes.append(new_ellipse)
-            draw_ellipse_on_image( new_ellipse, specimen.cached_image )
+            self._add_new_genes( specimen )
 
     def get_specimen_image_rgb( self, specimen: Specimen ) -> np.ndarray:
         # Since we work in HSV color space for this algorithm,
@@ -1,7 +1,9 @@
 import itertools
 import logging
 from pathlib import Path
+from typing import Optional
 
+from genetic_algorithms.common.batch_runner import BatchJob, run_batch
 from genetic_algorithms.common.run import run_genetic_algorithm_by_name
 from redraw import redraw_painting_at_4k, redraw_pointillism_as_svg
 
@@ -15,6 +17,10 @@ ROOT_DIR                        = Path( __file__ ).parent.parent
 DEFAULT_INPUT_IMAGE_PATH        = ROOT_DIR / '_input_images'
 DEFAULT_OUTPUT_DIRECTORY_PATH   = ROOT_DIR / 'results'
 DEFAULT_BRUSH_DIRECTORY         = ROOT_DIR / '_input_images/brushes'
+# shared by all runs, so repeated runs on the same image skip preprocessing
+DEFAULT_PREPROCESSING_CACHE_PATH = DEFAULT_OUTPUT_DIRECTORY_PATH / '_preprocessing_cache'
+# None uses all cores
+N_WORKERS                       = None
 
 
 UNSPLASH_IMAGES = [
@@ -32,55 +38,121 @@ UNSPLASH_IMAGES = [
 ]
 
 
-def painting():
+def paint_image( image_name : str, brush_name : str, random_seed : int ) -> None:
+    image_directory_name = f'{Path(image_name).stem}__{brush_name}'
+    output_directory_path = DEFAULT_OUTPUT_DIRECTORY_PATH / image_directory_name
+    brush_directory = DEFAULT_BRUSH_DIRECTORY / brush_name
+    args = {
+        'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / image_name,
+        'output_directory_path' : output_directory_path,
+        'algorithm_file_name' : 'painting',
+        'is_pickling_desired' : False,
+        # much smaller than pickled results, see redraw/redraw_gene_journal.py
+        'use_gene_journal' : True,
+        'algorithm_arguments': {
+            'brush_directory' : brush_directory,
+            'preprocessing_cache_directory' : DEFAULT_PREPROCESSING_CACHE_PATH,
+        },
+        'random_seed' : random_seed,
+    }
+    result = run_genetic_algorithm_by_name( **args )
+
+    result_4k = redraw_painting_at_4k(
+        specimen = result,
+        brush_directory = args['algorithm_arguments']['brush_directory']
+    )
+
+    output_path_4k = f'{output_directory_path}/_{image_directory_name}__final_result_4k.png'
+    cv2.imwrite( output_path_4k, result_4k )
+    logger.info( f'Wrote 4k result to {output_path_4k}' )
+
+
+def painting( n_workers : Optional[ int ] = None ):
     brush_names = [
         'sketch',
         'canvas',
         'watercolor',
         'oil',
     ]
-    for image_name, brush_name in itertools.product( UNSPLASH_IMAGES, brush_names ):
-        image_directory_name = f'{Path(image_name).stem}__{brush_name}'
-        output_directory_path = DEFAULT_OUTPUT_DIRECTORY_PATH / image_directory_name
-        brush_directory = DEFAULT_BRUSH_DIRECTORY / brush_name
-        args = {
-            'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / image_name,
-            'output_directory_path' : output_directory_path,
-            'algorithm_file_name' : 'painting',
-            'is_pickling_desired' : False,
-            'algorithm_arguments': {
-                'brush_directory' : brush_directory,
-            },
-        }
-        result = run_genetic_algorithm_by_name( **args )
-
-        result_4k = redraw_painting_at_4k(
-            specimen = result,
-            brush_directory = args['algorithm_arguments']['brush_directory']
+    jobs = [
+        BatchJob(
+            name = f'{Path(image_name).stem}__{brush_name}',
+            f_run = paint_image,
+            arguments = { 'image_name' : image_name, 'brush_name' : brush_name },
         )
-
-        output_path_4k = f'{output_directory_path}/_{image_directory_name}__final_result_4k.png'
-        cv2.imwrite( output_path_4k, result_4k )
-        logger.info( f'Wrote 4k result to {output_path_4k}' )
-
+        for image_name, brush_name in itertools.product( UNSPLASH_IMAGES, brush_names )
+    ]
+    run_batch(
+        jobs,
+        n_workers = n_workers,
+        brush_directories = [ DEFAULT_BRUSH_DIRECTORY / brush_name for brush_name in brush_names ],
+    )
 
 
-def abstract():
+def abstract_image( image_name : str, output_directory_name : str, random_seed : int ) -> None:
     arg_pack = {
-        'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / 'mario_yoshi.jpg',
-        'output_directory_path' : DEFAULT_OUTPUT_DIRECTORY_PATH / 'mario_abstract',
+        'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / image_name,
+        'output_directory_path' : DEFAULT_OUTPUT_DIRECTORY_PATH / output_directory_name,
         'algorithm_file_name' : 'abstract',
         'is_pickling_desired' : True,
+        'algorithm_arguments' : {
+            'preprocessing_cache_directory' : DEFAULT_PREPROCESSING_CACHE_PATH,
+        },
+        'random_seed' : random_seed,
     }
     run_genetic_algorithm_by_name( **arg_pack )
 
 
+def abstract( n_workers : Optional[ int ] = None ):
+    jobs = [
+        BatchJob(
+            name = 'mario_abstract',
+            f_run = abstract_image,
+            arguments = { 'image_name' : 'mario_yoshi.jpg', 'output_directory_name' : 'mario_abstract' },
+        ),
+    ]
+    run_batch( jobs, n_workers = n_workers )
+
+
 CITIES_IMAGES = [
     'denys-nevozhai-2vmT5_FeMck-unsplash.jpg'
 ]
 
 
-def pointillism():
+def pointillism_image( image_name : str, random_seed : int ) -> None:
+    image_directory_name = f'{Path( image_name ).stem}'
+    output_directory_path = DEFAULT_OUTPUT_DIRECTORY_PATH / image_directory_name
+    use_hsv = True
+    args = {
+        'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / image_name,
+        'output_directory_path' : output_directory_path,
+        'algorithm_file_name' : 'pointillism',
+        # pickling every result is replaced by the gene journal, see redraw/redraw_gene_journal.py
+        'is_pickling_desired' : False,
+        'use_gene_journal' : True,
+        'algorithm_arguments' : {
+            'out_path_color_palette' : f'{output_directory_path}/{"color_palette.png"}',
+            'use_hsv' : use_hsv,
+            # see mains/benchmark_color_palette.py
+            'color_palette_arguments' : { 'n_fit_pixels' : 100_000 },
+            'preprocessing_cache_directory' : DEFAULT_PREPROCESSING_CACHE_PATH,
+        },
+        'random_seed' : random_seed,
+    }
+
+    result = run_genetic_algorithm_by_name( **args )
+    result_image = result.cached_image
+    if use_hsv:
+        result_image = cv2.cvtColor( result_image, cv2.COLOR_HSV2BGR )
+
+    out_path_without_extension = f'{output_directory_path}/final_result'
+    cv2.imwrite( f'{out_path_without_extension}.png', result_image )
+    result_svg = redraw_pointillism_as_svg( result, use_hsv, ellipse_scale = 1.0 )
+    result_svg.saveas( f'{out_path_without_extension}.svg' )
+    logger.info( f'Wrote final results to {out_path_without_extension}' )
+
+
+def pointillism( n_workers : Optional[ int ] = None ):
     images = [
         # 'tim-mossholder-cO5-QcKIR9o-unsplash.jpg',
         # 'david-clode-oTMGUchAwTQ-unsplash.jpg',
@@ -88,35 +160,19 @@ def pointillism():
         # 'olga-kononenko-Ltyfaze30SA-unsplash.jpg',
         'andrew-ly-5AftAzShDDQ-unsplash.jpg',
     ]
-    for image_name in images:
-        image_directory_name = f'{Path( image_name ).stem}'
-        output_directory_path = DEFAULT_OUTPUT_DIRECTORY_PATH / image_directory_name
-        use_hsv = True
-        args = {
-            'input_image_path' : DEFAULT_INPUT_IMAGE_PATH / image_name,
-            'output_directory_path' : output_directory_path,
-            'algorithm_file_name' : 'pointillism',
-            'is_pickling_desired' : True,
-            'algorithm_arguments' : {
-                'out_path_color_palette' : f'{output_directory_path}/{"color_palette.png"}',
-                'use_hsv' : use_hsv,
-            },
-        }
-
-        result = run_genetic_algorithm_by_name( **args )
-        result_image = result.cached_image
-        if use_hsv:
-            result_image = cv2.cvtColor( result_image, cv2.COLOR_HSV2BGR )
-
-        out_path_without_extension = f'{output_directory_path}/final_result'
-        cv2.imwrite( f'{out_path_without_extension}.png', result_image )
-        result_svg = redraw_pointillism_as_svg( result, use_hsv )
-        result_svg.saveas( f'{out_path_without_extension}.svg' )
-        logger.info( f'Wrote final results to {out_path_without_extension}' )
+    jobs = [
+        BatchJob(
+            name = Path( image_name ).stem,
+            f_run = pointillism_image,
+            arguments = { 'image_name' : image_name },
+        )
+        for image_name in images
+    ]
+    run_batch( jobs, n_workers = n_workers )
 
 
 if __name__ == '__main__':
     logging.basicConfig( level = logging.INFO )
-    # painting()
-    pointillism()
-    # abstract()
\ No newline at end of file
+    # painting( N_WORKERS )
+    pointillism( N_WORKERS )
+    # abstract( N_WORKERS )
\ No newline at end of file
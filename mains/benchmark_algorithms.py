@@ -0,0 +1,220 @@
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import random
+import resource
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.common.inplace_genetic_algorithm_generator import make_inplace_genetic_algorithm_generator
+from genetic_algorithms.impl.abstract import Abstract
+from genetic_algorithms.impl.painting import Painting
+from genetic_algorithms.impl.pointillism import Pointillism
+from redraw.redraw_gene_journal import F_DRAW_GENE_BY_GENE_TYPE
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+BRUSH_DIRECTORY         = ROOT_DIR / '_input_images/brushes/oil'
+OUTPUT_PATH             = ROOT_DIR / 'results/benchmarks/algorithms.json'
+
+# Copy a previous output here to compare against it,
+# for example one from before a change that should make things faster
+BASELINE_PATH           = ROOT_DIR / 'results/benchmarks/algorithms_baseline.json'
+
+INPUT_IMAGE_PATHS       = [
+    ROOT_DIR / '_input_images/tim-mossholder-cO5-QcKIR9o-unsplash.jpg',
+    ROOT_DIR / '_input_images/david-clode-oTMGUchAwTQ-unsplash.jpg',
+]
+
+# the images are resized so that their longest side has this many pixels
+RESOLUTIONS             = [ 256, 512, 1024 ]
+
+# Everything is seeded, both the algorithms, which for example use random numbers to compute their color palette,
+# and the generators, so repeated runs of the same code do exactly the same work
+RANDOM_SEED             = 1337
+
+# Every configuration runs this many generations, or until it ran this long
+N_GENERATIONS           = 5000
+MAX_DURATION_SECONDS    = 60
+
+# The times at which the best score first reached these scores are reported, as percentages like in result names,
+# they differ per algorithm, since their scores converge very differently
+SCORE_THRESHOLDS        = {
+    'painting'      : [ 30, 25, 20, 15 ],
+    'pointillism'   : [ 30, 25, 20, 15 ],
+    'abstract'      : [ 20, 15, 12, 10 ],
+}
+
+# ( get the algorithm, make the generator )
+ALGORITHMS              = {
+    'painting'      : (
+        lambda image : Painting( image, brush_directory = str( BRUSH_DIRECTORY ), use_incremental_fitness = True ),
+        make_inplace_genetic_algorithm_generator,
+    ),
+    'pointillism'   : (
+        lambda image : Pointillism( image, out_path_color_palette = None, use_incremental_fitness = True ),
+        make_inplace_genetic_algorithm_generator,
+    ),
+    'abstract'      : (
+        lambda image : Abstract( image, n_genes = 100, use_incremental_rendering = True ),
+        make_genetic_algorithm_generator,
+    ),
+}
+
+
+def _get_resized_image( image_path : Path, resolution : int ) -> np.ndarray:
+    image = cv2.imread( str( image_path ) )
+    assert image is not None, f"Could not read image: {image_path}"
+    height, width = image.shape[ :2 ]
+    scale = resolution / max( height, width )
+    size = ( max( 1, round( width * scale ) ), max( 1, round( height * scale ) ) )
+    return cv2.resize( image, size, interpolation = cv2.INTER_AREA )
+
+
+def _get_draw_seconds_per_gene( genetic_algorithm, specimen, image : np.ndarray, n_repeats : int = 3 ) -> Optional[ float ]:
+    """
+    Draws all genes of the specimen on a copy of the image, and returns the fastest time per gene of a few repeats
+    """
+    genes = genetic_algorithm.get_specimen_genes( specimen )
+    if len( genes ) == 0:
+        return None
+    f_draw_gene = F_DRAW_GENE_BY_GENE_TYPE[ genes.gene_type ]
+    genes = list( genes )
+    durations = [ ]
+    for _ in range( n_repeats ):
+        image_copy = image.copy()
+        start_time = time.perf_counter()
+        for gene in genes:
+            f_draw_gene( gene, image_copy )
+        durations.append( time.perf_counter() - start_time )
+    return min( durations ) / len( genes )
+
+
+def benchmark_configuration( algorithm_name : str, image_path : Path, resolution : int ) -> Dict:
+    """
+    Runs a single configuration, in its own process, see benchmark_algorithms,
+    so that the peak memory usage is that of this configuration only
+    """
+    f_get_algorithm, f_make_generator = ALGORITHMS[ algorithm_name ]
+    image = _get_resized_image( image_path, resolution )
+
+    random.seed( RANDOM_SEED )
+    np.random.seed( RANDOM_SEED )
+    setup_start_time = time.perf_counter()
+    genetic_algorithm = f_get_algorithm( image )
+    genetic_generator = f_make_generator( genetic_algorithm, RANDOM_SEED )
+    # creating the initial population is part of the setup
+    generation, _, best_score, best_specimen = next( genetic_generator )
+    setup_duration = time.perf_counter() - setup_start_time
+
+    score_thresholds = SCORE_THRESHOLDS[ algorithm_name ]
+    seconds_to_threshold = { threshold : None for threshold in score_thresholds }
+    start_time = time.perf_counter()
+    for generation, _, best_score, best_specimen in genetic_generator:
+        duration = time.perf_counter() - start_time
+        for threshold in score_thresholds:
+            if seconds_to_threshold[ threshold ] is None and best_score * 100 <= threshold:
+                seconds_to_threshold[ threshold ] = round( duration, 3 )
+        if generation >= N_GENERATIONS or duration >= MAX_DURATION_SECONDS:
+            break
+    duration = time.perf_counter() - start_time
+    n_generations = generation - 1
+
+    draw_seconds_per_gene = _get_draw_seconds_per_gene(
+        genetic_algorithm,
+        best_specimen,
+        np.zeros_like( best_specimen.cached_image ),
+    )
+    return {
+        'algorithm'                 : algorithm_name,
+        'image'                     : image_path.stem,
+        'resolution'                : resolution,
+        'width'                     : image.shape[ 1 ],
+        'height'                    : image.shape[ 0 ],
+        'setup_seconds'             : round( setup_duration, 3 ),
+        'n_generations'             : n_generations,
+        'generations_per_second'    : round( n_generations / duration, 1 ),
+        'final_score'               : round( best_score * 100, 3 ),
+        'n_genes'                   : len( genetic_algorithm.get_specimen_genes( best_specimen ) ),
+        'draw_microseconds_per_gene': round( 1e6 * draw_seconds_per_gene, 2 ) if draw_seconds_per_gene is not None else None,
+        # keys are strings, so that results can be compared after a round trip through JSON
+        'seconds_to_score'          : { str( threshold ) : seconds for threshold, seconds in seconds_to_threshold.items() },
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb'               : round( resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024, 1 ),
+    }
+
+
+def _get_configuration_key( row : Dict ) -> tuple:
+    return row[ 'algorithm' ], row[ 'image' ], row[ 'resolution' ]
+
+
+def compare_with_baseline( rows : List[ Dict ], baseline_rows : List[ Dict ] ) -> None:
+    """
+    Adds the ratios of generations per second and peak memory to those of the same configuration in the baseline,
+    a generations_per_second_vs_baseline above 1 is faster
+    """
+    baseline_rows_by_key = { _get_configuration_key( row ) : row for row in baseline_rows }
+    for row in rows:
+        baseline_row = baseline_rows_by_key.get( _get_configuration_key( row ) )
+        if baseline_row is None:
+            continue
+        row[ 'generations_per_second_vs_baseline' ] = round( row[ 'generations_per_second' ] / baseline_row[ 'generations_per_second' ], 3 )
+        row[ 'peak_rss_vs_baseline' ] = round( row[ 'peak_rss_mb' ] / baseline_row[ 'peak_rss_mb' ], 3 )
+        logger.info(
+            f'{row[ "algorithm" ]} on {row[ "image" ]} at {row[ "resolution" ]}: '
+            f'{row[ "generations_per_second_vs_baseline" ]}x generations per second, '
+            f'{row[ "peak_rss_vs_baseline" ]}x peak memory of the baseline'
+        )
+
+
+def benchmark_algorithms() -> None:
+    rows = [ ]
+    # every configuration gets a fresh process, which is not forked, so memory usage of earlier configurations
+    # does not count towards its peak, and no state is shared between configurations
+    context = multiprocessing.get_context( 'spawn' )
+    for algorithm_name, image_path, resolution in itertools.product( ALGORITHMS, INPUT_IMAGE_PATHS, RESOLUTIONS ):
+        logger.info( f'Benchmarking {algorithm_name} on {image_path.stem} at {resolution} pixels' )
+        with context.Pool( processes = 1 ) as pool:
+            row = pool.apply( benchmark_configuration, ( algorithm_name, image_path, resolution ) )
+        logger.info( row )
+        rows.append( row )
+
+    if BASELINE_PATH.exists():
+        with open( BASELINE_PATH ) as baseline_file:
+            compare_with_baseline( rows, json.load( baseline_file )[ 'results' ] )
+
+    OUTPUT_PATH.parent.mkdir( parents = True, exist_ok = True )
+    with open( OUTPUT_PATH, 'w' ) as json_file:
+        json.dump( {
+            'environment'   : {
+                'python'    : platform.python_version(),
+                'platform'  : platform.platform(),
+                'processor' : platform.processor(),
+                'n_cpus'    : os.cpu_count(),
+                'numpy'     : np.__version__,
+                'opencv'    : cv2.__version__,
+            },
+            'settings'      : {
+                'random_seed'           : RANDOM_SEED,
+                'n_generations'         : N_GENERATIONS,
+                'max_duration_seconds'  : MAX_DURATION_SECONDS,
+            },
+            'results'       : rows,
+        }, json_file, indent = 4 )
+    logger.info( f'Wrote results to {OUTPUT_PATH}' )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    benchmark_algorithms()
@@ -0,0 +1,106 @@
+import itertools
+import logging
+from pathlib import Path
+import time
+
+import cv2
+
+from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.common.inplace_genetic_algorithm_generator import make_inplace_genetic_algorithm_generator
+from genetic_algorithms.impl.painting import Painting
+from genetic_algorithms.impl.pointillism import Pointillism
+from mains.benchmark_results import get_ratio, write_benchmark_csv
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH        = ROOT_DIR / '_input_images/tim-mossholder-cO5-QcKIR9o-unsplash.jpg'
+BRUSH_DIRECTORY         = ROOT_DIR / '_input_images/brushes/oil'
+OUTPUT_PATH             = ROOT_DIR / 'results/benchmarks/candidate_strokes.csv'
+
+# Every configuration runs for the same wall time, so we can compare how far they get
+DURATION_SECONDS        = 30
+
+# ( n_candidates, n_committed_candidates ), the first configuration is the reference
+CANDIDATE_CONFIGURATIONS = [
+    ( 1, 1 ),
+    ( 2, 1 ),
+    ( 4, 1 ),
+    ( 8, 1 ),
+    ( 16, 1 ),
+    ( 8, 4 ),
+    ( 16, 8 ),
+]
+
+# Candidates mostly save the overhead of a generation, which is much larger when copying specimens
+GENERATORS = {
+    'copy'          : make_genetic_algorithm_generator,
+    'inplace'       : make_inplace_genetic_algorithm_generator,
+}
+
+ALGORITHMS = {
+    'painting'      : lambda image, **kwargs : Painting( image, brush_directory = str( BRUSH_DIRECTORY ), **kwargs ),
+    'pointillism'   : lambda image, **kwargs : Pointillism( image, out_path_color_palette = None, **kwargs ),
+}
+
+
+def benchmark_candidate_strokes_for_algorithm( algorithm_name : str, generator_name : str, image ) -> list[dict]:
+    rows = [ ]
+    # the unrounded rate of the first configuration, which the others are compared with
+    reference_accepted_genes_per_second = None
+    for n_candidates, n_committed_candidates in CANDIDATE_CONFIGURATIONS:
+        genetic_algorithm = ALGORITHMS[ algorithm_name ](
+            image,
+            use_incremental_fitness = True,
+            n_candidates = n_candidates,
+            n_committed_candidates = n_committed_candidates,
+        )
+        genetic_generator = GENERATORS[ generator_name ]( genetic_algorithm )
+
+        n_generations = 0
+        best_score = None
+        best_specimen = None
+        start_time = time.perf_counter()
+        for _, _, best_score, best_specimen in genetic_generator:
+            n_generations += 1
+            if time.perf_counter() - start_time >= DURATION_SECONDS:
+                break
+        duration = time.perf_counter() - start_time
+        n_accepted_genes = len( genetic_algorithm.get_specimen_genes( best_specimen ) )
+        accepted_genes_per_second = n_accepted_genes / duration
+        if reference_accepted_genes_per_second is None:
+            reference_accepted_genes_per_second = accepted_genes_per_second
+
+        row = {
+            'algorithm'                 : algorithm_name,
+            'generator'                 : generator_name,
+            'n_candidates'              : n_candidates,
+            'n_committed_candidates'    : n_committed_candidates,
+            'generations_per_second'    : round( n_generations / duration, 1 ),
+            'accepted_genes_per_second' : round( accepted_genes_per_second, 1 ),
+            'final_score'               : round( best_score * 100, 3 ),
+            # left empty when the reference did not accept any genes
+            'speedup'                   : get_ratio( accepted_genes_per_second, reference_accepted_genes_per_second ),
+        }
+        logger.info( row )
+        rows.append( row )
+    return rows
+
+
+def benchmark_candidate_strokes() -> None:
+    image = cv2.imread( str( INPUT_IMAGE_PATH ) )
+    assert image is not None, f"Could not read image: {INPUT_IMAGE_PATH}"
+
+    rows = list( itertools.chain.from_iterable(
+        benchmark_candidate_strokes_for_algorithm( algorithm_name, generator_name, image )
+        for algorithm_name, generator_name in itertools.product( ALGORITHMS, GENERATORS )
+    ) )
+
+    write_benchmark_csv( rows, OUTPUT_PATH )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    benchmark_candidate_strokes()
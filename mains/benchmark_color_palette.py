@@ -0,0 +1,95 @@
+import logging
+from pathlib import Path
+import time
+
+import cv2
+import numpy as np
+
+from mains.benchmark_results import get_ratio, write_benchmark_csv
+from utils.color_palette import ColorPalette, get_fit_pixels
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH        = ROOT_DIR / '_input_images'
+OUTPUT_PATH             = ROOT_DIR / 'results/benchmarks/color_palette.csv'
+
+# A range of image sizes, the original images are where clustering all pixels really hurts
+IMAGES = [
+    'tim-mossholder-cO5-QcKIR9o-unsplash.jpg',
+    'original/tim-mossholder-cO5-QcKIR9o-unsplash.jpg',
+    'original/david-clode-oTMGUchAwTQ-unsplash.jpg',
+]
+
+# The first configuration is the reference that the others are compared with
+PALETTE_CONFIGURATIONS = {
+    'full'                  : { },
+    'subsample_100k'        : { 'n_fit_pixels' : 100_000 },
+    'subsample_10k'         : { 'n_fit_pixels' : 10_000 },
+    'mini_batch'            : { 'use_mini_batch' : True },
+    'mini_batch_100k'       : { 'use_mini_batch' : True, 'n_fit_pixels' : 100_000 },
+}
+
+# Quality is measured on a fixed subset of pixels, so that measuring it does not take longer than clustering
+N_QUALITY_PIXELS = 200_000
+
+
+def get_palette_error( pixels : np.ndarray, main_colors : np.ndarray ) -> float:
+    """
+    The mean distance of every pixel to its closest main color, lower is better
+    """
+    errors = []
+    for pixel_chunk in np.array_split( pixels.astype( np.float64 ), max( 1, len( pixels ) // 10_000 ) ):
+        distances = np.linalg.norm( pixel_chunk[ :, None, : ] - main_colors[ None, :, : ], axis = 2 )
+        errors.append( np.min( distances, axis = 1 ) )
+    return float( np.mean( np.concatenate( errors ) ) )
+
+
+def benchmark_color_palette( image_path : Path, is_hsv : bool ) -> list[dict]:
+    image = cv2.imread( str( image_path ) )
+    assert image is not None, f"Could not read image: {image_path}"
+    if is_hsv:
+        image = cv2.cvtColor( image, cv2.COLOR_BGR2HSV )
+    quality_pixels = get_fit_pixels( image, N_QUALITY_PIXELS )
+
+    rows = [ ]
+    # the unrounded measurements of the first configuration, which the others are compared with
+    reference_build_time = None
+    reference_palette_error = None
+    for configuration_name, palette_arguments in PALETTE_CONFIGURATIONS.items():
+        start_time = time.perf_counter()
+        palette = ColorPalette( image, is_hsv = is_hsv, **palette_arguments )
+        build_time = time.perf_counter() - start_time
+        palette_error = get_palette_error( quality_pixels, palette.main_colors )
+        if reference_build_time is None:
+            reference_build_time, reference_palette_error = build_time, palette_error
+
+        row = {
+            'image'                 : str( image_path.relative_to( INPUT_IMAGE_PATH ) ),
+            'is_hsv'                : is_hsv,
+            'n_pixels'              : image.shape[ 0 ] * image.shape[ 1 ],
+            'configuration'         : configuration_name,
+            'build_time_s'          : round( build_time, 3 ),
+            'palette_error'         : round( palette_error, 3 ),
+            'speedup'               : get_ratio( reference_build_time, build_time ),
+            'relative_error'        : get_ratio( palette_error, reference_palette_error, n_digits = 3 ),
+        }
+        logger.info( row )
+        rows.append( row )
+    return rows
+
+
+def benchmark_color_palettes() -> None:
+    rows = [ ]
+    for image_name in IMAGES:
+        for is_hsv in [ False, True ]:
+            rows.extend( benchmark_color_palette( INPUT_IMAGE_PATH / image_name, is_hsv ) )
+
+    write_benchmark_csv( rows, OUTPUT_PATH )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    benchmark_color_palettes()
@@ -0,0 +1,62 @@
+import logging
+import os
+from pathlib import Path
+
+import cv2
+
+from genetic_algorithms.common.island_model import get_best_score_over_time, run_island_model
+from genetic_algorithms.impl.abstract import get as get_abstract
+from mains.benchmark_results import write_benchmark_csv
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH        = ROOT_DIR / '_input_images/tim-mossholder-cO5-QcKIR9o-unsplash.jpg'
+OUTPUT_PATH             = ROOT_DIR / 'results/benchmarks/island_model.csv'
+
+# Every configuration runs the same number of generations per island,
+# the first configuration is a single island, which is the reference
+ISLAND_COUNTS           = [ 1, 2, os.cpu_count() ]
+N_GENERATIONS           = 1000
+MIGRATION_INTERVAL      = 50
+
+ALGORITHM_ARGUMENTS     = {
+    'n_genes' : 100,
+    'use_incremental_rendering' : True,
+}
+
+
+def benchmark_island_model() -> None:
+    image = cv2.imread( str( INPUT_IMAGE_PATH ) )
+    assert image is not None, f"Could not read image: {INPUT_IMAGE_PATH}"
+
+    rows = [ ]
+    for n_islands in sorted( set( ISLAND_COUNTS ) ):
+        results = run_island_model(
+            get_abstract,
+            image,
+            algorithm_arguments = ALGORITHM_ARGUMENTS,
+            n_islands = n_islands,
+            n_generations = N_GENERATIONS,
+            migration_interval = MIGRATION_INTERVAL,
+        )
+        best_score_over_time = get_best_score_over_time( results )
+        seconds, best_score = best_score_over_time[ -1 ]
+        logger.info( f'{n_islands} islands reached score {round( best_score * 100, 3 )} in {seconds:.1f} seconds' )
+        rows.extend(
+            {
+                'n_islands'     : n_islands,
+                'seconds'       : round( seconds, 3 ),
+                'best_score'    : round( best_score * 100, 3 ),
+            }
+            for seconds, best_score in best_score_over_time
+        )
+
+    write_benchmark_csv( rows, OUTPUT_PATH )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    benchmark_island_model()
@@ -0,0 +1,144 @@
+import itertools
+import logging
+from pathlib import Path
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from mains.benchmark_results import write_benchmark_csv
+from primitives.brush import Brush, draw_brush_on_image, preload_brush_textures
+from primitives.circle import Circle, draw_circle_on_image
+from primitives.ellipse import Ellipse, draw_ellipse_on_image
+from primitives.point import Point
+from utils.absolute_difference_image import get_absolute_difference_image
+from utils.color_palette import ColorPalette
+from utils.image_gradient import ImageGradient
+from utils.sample_weighted_position_from_image import sample_weighted_position_from_image
+from utils.weighted_position_sampler import WeightedPositionSampler
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+BRUSH_DIRECTORY         = ROOT_DIR / '_input_images/brushes/oil'
+OUTPUT_PATH             = ROOT_DIR / 'results/benchmarks/primitives.csv'
+
+# Every function is timed in isolation, on synthetic inputs, for a sweep of sizes,
+# so that the results show how its cost scales, and where it suddenly gets much more expensive.
+# Images are square, with sides of this many pixels
+IMAGE_SIZES             = [ 128, 256, 512, 1024, 2048, 4096 ]
+# the width of brushes and the diameter of circles and ellipses, in pixels
+BRUSH_SIZES             = [ 4, 8, 16, 32, 64, 128, 256 ]
+# the number of colors in the palette, the default palette has 17 main colors with 6 variations each
+PALETTE_SIZES           = [ 6, 24, 102, 408, 1632 ]
+
+# drawing should not depend on the size of the image, so we only check that for a few image sizes
+DRAW_IMAGE_SIZES        = [ 256, 1024, 4096 ]
+
+# Every measurement calls the function until this much time has passed, and at least MIN_N_CALLS times
+MIN_DURATION_SECONDS    = 0.2
+MIN_N_CALLS             = 5
+
+RANDOM_SEED             = 1337
+
+
+def get_seconds_per_call( f : Callable[ [ ], object ] ) -> Tuple[ float, int ]:
+    """
+    Returns the mean duration of a call to f, and the number of calls it was measured over
+    """
+    f()  # the first call can include one-time costs, like filling caches
+    n_calls = 0
+    start_time = time.perf_counter()
+    duration = 0.0
+    while n_calls < MIN_N_CALLS or duration < MIN_DURATION_SECONDS:
+        f()
+        n_calls += 1
+        duration = time.perf_counter() - start_time
+    return duration / n_calls, n_calls
+
+
+def _get_random_image( image_size : int ) -> np.ndarray:
+    return np.random.randint( 0, 256, ( image_size, image_size, 3 ), dtype = np.uint8 )
+
+
+def _get_row( function_name : str, f : Callable[ [ ], object ], image_size = None, brush_size = None, palette_size = None ) -> Dict:
+    seconds_per_call, n_calls = get_seconds_per_call( f )
+    row = {
+        'function'              : function_name,
+        'image_size'            : image_size,
+        'brush_size'            : brush_size,
+        'palette_size'          : palette_size,
+        'n_calls'               : n_calls,
+        'microseconds_per_call' : round( 1e6 * seconds_per_call, 3 ),
+    }
+    logger.info( row )
+    return row
+
+
+def benchmark_drawing() -> List[ Dict ]:
+    preload_brush_textures( BRUSH_DIRECTORY )
+    rows = [ ]
+    for image_size in DRAW_IMAGE_SIZES:
+        image = _get_random_image( image_size )
+        center = Point( image_size // 2, image_size // 2 )
+        for brush_size in BRUSH_SIZES:
+            # brushes of the same size and angle reuse the same cached mask, like most brushes in a long run do
+            brush = Brush( color = ( 40, 120, 200 ), texture_index = 0, position = center, angle = 30.0, size = brush_size )
+            ellipse = Ellipse( color = ( 40, 120, 200 ), position = center, axes = ( brush_size // 2, max( 1, brush_size // 8 ) ), angle = 30.0 )
+            circle = Circle( color = ( 40, 120, 200 ), position = center, radius = brush_size // 2 )
+            rows.append( _get_row( 'draw_brush_on_image', lambda : draw_brush_on_image( brush, image ), image_size, brush_size ) )
+            rows.append( _get_row( 'draw_ellipse_on_image', lambda : draw_ellipse_on_image( ellipse, image ), image_size, brush_size ) )
+            rows.append( _get_row( 'draw_circle_on_image', lambda : draw_circle_on_image( circle, image ), image_size, brush_size ) )
+    return rows
+
+
+def benchmark_images() -> List[ Dict ]:
+    rows = [ ]
+    for image_size in IMAGE_SIZES:
+        image = _get_random_image( image_size )
+        target_image = _get_random_image( image_size )
+        rows.append( _get_row( 'get_absolute_difference_image', lambda : get_absolute_difference_image( image, target_image ), image_size ) )
+
+        # sampling a single position from the entire image is O(pixels),
+        # the sampler is included for comparison, since it was made to avoid exactly that
+        diff_image = get_absolute_difference_image( image, target_image )
+        position_sampler = WeightedPositionSampler( diff_image )
+        rows.append( _get_row( 'sample_weighted_position_from_image', lambda : sample_weighted_position_from_image( diff_image ), image_size ) )
+        rows.append( _get_row( 'WeightedPositionSampler.sample_position', position_sampler.sample_position, image_size ) )
+
+        image_gradient = ImageGradient( image )
+        positions = [ Point( random.randrange( image_size ), random.randrange( image_size ) ) for _ in range( 1000 ) ]
+        position_iterator = itertools.cycle( positions )
+        rows.append( _get_row( 'ImageGradient.get_direction', lambda : image_gradient.get_direction( next( position_iterator ) ), image_size ) )
+        rows.append( _get_row( 'ImageGradient.get_magnitude', lambda : image_gradient.get_magnitude( next( position_iterator ) ), image_size ) )
+    return rows
+
+
+def benchmark_color_palette() -> List[ Dict ]:
+    rows = [ ]
+    for palette_size in PALETTE_SIZES:
+        colors = np.random.randint( 0, 256, ( palette_size, 3 ) )
+        color_palette = ColorPalette.from_colors( colors, colors )
+        color = ( 40, 120, 200 )
+        rows.append( _get_row(
+            'ColorPalette.get_matching_color_with_probabilities',
+            lambda : color_palette.get_matching_color_with_probabilities( color ),
+            palette_size = palette_size,
+        ) )
+    return rows
+
+
+def benchmark_primitives() -> None:
+    random.seed( RANDOM_SEED )
+    np.random.seed( RANDOM_SEED )
+    rows = benchmark_drawing() + benchmark_images() + benchmark_color_palette()
+
+    write_benchmark_csv( rows, OUTPUT_PATH )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    benchmark_primitives()
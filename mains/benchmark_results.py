@@ -0,0 +1,34 @@
+import csv
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Shared by the benchmarks in mains, which write a row per measurement to a CSV file,
+# and compare every configuration with the first one, the reference.
+
+
+def get_ratio( value : float, reference_value : float, n_digits : int = 2 ) -> Optional[ float ]:
+    """
+    Returns value / reference_value, rounded to n_digits,
+    or None, which is written as an empty cell, when the reference value is 0.
+    Pass unrounded values, since rounding them first skews the ratio.
+    """
+    if reference_value == 0:
+        return None
+    return round( value / reference_value, n_digits )
+
+
+def write_benchmark_csv( rows : List[ Dict ], output_path : Path ) -> None:
+    """
+    Writes the rows to output_path, with the keys of the first row as columns
+    """
+    output_path.parent.mkdir( parents = True, exist_ok = True )
+    with open( output_path, 'w', newline = '' ) as csv_file:
+        writer = csv.DictWriter( csv_file, fieldnames = list( rows[ 0 ].keys() ) )
+        writer.writeheader()
+        writer.writerows( rows )
+    logger.info( f'Wrote results to {output_path}' )
@@ -0,0 +1,43 @@
+import logging
+from pathlib import Path
+
+from genetic_algorithms.common.tiled_run import run_genetic_algorithm_pointillism_tiled
+from redraw import redraw_pointillism_as_svg
+
+
+logger = logging.getLogger(__name__)
+
+
+ROOT_DIR                = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH        = ROOT_DIR / '_input_images/denys-nevozhai-2vmT5_FeMck-unsplash.jpg'
+OUTPUT_DIRECTORY_PATH   = ROOT_DIR / 'results/tiled_pointillism'
+
+# Tiles are evolved in parallel, so a pool with a worker per core keeps all cores busy
+N_WORKERS               = None
+TILE_SIZE               = 1024
+OVERLAP                 = 64
+
+
+def tiled_pointillism() -> None:
+    use_hsv = True
+    result = run_genetic_algorithm_pointillism_tiled(
+        input_image_path = INPUT_IMAGE_PATH,
+        output_directory_path = OUTPUT_DIRECTORY_PATH,
+        algorithm_arguments = {
+            'use_hsv' : use_hsv,
+            'use_incremental_fitness' : True,
+            # see mains/benchmark_color_palette.py
+            'color_palette_arguments' : { 'n_fit_pixels' : 100_000 },
+        },
+        tile_size = TILE_SIZE,
+        overlap = OVERLAP,
+        n_workers = N_WORKERS,
+    )
+    result_svg = redraw_pointillism_as_svg( result, use_hsv, ellipse_scale = 1.0 )
+    result_svg.saveas( f'{OUTPUT_DIRECTORY_PATH}/merged_result.svg' )
+    logger.info( f'Wrote merged result to {OUTPUT_DIRECTORY_PATH}/merged_result.svg' )
+
+
+if __name__ == '__main__':
+    logging.basicConfig( level = logging.INFO )
+    tiled_pointillism()
@@ -2,5 +2,7 @@ from .brush import *
 from .circle import *
 from .color import *
 from .ellipse import *
+from .gene_array import *
 from .image import *
-from .point import *
\ No newline at end of file
+from .point import *
+from .rectangle import *
\ No newline at end of file
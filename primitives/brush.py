@@ -1,13 +1,16 @@
+from collections import OrderedDict
 from dataclasses import dataclass
 import random
+import threading
 
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
 from primitives.color import Color
 from primitives.point import Point
+from primitives.rectangle import Rectangle
 
 
 @dataclass
@@ -22,63 +25,270 @@ class Brush:
 PRELOADED_BUSH_TEXTURES : Optional[List ] = None
 
 
+# Textures are kept per directory, so that every process only has to read them from disk once,
+# even when it runs many paintings with the same brushes
+PRELOADED_BRUSH_TEXTURES_BY_DIRECTORY : Dict[ Path, List[ np.ndarray ] ] = { }
+
+
 def set_global_brush_textures( brush_textures : List[np.ndarray ] ) -> None:
     global PRELOADED_BUSH_TEXTURES
+    if brush_textures is PRELOADED_BUSH_TEXTURES:
+        return
     PRELOADED_BUSH_TEXTURES = brush_textures
+    # cached masks were made from the previous textures
+    get_global_brush_texture_cache().clear()
 
 
 def get_global_brush_textures() -> List[np.ndarray]:
     return PRELOADED_BUSH_TEXTURES
 
 
+def load_brush_textures( directory_name : Path ) -> List[ np.ndarray ]:
+    directory_name = Path( directory_name ).resolve()
+    textures = PRELOADED_BRUSH_TEXTURES_BY_DIRECTORY.get( directory_name )
+    if textures is None:
+        texture_paths = []
+        for extension in [ '.jpg', '.png' ]:
+            texture_paths.extend( list( directory_name.rglob( f'*{extension}' ) ) )
+        textures = [ cv2.imread( str(texture_path) ) for texture_path in texture_paths ]
+        textures = [ cv2.cvtColor( texture, cv2.COLOR_BGR2GRAY ) for texture in textures ]
+        PRELOADED_BRUSH_TEXTURES_BY_DIRECTORY[ directory_name ] = textures
+    return textures
+
+
 def preload_brush_textures( directory_name : Path ):
-    texture_paths = []
-    for extension in [ '.jpg', '.png' ]:
-        texture_paths.extend( list( directory_name.rglob( f'*{extension}' ) ) )
-    textures = [ cv2.imread( str(texture_path) ) for texture_path in texture_paths ]
-    textures = [ cv2.cvtColor( texture, cv2.COLOR_BGR2GRAY ) for texture in textures ]
-    set_global_brush_textures( textures )
+    set_global_brush_textures( load_brush_textures( directory_name ) )
 
 
-def random_brush_texture_index():
-    return random.choice( range( len( get_global_brush_textures() ) ) )
+class BrushTextureCache:
 
+    """
+    A least recently used cache of scaled and rotated brush textures,
+    which are used as alpha masks when drawing brushes.
 
-def draw_brush_on_image( brush : Brush, image : np.ndarray ) -> np.ndarray:
-    image_height, image_width = image.shape[:2]
+    Brush sizes are integers, so brushes of the same size and angle share the same transformed texture.
+    By default every brush is rotated by its exact angle, so that brushes are drawn exactly as before.
+    Set angle_bucket_size to quantize angles into buckets of that many degrees,
+    so that many more brushes share the same transformed texture,
+    and we do not have to resize and rotate the texture for most brushes we draw.
+    Masks are evicted when their total size exceeds max_n_bytes.
+    """
+
+    def __init__( self, max_n_bytes : int = 256 * 1024 ** 2, angle_bucket_size : Optional[ float ] = None ):
+        self.max_n_bytes = max_n_bytes
+        self.angle_bucket_size = angle_bucket_size
+        self._masks : OrderedDict[ Tuple, np.ndarray ] = OrderedDict()
+        self.n_bytes = 0
+        self.n_hits = 0
+        self.n_misses = 0
+
+    @property
+    def hit_rate( self ) -> float:
+        n_lookups = self.n_hits + self.n_misses
+        return self.n_hits / n_lookups if n_lookups > 0 else 0.0
+
+    def clear( self ) -> None:
+        self._masks.clear()
+        self.n_bytes = 0
+
+    def _get_quantized_angle( self, angle : float ) -> float:
+        if not self.angle_bucket_size:
+            return angle
+        return round( angle / self.angle_bucket_size ) * self.angle_bucket_size
+
+    def get_alpha_mask( self, texture_index : int, size : int, angle : float ) -> np.ndarray:
+        """
+        Returns the texture at the given size and (quantized) angle, as a read-only mask.
+        The mask is repeated over the 3 color channels, and stored as uint16,
+        so it can directly be used for compositing without any conversions.
+        """
+        quantized_angle = self._get_quantized_angle( angle )
+        key = ( texture_index, size, quantized_angle )
+
+        mask = self._masks.get( key )
+        if mask is not None:
+            self.n_hits += 1
+            self._masks.move_to_end( key )
+            return mask
+
+        self.n_misses += 1
+        mask = _get_transformed_brush_texture( texture_index, size, quantized_angle )
+        mask.setflags( write = False )
 
-    brush_texture_original = get_global_brush_textures()[brush.texture_index ]
-    brush_texture_scaled = cv2.resize( brush_texture_original, (brush.size, brush.size) )
+        # masks that on their own are larger than the cache are not worth evicting everything else for
+        if mask.nbytes <= self.max_n_bytes:
+            self._masks[ key ] = mask
+            self.n_bytes += mask.nbytes
+            while self.n_bytes > self.max_n_bytes:
+                _, evicted_mask = self._masks.popitem( last = False )
+                self.n_bytes -= evicted_mask.nbytes
+        return mask
+
+
+GLOBAL_BRUSH_TEXTURE_CACHE = BrushTextureCache()
+
+
+def set_global_brush_texture_cache( brush_texture_cache : BrushTextureCache ) -> None:
+    global GLOBAL_BRUSH_TEXTURE_CACHE
+    GLOBAL_BRUSH_TEXTURE_CACHE = brush_texture_cache
+
+
+def get_global_brush_texture_cache() -> BrushTextureCache:
+    return GLOBAL_BRUSH_TEXTURE_CACHE
+
+
+def _get_transformed_brush_texture( texture_index : int, size : int, angle : float ) -> np.ndarray:
+    brush_texture_original = get_global_brush_textures()[ texture_index ]
+    brush_texture_scaled = cv2.resize( brush_texture_original, (size, size) )
     brush_height, brush_width = brush_texture_scaled.shape[:2]
 
-    transformation_matrix = cv2.getRotationMatrix2D( (brush_width/2, brush_height/2), brush.angle, 1 )
+    transformation_matrix = cv2.getRotationMatrix2D( (brush_width/2, brush_height/2), angle, 1 )
     brush_texture_rotated = cv2.warpAffine( brush_texture_scaled, transformation_matrix, (brush_width, brush_height))
+    return np.repeat( brush_texture_rotated[ :, :, None ], 3, axis = 2 ).astype( np.uint16 )
+
+
+def get_scaled_brush( brush : Brush, scale : float ) -> Brush:
+    """
+    Returns a copy of the brush for drawing on an image that is scaled by scale
+    """
+    return Brush(
+        color = brush.color,
+        texture_index = brush.texture_index,
+        position = Point( int( brush.position.x * scale ), int( brush.position.y * scale ) ),
+        angle = brush.angle,
+        # brushes of size 0 can not be resized to
+        size = max( 1, int( brush.size * scale ) ),
+    )
+
+
+def random_brush_texture_index():
+    return random.choice( range( len( get_global_brush_textures() ) ) )
 
-    alpha = brush_texture_rotated.astype( float ) / 255.0
-    alpha_3 = np.dstack( (alpha, alpha, alpha) )
 
-    foreground = np.zeros( (*brush_texture_rotated.shape, 3), np.uint8 )
-    foreground[ :, : ] = brush.color
+def _get_brush_draw_position( brush : Brush ):
+    # note that brush width and height are expected to be equal
+    draw_y = int( brush.position.y - brush.size / 2 )
+    draw_x = int( brush.position.x - brush.size / 2 )
+    return draw_y, draw_x
 
-    draw_y = int( brush.position.y - brush_width / 2 )
-    draw_x = int( brush.position.x - brush_height / 2 )
+
+def get_brush_rectangle( brush : Brush, image_shape ) -> Rectangle:
+    """
+    Returns the region of the image that drawing this brush can touch.
+    """
+    draw_y, draw_x = _get_brush_draw_position( brush )
+    rectangle = Rectangle(
+        x_min = draw_x,
+        y_min = draw_y,
+        x_max = draw_x + brush.size,
+        y_max = draw_y + brush.size,
+    )
+    return rectangle.get_clipped( image_shape )
+
+
+# Compositing modes for drawing brushes, see set_global_brush_compositing
+COMPOSITING_FLOAT = 'float'
+COMPOSITING_INTEGER = 'integer'
+COMPOSITING_CHECKED = 'checked'
+
+# floating point by default, so that brushes are drawn exactly as before, also when redrawing existing results
+GLOBAL_BRUSH_COMPOSITING = COMPOSITING_FLOAT
+GLOBAL_BRUSH_COMPOSITING_TOLERANCE = 1
+
+
+def set_global_brush_compositing( compositing : str, tolerance : int = 1 ) -> None:
+    """
+    COMPOSITING_FLOAT uses the original floating point compositing, and is the default.
+    COMPOSITING_INTEGER uses fixed point integer compositing, in place, which is faster,
+    but can differ 1 per channel from floating point compositing.
+    COMPOSITING_CHECKED uses integer compositing,
+    but asserts that the result differs at most `tolerance` from floating point compositing.
+    Note that the float path truncates results that should have been exact integers just below them,
+    so a tolerance of 0 will fail for some combinations of colors and alpha, and a tolerance of 1 will not.
+    """
+    global GLOBAL_BRUSH_COMPOSITING, GLOBAL_BRUSH_COMPOSITING_TOLERANCE
+    assert compositing in ( COMPOSITING_FLOAT, COMPOSITING_INTEGER, COMPOSITING_CHECKED ), f'Unknown compositing "{compositing}"'
+    GLOBAL_BRUSH_COMPOSITING = compositing
+    GLOBAL_BRUSH_COMPOSITING_TOLERANCE = tolerance
+
+
+def get_global_brush_compositing() -> str:
+    return GLOBAL_BRUSH_COMPOSITING
+
+
+def _composite_float( background : np.ndarray, alpha_mask : np.ndarray, color : Color ) -> np.ndarray:
+    # the foreground color is broadcast instead of building a full foreground image
+    alpha = alpha_mask / 255.0
+    foreground_color = np.array( color, np.uint8 )
+    return background * (1 - alpha) + foreground_color * alpha
+
+
+# scratch buffers for integer compositing, per thread, so we do not have to allocate them for every brush
+_COMPOSITING_BUFFERS = threading.local()
+
+
+def _get_compositing_buffers( shape ) -> Tuple[ np.ndarray, np.ndarray ]:
+    n_elements = int( np.prod( shape ) )
+    buffers = getattr( _COMPOSITING_BUFFERS, 'buffers', None )
+    if buffers is None or buffers.shape[ 1 ] < n_elements:
+        buffers = np.empty( ( 2, n_elements ), np.uint16 )
+        _COMPOSITING_BUFFERS.buffers = buffers
+    return buffers[ 0, :n_elements ].reshape( shape ), buffers[ 1, :n_elements ].reshape( shape )
+
+
+def _composite_integer_inplace( background : np.ndarray, alpha_mask : np.ndarray, color : Color ) -> None:
+    """
+    Computes floor( ( background * (255 - alpha) + color * alpha ) / 255 ) in uint16,
+    which can not overflow because 255 * 255 fits in 16 bits.
+    The division by 255 is done with shifts: floor( x / 255 ) == ( x + 1 + ( x >> 8 ) ) >> 8, for all x <= 255 * 255
+    All intermediate results are written to reused scratch buffers, and the result is written into background.
+    """
+    work, scratch = _get_compositing_buffers( background.shape )
+
+    np.subtract( 255, alpha_mask, out = scratch )
+    np.copyto( work, background )
+    np.multiply( work, scratch, out = work )
+    np.multiply( alpha_mask, np.array( color, np.uint16 ), out = scratch )
+    np.add( work, scratch, out = work )
+
+    np.right_shift( work, 8, out = scratch )
+    np.add( work, scratch, out = work )
+    np.add( work, 1, out = work )
+    np.right_shift( work, 8, out = work )
+    np.copyto( background, work, casting = 'unsafe' )
+
+
+def draw_brush_on_image( brush : Brush, image : np.ndarray ) -> np.ndarray:
+    alpha_mask = get_global_brush_texture_cache().get_alpha_mask( brush.texture_index, brush.size, brush.angle )
+    draw_y, draw_x = _get_brush_draw_position( brush )
 
     # define region of interest
-    y_min = max( draw_y, 0 )
-    y_max = min( draw_y + brush_height, image_height )
-    x_min = max( draw_x, 0 )
-    x_max = min( draw_x + brush_width, image_width )
+    rectangle = get_brush_rectangle( brush, image.shape )
+    y_min, y_max = rectangle.y_min, rectangle.y_max
+    x_min, x_max = rectangle.x_min, rectangle.x_max
 
     background_subsection = image[y_min:y_max, x_min:x_max]
-    foreground_subsection = foreground[
-        y_min - draw_y : y_max - draw_y,
-        x_min - draw_x : x_max - draw_x
-    ]
-    alpha_subsection = alpha_3[
+    alpha_mask_subsection = alpha_mask[
         y_min - draw_y : y_max - draw_y,
         x_min - draw_x : x_max - draw_x
     ]
 
-    composite = background_subsection * (1 - alpha_subsection) + foreground_subsection * alpha_subsection
-    image[ y_min:y_max, x_min:x_max ] = composite
+    compositing = get_global_brush_compositing()
+    if compositing == COMPOSITING_FLOAT:
+        composite = _composite_float( background_subsection, alpha_mask_subsection, brush.color )
+        image[ y_min:y_max, x_min:x_max ] = composite
+        return image
+
+    if compositing == COMPOSITING_CHECKED:
+        expected_composite = _composite_float( background_subsection, alpha_mask_subsection, brush.color ).astype( np.uint8 )
+
+    # background_subsection is a view on the image, so this draws directly on the image
+    _composite_integer_inplace( background_subsection, alpha_mask_subsection, brush.color )
+
+    if compositing == COMPOSITING_CHECKED:
+        max_difference = np.max( np.abs( background_subsection.astype( np.int16 ) - expected_composite ), initial = 0 )
+        assert max_difference <= GLOBAL_BRUSH_COMPOSITING_TOLERANCE, (
+            f'Integer compositing differs {max_difference} from float compositing, '
+            f'which is more than the tolerance of {GLOBAL_BRUSH_COMPOSITING_TOLERANCE}'
+        )
     return image
@@ -2,7 +2,7 @@ import random
 from typing import NewType, Union
 
 from primitives.image import Image
-from utils import random_shift_within_range
+from utils.random_shift_within_range import random_shift_within_range
 
 import cv2
 import numpy as np
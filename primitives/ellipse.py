@@ -1,4 +1,5 @@
 from dataclasses import dataclass, astuple
+import math
 from typing import Tuple
 
 import cv2
@@ -6,6 +7,7 @@ import numpy as np
 
 from primitives.color import Color
 from primitives.point import Point
+from primitives.rectangle import Rectangle
 
 
 @dataclass
@@ -29,3 +31,40 @@ def draw_ellipse_on_image( ellipse : Ellipse, image : np.ndarray ) -> np.ndarray
         lineType = cv2.LINE_AA
     )
     return image
+
+
+def get_scaled_ellipse( ellipse : Ellipse, scale : float ) -> Ellipse:
+    """
+    Returns a copy of the ellipse for drawing on an image that is scaled by scale
+    """
+    return Ellipse(
+        color = ellipse.color,
+        position = Point( int( ellipse.position.x * scale ), int( ellipse.position.y * scale ) ),
+        # axes of 0 would not be drawn at all
+        axes = tuple( max( 1, int( axis * scale ) ) for axis in ellipse.axes ),
+        angle = ellipse.angle,
+    )
+
+
+# anti-aliased drawing can touch pixels just outside the mathematical outline
+ANTI_ALIASING_MARGIN = 2
+
+
+def get_ellipse_rectangle( ellipse : Ellipse, image_shape ) -> Rectangle:
+    """
+    Returns the region of the image that drawing this ellipse can touch.
+    """
+    long_axis, short_axis = ellipse.axes
+    angle = math.radians( ellipse.angle )
+    cos_angle, sin_angle = math.cos( angle ), math.sin( angle )
+    half_width = math.hypot( long_axis * cos_angle, short_axis * sin_angle )
+    half_height = math.hypot( long_axis * sin_angle, short_axis * cos_angle )
+    half_width = math.ceil( half_width ) + ANTI_ALIASING_MARGIN
+    half_height = math.ceil( half_height ) + ANTI_ALIASING_MARGIN
+    rectangle = Rectangle(
+        x_min = int( ellipse.position.x ) - half_width,
+        y_min = int( ellipse.position.y ) - half_height,
+        x_max = int( ellipse.position.x ) + half_width + 1,
+        y_max = int( ellipse.position.y ) + half_height + 1,
+    )
+    return rectangle.get_clipped( image_shape )
@@ -0,0 +1,259 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from primitives.brush import Brush, get_scaled_brush
+from primitives.circle import Circle, get_scaled_circle
+from primitives.ellipse import Ellipse, get_scaled_ellipse
+from primitives.point import Point
+
+
+@dataclass
+class GeneSchema:
+    """
+    Describes how genes of a single type are stored in a GeneArray.
+    Every column has a name, a dtype and a width, where a width larger than 1 is used for tuples, like colors.
+    f_to_values turns a gene into a value per column, and f_from_values turns those values back into a gene.
+    f_scale returns a copy of a gene for drawing on an image that is scaled by a factor.
+    """
+    columns         : Dict[ str, Tuple[ type, int ] ]
+    f_to_values     : Callable[ [ Any ], Tuple ]
+    f_from_values   : Callable[ ..., Any ]
+    f_scale         : Callable[ [ Any, float ], Any ]
+
+
+GENE_SCHEMAS : Dict[ type, GeneSchema ] = {
+    Circle : GeneSchema(
+        columns = {
+            'color'         : ( np.int64, 3 ),
+            'x'             : ( np.int64, 1 ),
+            'y'             : ( np.int64, 1 ),
+            'radius'        : ( np.int64, 1 ),
+        },
+        f_to_values = lambda circle : ( circle.color, circle.position.x, circle.position.y, circle.radius ),
+        f_from_values = lambda color, x, y, radius : Circle( color, Point( x, y ), radius ),
+        f_scale = get_scaled_circle,
+    ),
+    Ellipse : GeneSchema(
+        # colors come from a color palette of cluster centers, which are not integers
+        columns = {
+            'color'         : ( np.float64, 3 ),
+            'x'             : ( np.int64, 1 ),
+            'y'             : ( np.int64, 1 ),
+            'axes'          : ( np.int64, 2 ),
+            'angle'         : ( np.float64, 1 ),
+        },
+        f_to_values = lambda ellipse : ( ellipse.color, ellipse.position.x, ellipse.position.y, ellipse.axes, ellipse.angle ),
+        f_from_values = lambda color, x, y, axes, angle : Ellipse( color, Point( x, y ), axes, angle ),
+        f_scale = get_scaled_ellipse,
+    ),
+    Brush : GeneSchema(
+        columns = {
+            'color'         : ( np.int64, 3 ),
+            'texture_index' : ( np.int64, 1 ),
+            'x'             : ( np.int64, 1 ),
+            'y'             : ( np.int64, 1 ),
+            'angle'         : ( np.float64, 1 ),
+            'size'          : ( np.int64, 1 ),
+        },
+        f_to_values = lambda brush : ( brush.color, brush.texture_index, brush.position.x, brush.position.y, brush.angle, brush.size ),
+        f_from_values = lambda color, texture_index, x, y, angle, size : Brush( color, texture_index, Point( x, y ), angle, size ),
+        f_scale = get_scaled_brush,
+    ),
+}
+
+
+class GeneArray:
+
+    """
+    A list of genes of a single type, stored as a NumPy array per field instead of as separate objects.
+
+    A converged specimen can have hundreds of thousands of genes,
+    which as dataclasses take a lot of memory, and are slow to copy and pickle.
+    Here copying and pickling only copies a few arrays.
+    Genes are appended at the end, and the arrays grow by doubling their capacity, just like a list.
+
+    Indexing returns a new gene object, so changing that object does not change the array.
+    Write changed genes back with genes[ i ] = gene.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__( self, gene_type : type, genes : Iterable = ( ) ):
+        self.gene_type = gene_type
+        self._length = 0
+        self._columns = self._allocate_columns( self.INITIAL_CAPACITY )
+        self.extend( genes )
+
+    @property
+    def _schema( self ) -> GeneSchema:
+        return GENE_SCHEMAS[ self.gene_type ]
+
+    @property
+    def capacity( self ) -> int:
+        return len( next( iter( self._columns.values() ) ) )
+
+    def _allocate_columns( self, capacity : int ) -> Dict[ str, np.ndarray ]:
+        return {
+            name : np.zeros( ( capacity, width ) if width > 1 else ( capacity, ), dtype )
+            for name, ( dtype, width ) in self._schema.columns.items()
+        }
+
+    def _reserve( self, capacity : int ) -> None:
+        if capacity <= self.capacity:
+            return
+        new_capacity = max( capacity, 2 * self.capacity )
+        new_columns = self._allocate_columns( new_capacity )
+        for name, column in self._columns.items():
+            new_columns[ name ][ :self._length ] = column[ :self._length ]
+        self._columns = new_columns
+
+    def _get_index( self, index : int ) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError( 'GeneArray index out of range' )
+        return index
+
+    def _set_values( self, index : int, gene ) -> None:
+        for column, value in zip( self._columns.values(), self._schema.f_to_values( gene ) ):
+            column[ index ] = value
+
+    def _get_values( self, index : int ) -> List:
+        return [
+            tuple( column[ index ].tolist() ) if column.ndim > 1 else column[ index ].item()
+            for column in self._columns.values()
+        ]
+
+    def __len__( self ) -> int:
+        return self._length
+
+    def __getitem__( self, index : Union[ int, slice ] ):
+        if isinstance( index, slice ):
+            return [ self[ i ] for i in range( *index.indices( self._length ) ) ]
+        return self._schema.f_from_values( *self._get_values( self._get_index( index ) ) )
+
+    def __setitem__( self, index : int, gene ) -> None:
+        self._set_values( self._get_index( index ), gene )
+
+    def __delitem__( self, index : Union[ int, slice ] ) -> None:
+        if isinstance( index, slice ):
+            start, stop, step = index.indices( self._length )
+            # removing everything from some index onwards is common, for example when reverting mutations,
+            # and does not require moving any data
+            if step == 1 and stop == self._length:
+                self._length = min( start, self._length )
+                return
+            deleted_indices = np.arange( start, stop, step )
+        else:
+            deleted_indices = np.array( [ self._get_index( index ) ] )
+        n_remaining = self._length - len( deleted_indices )
+        for name, column in self._columns.items():
+            column[ :n_remaining ] = np.delete( column[ :self._length ], deleted_indices, axis = 0 )
+        self._length = n_remaining
+
+    def __iter__( self ) -> Iterator:
+        # converting entire columns at once is much faster than converting single values
+        columns = [
+            [ tuple( value ) for value in column[ :self._length ].tolist() ] if column.ndim > 1 else column[ :self._length ].tolist()
+            for column in self._columns.values()
+        ]
+        f_from_values = self._schema.f_from_values
+        for values in zip( *columns ):
+            yield f_from_values( *values )
+
+    def __eq__( self, other ) -> bool:
+        if not isinstance( other, GeneArray ):
+            return NotImplemented
+        return (
+            self.gene_type is other.gene_type
+            and self._length == other._length
+            and all( np.array_equal( self.get_column( name ), other.get_column( name ) ) for name in self._columns )
+        )
+
+    def __repr__( self ) -> str:
+        return f'GeneArray( {self.gene_type.__name__}, {self._length} genes )'
+
+    def append( self, gene ) -> None:
+        self._reserve( self._length + 1 )
+        self._set_values( self._length, gene )
+        self._length += 1
+
+    def extend( self, genes : Iterable ) -> None:
+        if isinstance( genes, GeneArray ) and genes.gene_type is self.gene_type:
+            n_genes = len( genes )
+            self._reserve( self._length + n_genes )
+            for name, column in self._columns.items():
+                column[ self._length : self._length + n_genes ] = genes.get_column( name )
+            self._length += n_genes
+            return
+        for gene in genes:
+            self.append( gene )
+
+    def take( self, indices : np.ndarray ) -> 'GeneArray':
+        """
+        Returns a new GeneArray with the genes at the given indices, in that order.
+        A boolean mask also works.
+        """
+        gene_array = GeneArray.__new__( GeneArray )
+        gene_array.__setstate__( {
+            'gene_type' : self.gene_type,
+            'columns' : { name : self.get_column( name )[ indices ] for name in self._columns },
+        } )
+        return gene_array
+
+    def get_column( self, name : str ) -> np.ndarray:
+        """
+        Returns a view on the values of a field for all genes, see GENE_SCHEMAS for the names
+        """
+        return self._columns[ name ][ :self._length ]
+
+    def to_array( self ) -> np.ndarray:
+        """
+        Returns all values of all genes as a single float array, with a row per gene,
+        and the columns in the order of GENE_SCHEMAS.
+        """
+        # the width is taken from the schema, since it can not be inferred from an empty column
+        return np.column_stack( [
+            self.get_column( name ).reshape( self._length, width ).astype( np.float64 )
+            for name, ( _, width ) in self._schema.columns.items()
+        ] )
+
+    def __getstate__( self ) -> Dict:
+        # only the used part of the columns is stored
+        return {
+            'gene_type' : self.gene_type,
+            'columns' : { name : self.get_column( name ).copy() for name in self._columns },
+        }
+
+    def __setstate__( self, state : Dict ) -> None:
+        self.gene_type = state[ 'gene_type' ]
+        self._columns = state[ 'columns' ]
+        self._length = len( next( iter( self._columns.values() ) ) )
+        # an empty array still needs some capacity to grow from
+        self._reserve( 1 )
+
+    def __deepcopy__( self, memo ) -> 'GeneArray':
+        gene_array = GeneArray.__new__( GeneArray )
+        gene_array.__setstate__( self.__getstate__() )
+        return gene_array
+
+
+def make_genes_like( example_genes, genes : Iterable ):
+    """
+    Returns the genes in the same kind of container as example_genes, either a GeneArray or a list
+    """
+    if isinstance( example_genes, GeneArray ):
+        return GeneArray( example_genes.gene_type, genes )
+    return list( genes )
+
+
+def get_scaled_genes( genes : Iterable, scale : float ):
+    """
+    Returns copies of all genes for drawing on an image that is scaled by scale,
+    in the same kind of container as the genes.
+    """
+    genes = list( genes ) if not isinstance( genes, GeneArray ) else genes
+    scaled_genes = [ GENE_SCHEMAS[ type( gene ) ].f_scale( gene, scale ) for gene in genes ]
+    return make_genes_like( genes, scaled_genes )
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+
+@dataclass
+class Rectangle:
+    """
+    An axis aligned region of an image, in pixel coordinates.
+    Minimum values are inclusive, maximum values are exclusive, just like slicing.
+    """
+    x_min : int
+    y_min : int
+    x_max : int
+    y_max : int
+
+    @property
+    def width( self ) -> int:
+        return max( 0, self.x_max - self.x_min )
+
+    @property
+    def height( self ) -> int:
+        return max( 0, self.y_max - self.y_min )
+
+    def is_empty( self ) -> bool:
+        return self.width == 0 or self.height == 0
+
+    def get_slices( self ) -> Tuple[ slice, slice ]:
+        # use as image[ rectangle.get_slices() ]
+        return slice( self.y_min, self.y_max ), slice( self.x_min, self.x_max )
+
+    def get_clipped( self, image_shape ) -> 'Rectangle':
+        image_height, image_width = image_shape[ :2 ]
+        return Rectangle(
+            x_min = min( max( self.x_min, 0 ), image_width ),
+            y_min = min( max( self.y_min, 0 ), image_height ),
+            x_max = min( max( self.x_max, 0 ), image_width ),
+            y_max = min( max( self.y_max, 0 ), image_height ),
+        )
+
+    def overlaps( self, other : 'Rectangle' ) -> bool:
+        return (
+            self.x_min < other.x_max and other.x_min < self.x_max
+            and self.y_min < other.y_max and other.y_min < self.y_max
+        )
+
+
+def get_bounding_rectangle( rectangles : List[ Rectangle ] ) -> Rectangle:
+    return Rectangle(
+        x_min = min( rectangle.x_min for rectangle in rectangles ),
+        y_min = min( rectangle.y_min for rectangle in rectangles ),
+        x_max = max( rectangle.x_max for rectangle in rectangles ),
+        y_max = max( rectangle.y_max for rectangle in rectangles ),
+    )
+
+
+def get_merged_rectangles( rectangles : List[ Rectangle ] ) -> List[ Rectangle ]:
+    """
+    Replaces overlapping rectangles by their bounding rectangle, until none of the rectangles overlap,
+    so that regions covered by multiple rectangles are only processed once.
+    """
+    merged_rectangles = [ ]
+    for rectangle in rectangles:
+        if rectangle.is_empty():
+            continue
+        # merging can make a rectangle overlap with rectangles it did not overlap with before,
+        # so we keep merging until nothing overlaps anymore
+        is_merged = True
+        while is_merged:
+            is_merged = False
+            for i, merged_rectangle in enumerate( merged_rectangles ):
+                if rectangle.overlaps( merged_rectangle ):
+                    rectangle = get_bounding_rectangle( [ rectangle, merged_rectangle ] )
+                    del merged_rectangles[ i ]
+                    is_merged = True
+                    break
+        merged_rectangles.append( rectangle )
+    return merged_rectangles
+
+
+def get_overlapping_rectangle_indices( rectangles : np.ndarray, rectangle : Rectangle ) -> np.ndarray:
+    """
+    Rectangles is an array with a row of ( x_min, y_min, x_max, y_max ) per rectangle.
+    Returns the indices of all rows that overlap the rectangle, in increasing order.
+    """
+    is_overlapping = (
+        ( rectangles[ :, 0 ] < rectangle.x_max ) & ( rectangle.x_min < rectangles[ :, 2 ] )
+        & ( rectangles[ :, 1 ] < rectangle.y_max ) & ( rectangle.y_min < rectangles[ :, 3 ] )
+    )
+    return np.flatnonzero( is_overlapping )
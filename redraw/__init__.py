@@ -1,3 +1,4 @@
 from .redraw_painting import *
 from .redraw_ellipses import *
+from .redraw_gene_journal import *
 from .utils import *
\ No newline at end of file
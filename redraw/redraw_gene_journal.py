@@ -0,0 +1,55 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from genetic_algorithms.common.gene_journal import GeneJournalRecord, read_gene_journal
+from primitives import (
+    Brush,
+    Circle,
+    Ellipse,
+    GeneArray,
+    draw_brush_on_image,
+    draw_circle_on_image,
+    draw_ellipse_on_image,
+)
+
+
+F_DRAW_GENE_BY_GENE_TYPE = {
+    Brush   : draw_brush_on_image,
+    Circle  : draw_circle_on_image,
+    Ellipse : draw_ellipse_on_image,
+}
+
+
+def rebuild_from_gene_journal(
+        path        : Path,
+        generation  : Optional[ int ] = None,
+) -> Tuple[ GeneArray, np.ndarray, GeneJournalRecord ]:
+    """
+    Rebuilds the genes and image of the best specimen as they were at the last record at or before generation,
+    or at the end of the journal if generation is None, see genetic_algorithms/common/gene_journal.py
+    Returns the genes, the image, in the color space the genes are drawn in, and the record.
+    Only the genes after the last keyframe before that record are drawn.
+    For journals of Painting the brush textures have to be loaded first, see set_global_brush_textures.
+    """
+    genes = None
+    keyframe = None
+    record = None
+    for next_record in read_gene_journal( path ):
+        if generation is not None and next_record.generation > generation:
+            break
+        record = next_record
+        if genes is None:
+            genes = GeneArray( record.new_genes.gene_type )
+        del genes[ record.start_index: ]
+        genes.extend( record.new_genes )
+        if record.is_keyframe:
+            keyframe = record
+    assert record is not None, f'No records at or before generation {generation} in {path}'
+
+    image = keyframe.get_image()
+    f_draw_gene = F_DRAW_GENE_BY_GENE_TYPE[ genes.gene_type ]
+    for gene in genes.take( np.arange( keyframe.n_genes, len( genes ) ) ):
+        f_draw_gene( gene, image )
+    return genes, image, record
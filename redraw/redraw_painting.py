@@ -1,10 +1,19 @@
 import logging
 import math
 from pathlib import Path
+from typing import Sequence
 
 import numpy as np
 
-from primitives import Image, Point, Brush, get_global_brush_textures, draw_brush_on_image, preload_brush_textures
+from primitives import (
+    Image,
+    Brush,
+    get_global_brush_textures,
+    get_global_brush_texture_cache,
+    draw_brush_on_image,
+    get_scaled_brush,
+    preload_brush_textures,
+)
 from redraw.utils import get_scale_for_4k_from_image
 from genetic_algorithms.impl.painting import Painting
 
@@ -13,7 +22,7 @@ logger = logging.getLogger(__name__)
 
 
 def _redraw_painting(
-        brushes : list[Brush],
+        brushes : Sequence[Brush],
         scale: float,
         result_image: np.ndarray,
         log_verbose = False,
@@ -25,25 +34,17 @@ def _redraw_painting(
     this allows you to make higher resolution versions of your images.
     Even if some of the brushes are drawn at scales larger than the original texture resolution,
     the image detail improve drastically as the larger brushes are painted over with smaller images.
+    Brushes can be a list or a GeneArray, and are not changed.
     """
 
-    def int_scale(v):
-        return int( v * scale )
-
     n_oversized_brushes = 0
     for brush in brushes:
-
         # we will draw the brush at a new size
+        brush = get_scaled_brush( brush, scale )
         brush_texture = get_global_brush_textures()[brush.texture_index]
 
         # note that brush width and height are expected to be equal
         original_brush_size = brush_texture.shape[0]
-        brush.size = int_scale(brush.size)
-
-        brush.position = Point(
-            int_scale(brush.position.x),
-            int_scale(brush.position.y),
-        )
 
         if brush.size > original_brush_size:
             if log_verbose:
@@ -61,6 +62,8 @@ def _redraw_painting(
     # As long as oversized brushes disappear in the background when they are painted over with smaller brushes,
     # having oversized brushes is not a problem.
     logger.info(f'Encountered {n_oversized_brushes}/{len(brushes)} oversized brushes')
+    brush_texture_cache = get_global_brush_texture_cache()
+    logger.info(f'Brush texture cache hit rate: {brush_texture_cache.hit_rate:.2%} ({brush_texture_cache.n_bytes} bytes)')
     return result_image
 
 
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import cv2
+import pytest
+
+
+ROOT_DIR = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH = ROOT_DIR / '_input_images/tim-mossholder-cO5-QcKIR9o-unsplash.jpg'
+BRUSH_DIRECTORY = ROOT_DIR / '_input_images/brushes/oil'
+
+
+@pytest.fixture( scope = 'session' )
+def target_image():
+    # small, so that runs of a few hundred generations take seconds
+    return cv2.resize( cv2.imread( str( INPUT_IMAGE_PATH ) ), ( 48, 32 ), interpolation = cv2.INTER_AREA )
+
+
+@pytest.fixture( scope = 'session' )
+def brush_directory() -> Path:
+    return BRUSH_DIRECTORY
@@ -0,0 +1,19 @@
+import csv
+from pathlib import Path
+
+from mains.benchmark_results import get_ratio, write_benchmark_csv
+
+
+def test_get_ratio():
+    assert get_ratio( 3.0, 2.0 ) == 1.5
+    assert get_ratio( 1.0, 3.0, n_digits = 3 ) == 0.333
+    # a reference that rounds to 0 still gives a ratio, and a reference of 0 gives an empty cell
+    assert get_ratio( 0.08, 0.04 ) == 2.0
+    assert get_ratio( 1.0, 0.0 ) is None
+
+
+def test_write_benchmark_csv( tmp_path : Path ):
+    output_path = tmp_path / 'benchmarks' / 'results.csv'
+    write_benchmark_csv( [ { 'name' : 'a', 'speedup' : 1.0 }, { 'name' : 'b', 'speedup' : None } ], output_path )
+    with open( output_path, newline = '' ) as csv_file:
+        assert list( csv.DictReader( csv_file ) ) == [ { 'name' : 'a', 'speedup' : '1.0' }, { 'name' : 'b', 'speedup' : '' } ]
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from primitives.brush import (
+    COMPOSITING_CHECKED,
+    COMPOSITING_FLOAT,
+    COMPOSITING_INTEGER,
+    Brush,
+    draw_brush_on_image,
+    get_global_brush_compositing,
+    get_global_brush_textures,
+    preload_brush_textures,
+    set_global_brush_compositing,
+)
+from primitives.point import Point
+
+
+IMAGE_SHAPE = ( 120, 160, 3 )
+
+
+@pytest.fixture( autouse = True )
+def restore_brush_compositing():
+    compositing = get_global_brush_compositing()
+    yield
+    set_global_brush_compositing( compositing )
+
+
+def get_random_brushes( n_brushes : int ):
+    random_generator = random.Random( 0 )
+    n_textures = len( get_global_brush_textures() )
+    return [
+        Brush(
+            color = tuple( random_generator.randrange( 256 ) for _ in range( 3 ) ),
+            texture_index = random_generator.randrange( n_textures ),
+            # some brushes stick out of the image
+            position = Point( random_generator.randrange( IMAGE_SHAPE[ 1 ] ), random_generator.randrange( IMAGE_SHAPE[ 0 ] ) ),
+            angle = random_generator.uniform( -180, 180 ),
+            size = random_generator.randrange( 2, 80 ),
+        )
+        for _ in range( n_brushes )
+    ]
+
+
+def draw_brushes( brushes, compositing : str ) -> np.ndarray:
+    set_global_brush_compositing( compositing )
+    image = np.random.default_rng( 0 ).integers( 0, 256, size = IMAGE_SHAPE, dtype = np.uint8 )
+    for brush in brushes:
+        draw_brush_on_image( brush, image )
+    return image
+
+
+def test_integer_compositing_is_within_tolerance_of_float_compositing( brush_directory ):
+    preload_brush_textures( brush_directory )
+    brushes = get_random_brushes( 500 )
+
+    # checks every single brush against float compositing, on the same background
+    draw_brushes( brushes, COMPOSITING_CHECKED )
+
+    background = draw_brushes( brushes[ :100 ], COMPOSITING_FLOAT )
+    for brush in brushes[ 100: ]:
+        set_global_brush_compositing( COMPOSITING_FLOAT )
+        float_image = draw_brush_on_image( brush, background.copy() )
+        set_global_brush_compositing( COMPOSITING_INTEGER )
+        integer_image = draw_brush_on_image( brush, background.copy() )
+        assert np.max( np.abs( float_image.astype( np.int16 ) - integer_image ) ) <= 1
+
+
+def test_float_compositing_is_the_default():
+    assert get_global_brush_compositing() == COMPOSITING_FLOAT
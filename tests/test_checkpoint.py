@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from genetic_algorithms.common.run import run_genetic_algorithm_strategy
+from genetic_algorithms.common.termination import RunProgress
+from genetic_algorithms.impl.abstract import Abstract
+from genetic_algorithms.impl.painting import Painting
+from genetic_algorithms.impl.pointillism import Pointillism
+from utils.color_palette import get_main_colors
+
+
+N_GENERATIONS = 300
+
+
+@dataclass
+class GenerationTermination:
+    """
+    Stops at a generation, to interrupt a run at the same point every time
+    """
+    generation          : int
+    first_generation    : Optional[ int ] = None
+
+    def should_terminate( self, progress : RunProgress ) -> bool:
+        if self.first_generation is None:
+            self.first_generation = progress.generation
+        return progress.generation >= self.generation
+
+
+def make_algorithm( algorithm_name : str, target_image, brush_directory ):
+    if algorithm_name == 'abstract':
+        return Abstract( target_image, n_genes = 10 )
+    if algorithm_name == 'painting':
+        return Painting( target_image, brush_directory = str( brush_directory ), use_incremental_fitness = True )
+    return Pointillism( target_image, out_path_color_palette = None, use_incremental_fitness = True )
+
+
+def run( output_directory_path : Path, algorithm_name : str, target_image, brush_directory, termination : GenerationTermination, **kwargs ):
+    genetic_algorithm = make_algorithm( algorithm_name, target_image, brush_directory )
+    best_specimen = run_genetic_algorithm_strategy(
+        output_directory_path,
+        genetic_algorithm,
+        n_iterations_patience = 10 * N_GENERATIONS,
+        score_interval = 500,
+        is_pickling_desired = False,
+        termination_score = 0,
+        use_inplace_generator = algorithm_name != 'abstract',
+        use_async_result_writer = False,
+        termination_policies = [ termination ],
+        **kwargs,
+    )
+    return genetic_algorithm.get_specimen_genes( best_specimen ), best_specimen.cached_image
+
+
+@pytest.mark.parametrize( 'algorithm_name', [ 'abstract', 'painting', 'pointillism' ] )
+def test_resumed_run_matches_uninterrupted_run( tmp_path : Path, target_image, brush_directory, algorithm_name : str ):
+    uninterrupted_directory_path = tmp_path / 'uninterrupted'
+    uninterrupted_directory_path.mkdir()
+    expected_genes, expected_image = run(
+        uninterrupted_directory_path,
+        algorithm_name,
+        target_image,
+        brush_directory,
+        GenerationTermination( N_GENERATIONS ),
+    )
+
+    # a checkpoint is written every generation, so the last one is from just before the interruption
+    interrupted_directory_path = tmp_path / 'interrupted'
+    interrupted_directory_path.mkdir()
+    run(
+        interrupted_directory_path,
+        algorithm_name,
+        target_image,
+        brush_directory,
+        GenerationTermination( N_GENERATIONS // 3 ),
+        checkpoint_interval_seconds = 0,
+    )
+    resumed_termination = GenerationTermination( N_GENERATIONS )
+    genes, image = run(
+        interrupted_directory_path,
+        algorithm_name,
+        target_image,
+        brush_directory,
+        resumed_termination,
+        checkpoint_interval_seconds = 0,
+        resume = True,
+    )
+
+    # starting over would give the same result too
+    assert resumed_termination.first_generation >= N_GENERATIONS // 3 - 1
+
+    if algorithm_name == 'abstract':
+        assert genes == expected_genes
+    else:
+        np.testing.assert_array_equal( genes.to_array(), expected_genes.to_array() )
+    np.testing.assert_array_equal( image, expected_image )
+
+
+def test_color_palette_does_not_depend_on_the_random_state( target_image ):
+    # palettes are computed before the random state is restored from a checkpoint
+    np.random.seed( 0 )
+    main_colors = get_main_colors( target_image, n_colors = 5 )
+    np.random.seed( 1 )
+    np.testing.assert_array_equal( get_main_colors( target_image, n_colors = 5 ), main_colors )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from genetic_algorithms.common.evaluator import EVALUATOR_PROCESSES, EVALUATOR_SERIAL, EVALUATOR_THREADS
+from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.impl.abstract import Abstract
+
+
+N_GENERATIONS = 30
+
+
+def run_generations( target_image, **kwargs ):
+    """
+    Returns the score and a copy of the image of every generation, and the genetic algorithm
+    """
+    genetic_algorithm = Abstract( target_image, n_genes = 10, **kwargs )
+    results = [ ]
+    try:
+        for _, image, score, _ in make_genetic_algorithm_generator( genetic_algorithm ):
+            results.append( ( score, image.copy() ) )
+            if len( results ) == N_GENERATIONS:
+                break
+    finally:
+        genetic_algorithm.close()
+    return results, genetic_algorithm
+
+
+@pytest.fixture( scope = 'module' )
+def expected_results( target_image ):
+    results, _ = run_generations( target_image )
+    return results
+
+
+def assert_same_results( results, expected_results ) -> None:
+    assert len( results ) == len( expected_results )
+    for ( score, image ), ( expected_score, expected_image ) in zip( results, expected_results ):
+        assert score == expected_score
+        np.testing.assert_array_equal( image, expected_image )
+
+
+@pytest.mark.parametrize( 'evaluator', [ EVALUATOR_SERIAL, EVALUATOR_THREADS, EVALUATOR_PROCESSES ] )
+@pytest.mark.parametrize( 'use_incremental_rendering', [ False, True ] )
+def test_evaluators_match_serial_evaluation( target_image, expected_results, evaluator : str, use_incremental_rendering : bool ):
+    results, _ = run_generations(
+        target_image,
+        evaluator = evaluator,
+        n_evaluator_workers = 2,
+        use_incremental_rendering = use_incremental_rendering,
+    )
+    assert_same_results( results, expected_results )
+
+
+@pytest.mark.parametrize( 'use_incremental_rendering', [ False, True ] )
+def test_fitness_cache_does_not_change_results( target_image, expected_results, use_incremental_rendering : bool ):
+    results, genetic_algorithm = run_generations(
+        target_image,
+        use_fitness_cache = True,
+        use_incremental_rendering = use_incremental_rendering,
+    )
+    assert_same_results( results, expected_results )
+    # otherwise this would not test anything
+    assert genetic_algorithm.fitness_cache.hit_rate > 0
@@ -0,0 +1,69 @@
+import copy
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from primitives.brush import Brush
+from primitives.circle import Circle
+from primitives.ellipse import Ellipse
+from primitives.gene_array import GeneArray
+from primitives.point import Point
+
+
+def get_random_gene( gene_type : type, random_generator : random.Random ):
+    position = Point( random_generator.randrange( 100 ), random_generator.randrange( 100 ) )
+    if gene_type is Circle:
+        return Circle( tuple( random_generator.randrange( 256 ) for _ in range( 3 ) ), position, random_generator.randrange( 1, 20 ) )
+    if gene_type is Ellipse:
+        return Ellipse(
+            tuple( random_generator.uniform( 0, 255 ) for _ in range( 3 ) ),
+            position,
+            ( random_generator.randrange( 1, 20 ), random_generator.randrange( 1, 20 ) ),
+            random_generator.uniform( -180, 180 ),
+        )
+    return Brush(
+        tuple( random_generator.randrange( 256 ) for _ in range( 3 ) ),
+        random_generator.randrange( 10 ),
+        position,
+        random_generator.uniform( -180, 180 ),
+        random_generator.randrange( 1, 80 ),
+    )
+
+
+def get_random_gene_array( gene_type : type, n_genes : int ) -> GeneArray:
+    random_generator = random.Random( n_genes )
+    return GeneArray( gene_type, [ get_random_gene( gene_type, random_generator ) for _ in range( n_genes ) ] )
+
+
+def assert_same_genes( gene_array : GeneArray, expected_gene_array : GeneArray ) -> None:
+    assert gene_array.gene_type is expected_gene_array.gene_type
+    assert len( gene_array ) == len( expected_gene_array )
+    np.testing.assert_array_equal( gene_array.to_array(), expected_gene_array.to_array() )
+    assert list( gene_array ) == list( expected_gene_array )
+
+
+@pytest.mark.parametrize( 'gene_type', [ Brush, Circle, Ellipse ] )
+@pytest.mark.parametrize( 'n_genes', [ 0, 1, 100 ] )
+@pytest.mark.parametrize( 'f_copy', [ lambda genes : pickle.loads( pickle.dumps( genes ) ), copy.deepcopy ] )
+def test_copy_round_trip( gene_type : type, n_genes : int, f_copy ):
+    gene_array = get_random_gene_array( gene_type, n_genes )
+
+    gene_array_copy = f_copy( gene_array )
+    assert_same_genes( gene_array_copy, gene_array )
+
+    # the copy can grow, without changing the original
+    new_gene = get_random_gene( gene_type, random.Random( -1 ) )
+    gene_array_copy.extend( [ new_gene ] * 20 )
+    gene_array_copy[ 0 ] = new_gene
+    assert len( gene_array_copy ) == n_genes + 20
+    assert gene_array_copy[ -1 ] == new_gene
+    assert_same_genes( gene_array, get_random_gene_array( gene_type, n_genes ) )
+
+
+def test_copying_a_specimen_copies_its_genes():
+    specimen = { 'genes' : get_random_gene_array( Circle, 10 ) }
+    specimen_copy = copy.deepcopy( specimen )
+    del specimen_copy[ 'genes' ][ 5: ]
+    assert len( specimen[ 'genes' ] ) == 10
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from genetic_algorithms.common.gene_journal import read_gene_journal
+from genetic_algorithms.common.run import run_genetic_algorithm_strategy
+from genetic_algorithms.common.termination import AcceptedGenesTermination
+from genetic_algorithms.impl.abstract import Abstract
+from genetic_algorithms.impl.painting import Painting
+from genetic_algorithms.impl.pointillism import Pointillism
+from redraw.redraw_gene_journal import rebuild_from_gene_journal
+
+
+def test_gene_journal_requires_append_only_algorithm( tmp_path : Path, target_image ):
+    # Abstract changes its genes in place, which a journal would not notice
+    with pytest.raises( AssertionError ):
+        run_genetic_algorithm_strategy(
+            tmp_path,
+            Abstract( target_image, n_genes = 10 ),
+            n_iterations_patience = 10,
+            score_interval = 500,
+            is_pickling_desired = False,
+            termination_score = 0,
+            use_gene_journal = True,
+        )
+
+
+@pytest.mark.parametrize( 'algorithm_name', [ 'painting', 'pointillism' ] )
+def test_rebuild_from_gene_journal_matches_final_specimen( tmp_path : Path, target_image, brush_directory, algorithm_name : str ):
+    if algorithm_name == 'painting':
+        genetic_algorithm = Painting( target_image, brush_directory = str( brush_directory ), use_incremental_fitness = True )
+    else:
+        genetic_algorithm = Pointillism( target_image, out_path_color_palette = None, use_incremental_fitness = True )
+
+    best_specimen = run_genetic_algorithm_strategy(
+        tmp_path,
+        genetic_algorithm,
+        n_iterations_patience = 1000,
+        score_interval = 500,
+        is_pickling_desired = False,
+        termination_score = 0,
+        use_inplace_generator = True,
+        use_gene_journal = True,
+        # a few keyframes, so that rebuilding draws the genes after the last one on top of it
+        gene_journal_keyframe_interval = 7,
+        termination_policies = [ AcceptedGenesTermination( 100 ) ],
+    )
+    records = list( read_gene_journal( tmp_path / 'genes.journal' ) )
+    assert sum( record.is_keyframe for record in records ) > 1
+    assert not records[ -1 ].is_keyframe
+
+    genes, image, record = rebuild_from_gene_journal( tmp_path / 'genes.journal' )
+
+    best_genes = genetic_algorithm.get_specimen_genes( best_specimen )
+    assert len( best_genes ) >= 100
+    np.testing.assert_array_equal( genes.to_array(), best_genes.to_array() )
+    np.testing.assert_array_equal( image, best_specimen.cached_image )
+    assert record.generation == records[ -1 ].generation
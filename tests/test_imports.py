@@ -0,0 +1,26 @@
+import importlib
+from pathlib import Path
+
+import pytest
+
+
+ROOT_DIR = Path( __file__ ).parent.parent
+
+# Algorithms reach primitives and utils through module imports, since neither genetic_algorithms.common nor utils
+# re-export them, so a name that is only used in a class body or default argument breaks importing the module.
+# Importing every module catches that, without running anything.
+PACKAGE_DIRECTORY_NAMES = [ 'genetic_algorithms', 'mains', 'primitives', 'redraw', 'utils' ]
+
+
+def _get_module_names():
+    for directory_name in PACKAGE_DIRECTORY_NAMES:
+        for path in sorted( ( ROOT_DIR / directory_name ).rglob( '*.py' ) ):
+            module_path = path.relative_to( ROOT_DIR ).with_suffix( '' )
+            if module_path.name == '__init__':
+                module_path = module_path.parent
+            yield '.'.join( module_path.parts )
+
+
+@pytest.mark.parametrize( 'module_name', list( _get_module_names() ) )
+def test_import( module_name : str ):
+    importlib.import_module( module_name )
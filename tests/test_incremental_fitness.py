@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from genetic_algorithms.common.genetic_algorithm_generator import make_genetic_algorithm_generator
+from genetic_algorithms.common.inplace_genetic_algorithm_generator import make_inplace_genetic_algorithm_generator
+from genetic_algorithms.impl.painting import Painting
+from genetic_algorithms.impl.pointillism import Pointillism
+from utils.absolute_difference_image import get_absolute_difference_image
+from utils.weighted_position_sampler import WeightedPositionSampler
+
+
+N_GENERATIONS = 200
+
+
+def make_algorithm( algorithm_name : str, target_image, brush_directory, **kwargs ):
+    if algorithm_name == 'painting':
+        return Painting( target_image, brush_directory = str( brush_directory ), use_incremental_fitness = True, **kwargs )
+    return Pointillism( target_image, out_path_color_palette = None, use_incremental_fitness = True, **kwargs )
+
+
+def run_generations( genetic_algorithm, f_make_generator, n_generations : int = N_GENERATIONS ):
+    """
+    Returns the score and a copy of the image of every generation, and the best specimen at the end
+    """
+    results = [ ]
+    specimen = None
+    for _, image, score, specimen in f_make_generator( genetic_algorithm ):
+        # the in place generator changes the image of the specimen in the next generation
+        results.append( ( score, image.copy() ) )
+        if len( results ) == n_generations:
+            break
+    return results, specimen
+
+
+@pytest.mark.parametrize( 'algorithm_name', [ 'painting', 'pointillism' ] )
+@pytest.mark.parametrize( 'f_make_generator', [ make_genetic_algorithm_generator, make_inplace_genetic_algorithm_generator ] )
+def test_incremental_diff_sum_matches_full_recompute( algorithm_name : str, f_make_generator, target_image, brush_directory ):
+    genetic_algorithm = make_algorithm( algorithm_name, target_image, brush_directory, n_candidates = 4, n_committed_candidates = 2 )
+    _, specimen = run_generations( genetic_algorithm, f_make_generator )
+
+    expected_diff_image = get_absolute_difference_image( specimen.cached_image, genetic_algorithm._target_image )
+    np.testing.assert_array_equal( specimen.diff_image, expected_diff_image )
+    assert specimen.diff_sum == pytest.approx( float( np.sum( expected_diff_image ) ), rel = 1e-12 )
+
+    # the position sampler is updated with the diff image, instead of being built again
+    position_sampler = genetic_algorithm.get_position_sampler( specimen )
+    expected_position_sampler = WeightedPositionSampler( expected_diff_image )
+    for level, expected_level in zip( position_sampler._levels, expected_position_sampler._levels ):
+        np.testing.assert_allclose( level, expected_level, rtol = 1e-12 )
+
+
+@pytest.mark.parametrize( 'algorithm_name', [ 'painting', 'pointillism' ] )
+@pytest.mark.parametrize( 'n_candidates, n_committed_candidates', [ ( 1, 1 ), ( 4, 2 ) ] )
+def test_inplace_generator_matches_copying_generator(
+        algorithm_name          : str,
+        n_candidates            : int,
+        n_committed_candidates  : int,
+        target_image,
+        brush_directory,
+):
+    algorithm_arguments = { 'n_candidates' : n_candidates, 'n_committed_candidates' : n_committed_candidates }
+    copying_results, copying_specimen = run_generations(
+        make_algorithm( algorithm_name, target_image, brush_directory, **algorithm_arguments ),
+        make_genetic_algorithm_generator,
+    )
+    inplace_genetic_algorithm = make_algorithm( algorithm_name, target_image, brush_directory, **algorithm_arguments )
+    inplace_results, inplace_specimen = run_generations( inplace_genetic_algorithm, make_inplace_genetic_algorithm_generator )
+
+    assert len( inplace_results ) == len( copying_results )
+    for ( inplace_score, inplace_image ), ( copying_score, copying_image ) in zip( inplace_results, copying_results ):
+        np.testing.assert_array_equal( inplace_image, copying_image )
+        # the running diff sums are equal up to the order in which rounding errors were added
+        assert inplace_score == pytest.approx( copying_score, rel = 1e-9 )
+    np.testing.assert_array_equal(
+        inplace_genetic_algorithm.get_specimen_genes( inplace_specimen ).to_array(),
+        inplace_genetic_algorithm.get_specimen_genes( copying_specimen ).to_array(),
+    )
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import cv2
+
+from genetic_algorithms.common.tiled_run import run_genetic_algorithm_pointillism_tiled
+
+
+ROOT_DIR = Path( __file__ ).parent.parent
+INPUT_IMAGE_PATH = ROOT_DIR / '_input_images/tim-mossholder-cO5-QcKIR9o-unsplash.jpg'
+
+
+def test_tiled_pointillism_with_default_arguments( tmp_path : Path ):
+    # a small image, so that it runs as a single tile, and converges in seconds
+    input_image = cv2.resize( cv2.imread( str( INPUT_IMAGE_PATH ) ), ( 48, 32 ), interpolation = cv2.INTER_AREA )
+    input_image_path = tmp_path / 'input.png'
+    cv2.imwrite( str( input_image_path ), input_image )
+
+    result = run_genetic_algorithm_pointillism_tiled( input_image_path, tmp_path / 'output' )
+
+    assert result.cached_image.shape == input_image.shape
+    assert len( result.genes ) > 0
+    assert ( tmp_path / 'output' / 'merged_result.png' ).exists()
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from utils.weighted_position_sampler import WeightedPositionSampler
+
+
+def assert_same_block_sums( sampler : WeightedPositionSampler, expected_sampler : WeightedPositionSampler ) -> None:
+    assert len( sampler._levels ) == len( expected_sampler._levels )
+    for level, expected_level in zip( sampler._levels, expected_sampler._levels ):
+        np.testing.assert_allclose( level, expected_level, rtol = 1e-12 )
+
+
+@pytest.mark.parametrize( 'block_size', [ 2, 4, 64 ] )
+def test_update_region_matches_recomputing_all_block_sums( block_size : int ):
+    random_generator = np.random.default_rng( 0 )
+    weight_image = random_generator.integers( 0, 256, size = ( 37, 53 ) ).astype( np.float64 )
+    sampler = WeightedPositionSampler( weight_image, block_size )
+
+    for _ in range( 50 ):
+        y_min, y_max = np.sort( random_generator.integers( 0, weight_image.shape[ 0 ] + 1, size = 2 ) )
+        x_min, x_max = np.sort( random_generator.integers( 0, weight_image.shape[ 1 ] + 1, size = 2 ) )
+        weight_image[ y_min:y_max, x_min:x_max ] = random_generator.integers( 0, 256, size = ( y_max - y_min, x_max - x_min ) )
+        sampler.update_region( y_min, y_max, x_min, x_max )
+
+    expected_sampler = WeightedPositionSampler( weight_image.copy(), block_size )
+    assert_same_block_sums( sampler, expected_sampler )
+    assert sampler.total_weight == pytest.approx( float( np.sum( weight_image ) ) )
+
+
+def test_samples_only_positions_with_weight():
+    weight_image = np.zeros( ( 20, 30 ) )
+    weight_image[ 3, 7 ] = 1
+    weight_image[ 15, 22 ] = 3
+    sampler = WeightedPositionSampler( weight_image, block_size = 4 )
+
+    np.random.seed( 0 )
+    positions = sampler.sample_positions( 4000 )
+
+    assert { ( position.y, position.x ) for position in positions } == { ( 3, 7 ), ( 15, 22 ) }
+    n_heavy_positions = sum( ( position.y, position.x ) == ( 15, 22 ) for position in positions )
+    assert n_heavy_positions / len( positions ) == pytest.approx( 0.75, abs = 0.03 )
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from primitives.rectangle import Rectangle
+
 
 def get_absolute_difference_image( specimen_image, target_image ) -> np.ndarray:
     diff_image_3 = cv2.absdiff(
@@ -9,3 +11,20 @@ def get_absolute_difference_image( specimen_image, target_image ) -> np.ndarray:
     )
     diff_image_1 = np.sum(diff_image_3, axis=2) / 3 # divide by 3 because we summed 3 channels
     return diff_image_1
+
+
+def update_absolute_difference_image_in_rectangle(
+        absolute_difference_image,
+        specimen_image,
+        target_image,
+        rectangle : Rectangle,
+) -> float:
+    """
+    Recomputes the absolute difference image in place, but only inside the rectangle.
+    Returns by how much the sum of the absolute difference image changed.
+    """
+    region = rectangle.get_slices()
+    old_region_sum = float( np.sum( absolute_difference_image[ region ] ) )
+    new_region = get_absolute_difference_image( specimen_image[ region ], target_image[ region ] )
+    absolute_difference_image[ region ] = new_region
+    return float( np.sum( new_region ) ) - old_region_sum
@@ -1,18 +1,23 @@
 import itertools
 import random
+from typing import Optional, Sequence
+
 import numpy as np
 
 import cv2
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 from primitives.color import HSVColor
+from utils.preprocessing_cache import PreprocessingCache, get_preprocessed
 
 
-DEFAULT_COLOR_DELTAS = itertools.product(
+# Note that this has to be a list and not an iterator,
+# otherwise only the first ColorPalette would get any variations
+DEFAULT_COLOR_DELTAS = list( itertools.product(
     [ 0, 10, -10 ], # B or Hue deltas
     [ 0, 30 ], # G or Saturation deltas
     [ 0 ], # R or Value deltas
-)
+) )
 
 
 def color_distance(color1, color2):
@@ -43,6 +48,35 @@ def write_palette_image( palette, n_main_colors : int, out_path : str, is_hsv :
     print(f'Wrote color palette to "{out_path}"')
 
 
+def get_fit_pixels( image : np.ndarray, n_fit_pixels : Optional[ int ] = None, subsample_seed : int = 0 ) -> np.ndarray:
+    pixels = image.reshape( -1, 3 )
+    if n_fit_pixels is None or n_fit_pixels >= len( pixels ):
+        return pixels
+    # we use a separate random generator,
+    # so that subsampling does not affect the random numbers drawn by the genetic algorithm
+    random_generator = np.random.default_rng( subsample_seed )
+    pixel_indices = random_generator.choice( len( pixels ), size = n_fit_pixels, replace = False )
+    return pixels[ pixel_indices ]
+
+
+def get_main_colors(
+        image : np.ndarray,
+        n_colors : int,
+        n_fit_pixels : Optional[ int ] = None,
+        use_mini_batch : bool = False,
+        subsample_seed : int = 0,
+) -> np.ndarray:
+    fit_pixels = get_fit_pixels( image, n_fit_pixels, subsample_seed )
+    # clustering runs before the genetic algorithm seeds np.random,
+    # so it gets its own seed, to get the same palette in every process, for example when resuming
+    if use_mini_batch:
+        clustering_obj = MiniBatchKMeans( n_clusters = n_colors, random_state = subsample_seed )
+    else:
+        clustering_obj = KMeans( n_clusters = n_colors, random_state = subsample_seed )
+    clustering_obj.fit( fit_pixels )
+    return np.array( clustering_obj.cluster_centers_ )
+
+
 class ColorPalette:
 
     def __init__(
@@ -52,18 +86,38 @@ class ColorPalette:
             n_colors : int = 17,
             color_deltas = DEFAULT_COLOR_DELTAS,
             out_path = None,
+
+            # Clustering all pixels of a large image can take a long time.
+            # Fitting on a random subset of the pixels, and/or using mini batches, is much faster,
+            # and for a palette this small the results are very similar.
+            # See mains/benchmark_color_palette.py
+            n_fit_pixels : Optional[ int ] = None,
+            use_mini_batch : bool = False,
+            subsample_seed : int = 0,
+            preprocessing_cache : Optional[ PreprocessingCache ] = None,
     ):
 
         # determine the main colors in the image
-        clustering_obj = KMeans(n_clusters=n_colors)
-        clustering_obj.fit(image.reshape(-1,3))
-        main_colors = np.array( clustering_obj.cluster_centers_ )
+        clustering_parameters = {
+            'n_fit_pixels' : n_fit_pixels,
+            'use_mini_batch' : use_mini_batch,
+            'subsample_seed' : subsample_seed,
+        }
+        main_colors = get_preprocessed(
+            preprocessing_cache,
+            'color_palette_main_colors',
+            image,
+            { 'n_colors' : n_colors, **clustering_parameters },
+            lambda : { 'main_colors' : get_main_colors( image, n_colors, **clustering_parameters ) },
+            mmap_mode = None,
+        )[ 'main_colors' ]
 
         # Sort the colors based on their similarity (Euclidean distance)
         reference_color = np.array( [ 0, 0, 0 ], dtype = np.uint8 )  # Black color as a reference
         color_similarity = np.array( [ color_distance( color, reference_color ) for color in main_colors ] )
         sorted_indices = np.argsort( color_similarity )
         main_colors = main_colors[ sorted_indices ]
+        self.main_colors = main_colors
 
         # create variations on the main colors, using specified deltas
         palette = []
@@ -84,13 +138,41 @@ class ColorPalette:
         if out_path:
             write_palette_image( palette, n_colors, out_path, is_hsv )
 
-
-    def get_matching_color_with_probabilities( self, color: HSVColor ):
+    @classmethod
+    def from_colors( cls, main_colors : np.ndarray, colors : np.ndarray ) -> 'ColorPalette':
+        """
+        Creates a ColorPalette from colors that were computed before, without clustering anything
+        """
+        color_palette = cls.__new__( cls )
+        color_palette.main_colors = main_colors
+        color_palette.colors = colors
+        return color_palette
+
+    def _get_color_weights( self, colors : np.ndarray ) -> np.ndarray:
         # use inverse distance as weight
         # weights are expected to be non-negative numbers
-        np_color = np.array( color)
-        distances = [ np.linalg.norm( np_color - palette_color ) for palette_color in self.colors ]
-        max_distance = max( distances )
-        color_weights = [ max_distance - distance for distance in distances ]
-        color = random.choices( self.colors, weights = color_weights )[ 0 ]
-        return color
+        # returns an array of shape ( n_colors, n_palette_colors )
+        distances = np.linalg.norm( colors[ :, None, : ] - self.colors[ None, :, : ], axis = 2 )
+        max_distances = np.max( distances, axis = 1, keepdims = True )
+        return max_distances - distances
+
+    def get_matching_color_with_probabilities( self, color: HSVColor ):
+        color_weights = self._get_color_weights( np.array( [ color ] ) )[ 0 ]
+        cumulative_weights = np.cumsum( color_weights )
+        # this draws the same color as random.choices( self.colors, weights = color_weights ) would,
+        # so results for a given random seed do not change
+        random_weight = random.random() * cumulative_weights[ -1 ]
+        color_index = min( int( np.searchsorted( cumulative_weights, random_weight, side = 'right' ) ), len( self.colors ) - 1 )
+        return self.colors[ color_index ]
+
+    def get_matching_colors_with_probabilities( self, colors : Sequence[ HSVColor ] ) -> np.ndarray:
+        """
+        Same as get_matching_color_with_probabilities, but for many colors at once.
+        Note that this draws from np.random instead of random.
+        """
+        color_weights = self._get_color_weights( np.array( colors ) )
+        cumulative_weights = np.cumsum( color_weights, axis = 1 )
+        random_weights = np.random.random( len( colors ) ) * cumulative_weights[ :, -1 ]
+        color_indices = np.sum( cumulative_weights <= random_weights[ :, None ], axis = 1 )
+        color_indices = np.minimum( color_indices, len( self.colors ) - 1 )
+        return self.colors[ color_indices ]
@@ -1,32 +1,74 @@
 import cv2
 import math
+from typing import Optional
 
 import numpy as np
 
 from primitives.point import Point
+from primitives.rectangle import Rectangle
+from utils.preprocessing_cache import PreprocessingCache, PreprocessedArrays, get_preprocessed
+
+
+def _compute_blurred_gradients( image : np.ndarray, is_hsv : bool, blur_kernel_size : int, blur_magnitude ) -> PreprocessedArrays:
+    if is_hsv:
+        bgr = cv2.cvtColor( image, cv2.COLOR_HSV2BGR )
+        gray = cv2.cvtColor( bgr, cv2.COLOR_BGR2GRAY )
+    else:
+        gray = cv2.cvtColor( image, cv2.COLOR_BGR2GRAY )
+
+    dx = cv2.Scharr( gray, cv2.CV_32F, 1, 0 )
+    dy = cv2.Scharr( gray, cv2.CV_32F, 0, 1 )
+
+    blur_kernel_size_2d = (blur_kernel_size, blur_kernel_size)
+    return {
+        'dx' : cv2.GaussianBlur( dx, blur_kernel_size_2d, blur_magnitude ),
+        'dy' : cv2.GaussianBlur( dy, blur_kernel_size_2d, blur_magnitude ),
+    }
 
 
 class ImageGradient:
 
-    def __init__( self, image : np.ndarray, is_hsv : bool = False, blur_kernel_size = None, blur_magnitude = 0 ) :
+    def __init__(
+            self,
+            image : np.ndarray,
+            is_hsv : bool = False,
+            blur_kernel_size = None,
+            blur_magnitude = 0,
+            preprocessing_cache : Optional[ PreprocessingCache ] = None,
+    ) :
 
         if blur_kernel_size is None :
             blur_kernel_size = int( min( image.shape[ :2 ] ) / 50 )
         if blur_kernel_size % 2 == 0 :
             blur_kernel_size += 1
 
-        if is_hsv:
-            bgr = cv2.cvtColor( image, cv2.COLOR_HSV2BGR )
-            gray = cv2.cvtColor( bgr, cv2.COLOR_BGR2GRAY )
-        else:
-            gray = cv2.cvtColor( image, cv2.COLOR_BGR2GRAY )
+        gradients = get_preprocessed(
+            preprocessing_cache,
+            'image_gradient',
+            image,
+            { 'is_hsv' : is_hsv, 'blur_kernel_size' : blur_kernel_size, 'blur_magnitude' : blur_magnitude },
+            lambda : _compute_blurred_gradients( image, is_hsv, blur_kernel_size, blur_magnitude ),
+        )
+        self._dx = gradients[ 'dx' ]
+        self._dy = gradients[ 'dy' ]
 
-        dx = cv2.Scharr( gray, cv2.CV_32F, 1, 0 )
-        dy = cv2.Scharr( gray, cv2.CV_32F, 0, 1 )
+    @classmethod
+    def from_gradients( cls, dx : np.ndarray, dy : np.ndarray ) -> 'ImageGradient':
+        """
+        Creates an ImageGradient from gradients that were computed before, without computing anything
+        """
+        image_gradient = cls.__new__( cls )
+        image_gradient._dx = dx
+        image_gradient._dy = dy
+        return image_gradient
 
-        blur_kernel_size_2d = (blur_kernel_size, blur_kernel_size)
-        self._dx = cv2.GaussianBlur( dx, blur_kernel_size_2d, blur_magnitude )
-        self._dy = cv2.GaussianBlur( dy, blur_kernel_size_2d, blur_magnitude )
+    def get_region( self, rectangle : Rectangle ) -> 'ImageGradient':
+        """
+        Returns the gradient for a region of the image, with positions relative to that region.
+        The gradients are views, so this does not copy anything,
+        and the gradient is the same as it is for the entire image, including blurring across the region border.
+        """
+        return ImageGradient.from_gradients( self._dx[ rectangle.get_slices() ], self._dy[ rectangle.get_slices() ] )
 
 
     def get_direction( self, position : Point ) -> float:
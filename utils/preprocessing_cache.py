@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from shutil import rmtree
+import tempfile
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+PreprocessedArrays = Dict[ str, np.ndarray ]
+
+
+class PreprocessingCache:
+
+    """
+    A persistent on-disk cache for the results of preprocessing an image,
+    like gradients, color palettes, and color space conversions.
+
+    Results are content addressed;
+    the key is a hash of the image pixels, the name of the preprocessing step and its parameters.
+    Every result is a set of named arrays, which are stored as .npy files,
+    so they can be memory mapped instead of read into memory when they are loaded again.
+    This means that repeated runs over the same input image skip all of their preprocessing.
+    """
+
+    def __init__( self, directory : Path ):
+        self._directory = Path( directory )
+        self._directory.mkdir( parents = True, exist_ok = True )
+
+    @staticmethod
+    def get_key( name : str, image : np.ndarray, parameters : Dict ) -> str:
+        image_hash = hashlib.sha256()
+        image_hash.update( str( ( image.shape, image.dtype.str ) ).encode() )
+        image_hash.update( np.ascontiguousarray( image ).data )
+        image_hash.update( name.encode() )
+        image_hash.update( repr( sorted( parameters.items() ) ).encode() )
+        return image_hash.hexdigest()
+
+    def get_or_compute(
+            self,
+            name        : str,
+            image       : np.ndarray,
+            parameters  : Dict,
+            f_compute   : Callable[ [ ], PreprocessedArrays ],
+            mmap_mode   : Optional[ str ] = 'r',
+    ) -> PreprocessedArrays:
+        """
+        Use mmap_mode = None for arrays that will be modified in place,
+        which loads a regular writeable copy into memory instead.
+        """
+        key = self.get_key( name, image, parameters )
+        entry_directory = self._directory / name / key
+
+        if not entry_directory.exists():
+            logger.info( f'Computing "{name}", and caching it in {entry_directory}' )
+            arrays = f_compute()
+            self._write_entry( entry_directory, arrays )
+        else:
+            logger.info( f'Loading "{name}" from {entry_directory}' )
+
+        # np.asarray gives regular arrays, which are faster to index than np.memmap,
+        # but still share their memory with the mapped file
+        return {
+            array_path.stem : np.asarray( np.load( array_path, mmap_mode = mmap_mode ) )
+            for array_path in sorted( entry_directory.glob( '*.npy' ) )
+        }
+
+    @staticmethod
+    def _write_entry( entry_directory : Path, arrays : PreprocessedArrays ) -> None:
+        # We first write to a temporary directory and then rename it,
+        # so that other processes never see partially written entries
+        entry_directory.parent.mkdir( parents = True, exist_ok = True )
+        temporary_directory = Path( tempfile.mkdtemp( dir = entry_directory.parent ) )
+        for array_name, array in arrays.items():
+            np.save( temporary_directory / f'{array_name}.npy', np.ascontiguousarray( array ) )
+        try:
+            os.rename( temporary_directory, entry_directory )
+        except OSError:
+            # another process wrote the same entry in the meantime, which is just as good
+            rmtree( temporary_directory )
+
+
+def get_preprocessed(
+        cache       : Optional[ PreprocessingCache ],
+        name        : str,
+        image       : np.ndarray,
+        parameters  : Dict,
+        f_compute   : Callable[ [ ], PreprocessedArrays ],
+        mmap_mode   : Optional[ str ] = 'r',
+) -> PreprocessedArrays:
+    """
+    Convenience function, so preprocessing code does not have to care whether caching is enabled
+    """
+    if cache is None:
+        return f_compute()
+    return cache.get_or_compute( name, image, parameters, f_compute, mmap_mode )
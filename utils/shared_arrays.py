@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+import logging
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.color_palette import ColorPalette
+from utils.image_gradient import ImageGradient
+
+
+logger = logging.getLogger(__name__)
+
+
+# Arrays that are sent to worker processes are normally pickled, which copies them into every worker.
+# For large images, and everything that is computed from them, that takes a lot of time and memory.
+# Instead, arrays can be placed in shared memory once, after which only a small handle is sent to the workers,
+# which attach to the same memory without copying anything.
+# The process that shares the arrays owns them, and removes them when it is done, see SharedArrays.
+
+
+# Workers keep the shared memory they attached to open for as long as they live,
+# since arrays that were attached to are only valid while their shared memory is open
+ATTACHED_SHARED_MEMORY : Dict[ str, SharedMemory ] = { }
+
+
+@dataclass( frozen = True )
+class SharedArrayHandle:
+    """
+    A picklable reference to an array in shared memory
+    """
+    name    : str
+    shape   : Tuple[ int, ... ]
+    dtype   : str
+
+    def attach( self ) -> np.ndarray:
+        """
+        Returns the shared array, without copying it.
+        The array is read only, since it is shared with all other processes.
+        """
+        shared_memory = ATTACHED_SHARED_MEMORY.get( self.name )
+        if shared_memory is None:
+            shared_memory = SharedMemory( name = self.name )
+            ATTACHED_SHARED_MEMORY[ self.name ] = shared_memory
+        array = np.ndarray( self.shape, dtype = np.dtype( self.dtype ), buffer = shared_memory.buf )
+        array.flags.writeable = False
+        return array
+
+
+@dataclass( frozen = True )
+class SharedImageGradientHandle:
+    dx  : SharedArrayHandle
+    dy  : SharedArrayHandle
+
+    def attach( self ) -> ImageGradient:
+        return ImageGradient.from_gradients( self.dx.attach(), self.dy.attach() )
+
+
+@dataclass( frozen = True )
+class SharedColorPaletteHandle:
+    main_colors : SharedArrayHandle
+    colors      : SharedArrayHandle
+
+    def attach( self ) -> ColorPalette:
+        return ColorPalette.from_colors( self.main_colors.attach(), self.colors.attach() )
+
+
+class SharedArrays:
+
+    """
+    Owns arrays in shared memory, and removes them from shared memory when it is closed.
+    Use it as a context manager, so that shared memory is also removed when something goes wrong,
+    because it would otherwise stay around until the machine restarts.
+
+        with SharedArrays() as shared_arrays:
+            handle = shared_arrays.share( image )
+            # send handle to workers, which call handle.attach()
+    """
+
+    def __init__( self ):
+        self._shared_memories : List[ SharedMemory ] = [ ]
+
+    def __enter__( self ) -> 'SharedArrays':
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ) -> None:
+        self.close()
+
+    @property
+    def n_bytes( self ) -> int:
+        return sum( shared_memory.size for shared_memory in self._shared_memories )
+
+    def share( self, array : np.ndarray ) -> SharedArrayHandle:
+        """
+        Copies the array into shared memory, once, and returns a handle to it
+        """
+        # shared memory can not be empty
+        shared_memory = SharedMemory( create = True, size = max( 1, array.nbytes ) )
+        self._shared_memories.append( shared_memory )
+        shared_array = np.ndarray( array.shape, dtype = array.dtype, buffer = shared_memory.buf )
+        shared_array[ ... ] = array
+        return SharedArrayHandle( name = shared_memory.name, shape = array.shape, dtype = array.dtype.str )
+
+    def share_image_gradient( self, image_gradient : ImageGradient ) -> SharedImageGradientHandle:
+        return SharedImageGradientHandle(
+            dx = self.share( image_gradient._dx ),
+            dy = self.share( image_gradient._dy ),
+        )
+
+    def share_color_palette( self, color_palette : ColorPalette ) -> SharedColorPaletteHandle:
+        return SharedColorPaletteHandle(
+            main_colors = self.share( color_palette.main_colors ),
+            colors = self.share( color_palette.colors ),
+        )
+
+    def close( self ) -> None:
+        for shared_memory in self._shared_memories:
+            # Unlinking only removes the name, processes that attached to the shared memory,
+            # including this one, can keep using their arrays until they exit
+            shared_memory.close()
+            shared_memory.unlink()
+        if self._shared_memories:
+            logger.debug( f'Removed {len( self._shared_memories )} arrays from shared memory' )
+        self._shared_memories = [ ]
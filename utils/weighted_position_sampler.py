@@ -0,0 +1,117 @@
+from typing import List
+
+import numpy as np
+
+from primitives.point import Point
+
+
+class WeightedPositionSampler:
+
+    """
+    Samples positions from an image, with probabilities proportional to the pixel values of that image.
+
+    This does the same as sample_weighted_position_from_image,
+    but instead of normalizing the entire image for every sample,
+    we keep a hierarchy of block sums over the image.
+    Level 0 is the (flattened) weight image itself,
+    and every next level contains the sums of blocks of `block_size` values of the previous level.
+    Drawing a position then means walking down from the top level,
+    each time choosing one of the `block_size` children, which takes logarithmic time.
+
+    The sampler keeps a reference to the weight image, and does not copy it.
+    If you modify the weight image in place, call update_region for the modified region,
+    so the block sums are recomputed for only that region.
+    """
+
+    def __init__( self, weight_image : np.ndarray, block_size : int = 64 ):
+        assert weight_image.ndim == 2, 'Expected a single channel weight image'
+        self.weight_image = weight_image
+        self._block_size = block_size
+        self._height, self._width = weight_image.shape
+
+        # levels[ 0 ] contains the sums of blocks of weights,
+        # and the last level contains a single value; the total weight
+        self._levels : List[ np.ndarray ] = [ ]
+        children = self._get_flat_weights()
+        while len( children ) > 1 or not self._levels:
+            children = self._get_block_sums( children )
+            self._levels.append( children )
+
+    @property
+    def total_weight( self ) -> float:
+        return float( self._levels[ -1 ][ 0 ] )
+
+    def _get_flat_weights( self ) -> np.ndarray:
+        return self.weight_image.reshape( -1 )
+
+    def _get_block_sums( self, children : np.ndarray ) -> np.ndarray:
+        n_blocks = -( -len( children ) // self._block_size )
+        padded_children = np.zeros( n_blocks * self._block_size, dtype = np.float64 )
+        padded_children[ :len( children ) ] = children
+        return padded_children.reshape( n_blocks, self._block_size ).sum( axis = 1 )
+
+    def _get_children( self, level_index : int, block_indices : np.ndarray ) -> np.ndarray:
+        # gather the children of every block as rows of a (n_blocks, block_size) array,
+        # children beyond the end of the level have zero weight
+        level = self._get_flat_weights() if level_index < 0 else self._levels[ level_index ]
+        child_indices = block_indices[ :, None ] * self._block_size + np.arange( self._block_size )
+        is_valid = child_indices < len( level )
+        children = level[ np.minimum( child_indices, len( level ) - 1 ) ].astype( np.float64, copy = False )
+        children[ ~is_valid ] = 0
+        return children
+
+    def update_region( self, y_min : int, y_max : int, x_min : int, x_max : int ) -> None:
+        """
+        Recomputes the block sums for a region of the weight image that was modified in place.
+        This costs about the size of the region, instead of the size of the image.
+        """
+        if y_min >= y_max or x_min >= x_max:
+            return
+
+        rows = np.arange( y_min, y_max )
+        columns = np.arange( x_min, x_max )
+        flat_indices = ( rows[ :, None ] * self._width + columns[ None, : ] ).ravel()
+
+        for level_index, level in enumerate( self._levels ):
+            # indices are sorted, so we can get the unique block indices by dropping consecutive duplicates
+            block_indices = flat_indices // self._block_size
+            is_new_block = np.empty( len( block_indices ), dtype = bool )
+            is_new_block[ 0 ] = True
+            np.not_equal( block_indices[ 1: ], block_indices[ :-1 ], out = is_new_block[ 1: ] )
+            block_indices = block_indices[ is_new_block ]
+
+            level[ block_indices ] = self._get_children( level_index - 1, block_indices ).sum( axis = 1 )
+            flat_indices = block_indices
+
+    def sample_positions( self, n_positions : int ) -> List[ Point ]:
+        """
+        Draws n_positions positions at once, each draw takes logarithmic time.
+        Uses np.random, so results are reproducible when seeding np.random.
+        """
+        total_weight = self.total_weight
+        assert total_weight > 0, 'Can not sample positions from an image without any weight'
+
+        remaining_weights = np.random.random( n_positions ) * total_weight
+        block_indices = np.zeros( n_positions, dtype = np.int64 )
+
+        # walk from the level below the total weight, all the way down to the weights themselves
+        for level_index in range( len( self._levels ) - 2, -2, -1 ):
+            children = self._get_children( level_index, block_indices )
+            cumulative_children = np.cumsum( children, axis = 1 )
+            child_indices = np.sum( cumulative_children <= remaining_weights[ :, None ], axis = 1 )
+
+            # due to floating point rounding we might step past the last child with any weight,
+            # so clamp to the last child that can actually be sampled
+            last_valid_child_indices = self._block_size - 1 - np.argmax( children[ :, ::-1 ] > 0, axis = 1 )
+            child_indices = np.minimum( child_indices, last_valid_child_indices )
+
+            preceding_weights = np.take_along_axis( cumulative_children, child_indices[ :, None ], axis = 1 )[ :, 0 ]
+            preceding_weights -= children[ np.arange( n_positions ), child_indices ]
+            remaining_weights -= preceding_weights
+            block_indices = block_indices * self._block_size + child_indices
+
+        ys, xs = np.divmod( block_indices, self._width )
+        return [ Point( int( x ), int( y ) ) for y, x in zip( ys, xs ) ]
+
+    def sample_position( self ) -> Point:
+        return self.sample_positions( 1 )[ 0 ]